@@ -0,0 +1,102 @@
+# Benchmark of PreFormatter.normalize_strings against the previous path (strip_whitespace, lowercase_string, replace_ and normalize_entries
+# applying _strip_whitespace, _lower, _replace_ and _normalize_entries to each entry).
+import argparse
+import tempfile
+import timeit
+import numpy
+import pandas
+
+from formatting import PreFormatter
+
+
+def make_dataframe(n_rows, seed = 0):
+    """
+    Synthetic raw dataframe with columns normalized by PreFormatter. Entries have redundant whitespaces, mixed case and
+    patterns from replace_cols and normalize_entries_col. Some entries are NaN, None or numbers.
+    """
+    rng = numpy.random.default_rng(seed)
+    choices = {'species' : [' Homo sapiens ', 'Mus  musculus', 'homo sapiens'],
+               'Mutation' : ['A12C G13T', 'A12C-G13T', ' S3T ', numpy.nan],
+               'Gene ID' : ['OR1A1', ' OR2W1 ', 'Olfr73'],
+               'Uniprot ID' : ['Q9H205', ' P30953', numpy.nan],
+               'Sequence' : ['MEPRK\nGLLQ', 'MEPRK GLLQ', numpy.nan],
+               'Name' : [' (R)-carvone', 'Vanillin  ', 'ethyl  butyrate', numpy.nan],
+               'CID' : [1234.0, numpy.nan, '  5678 '],
+               'CAS' : ['99-49-0', numpy.nan],
+               'InChI Key' : ['ULDHMXUKGWMISQ_UHFFFAOYSA_N', ' MWOOGOJBHIARFG-UHFFFAOYSA-N ', numpy.nan],
+               'canonicalSMILES' : ['CC(=O)OC', ' CCO ', numpy.nan],
+               'Parameter' : ['EC50', ' raw', 'Screening  '],
+               'Value' : ['> 10', '< 3', 'N.D.', '12.5', 1.0, numpy.nan],
+               'Unit' : ['µM', ' mM', numpy.nan],
+               'Value_Screen' : [10.0, numpy.nan],
+               'Unit_Screen' : ['µM', numpy.nan],
+               'Responsive' : [1, 0, -1],
+               'nbr_measurements' : [1, 3],
+               'Type' : ['Luciferase Assay', 'luciferase assay', ' cAMP'],
+               'Cell_line' : ['HEK ', 'Hana3A'],
+               'Co_transfection' : ['RTP1S', ' None  ', numpy.nan],
+               'Assay System' : [' Dual-Glo ', numpy.nan],
+               'Gprotein' : ['Golf', None, numpy.nan],
+               'Delivery' : ['Liquid', 'Gaz'],
+               'Assay' : ['In Vitro', 'in vivo '],
+               'Tag' : ['Rho', 'FLAG', numpy.nan],
+               'Reference' : ['Saito  et al. 2009'],
+               'DOI' : [' 10.1126/scisignal.2000016 '],
+               'Reference Position' : ['Table  1', 'Fig. 2'],
+               'Mixture' : [' Mono', 'Mixture', 'sum of isomers'],
+            }
+    df = pandas.DataFrame({col : pandas.Series(values, dtype = object).take(rng.integers(len(values), size = n_rows)).values
+                           for col, values in choices.items()})
+    for col in ['Value_Screen']:
+        df[col] = df[col].astype(float)
+    for col in ['Responsive', 'nbr_measurements']:
+        df[col] = df[col].astype(int)
+    return df
+
+
+def previous_path(formatter, df):
+    """
+    Normalization steps as they were before normalize_strings: each step copies df and applies the step to each entry.
+    """
+    df = df.copy()
+    for col in formatter.strip_whitespace_cols:
+        df[col] = df[col].apply(formatter._strip_whitespace)
+    df = df.copy()
+    for col in formatter.lowercase_string_cols:
+        df[col] = df[col].apply(formatter._lower)
+    df = df.copy()
+    for case in formatter.replace_cols:
+        df[case['col']] = df[case['col']].apply(lambda x: formatter._replace_(x, case['from'], case['to']))
+    df = df.copy()
+    for case in formatter.normalize_entries_col:
+        df[case['col']] = df[case['col']].apply(lambda x: formatter._normalize_entries(x, case['from'], case['to']))
+    return df
+
+
+def main(n_rows, repeat):
+    tmp_dir = tempfile.mkdtemp()
+    formatter = PreFormatter(auxillary_dir = tmp_dir, log_dir = tmp_dir)
+    df = make_dataframe(n_rows)
+
+    expected = previous_path(formatter, df)
+    result = formatter.normalize_strings(df)
+    pandas.testing.assert_frame_equal(result, expected)
+    print('Results are equal ({} rows, {} columns).'.format(*df.shape))
+
+    t_previous = min(timeit.repeat(lambda: previous_path(formatter, df), number = 1, repeat = repeat))
+    t_plan = min(timeit.repeat(lambda: formatter.normalize_strings(df), number = 1, repeat = repeat))
+    print('previous path:     {:.3f} s'.format(t_previous))
+    print('normalize_strings: {:.3f} s'.format(t_plan))
+    print('speedup:           {:.1f}x'.format(t_previous / t_plan))
+    return t_previous, t_plan
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n_rows', type=int, default=100000,
+                        help='number of rows of the synthetic dataframe. 100000 by default.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of repetitions, the best time is reported. 3 by default.')
+    args = parser.parse_args()
+
+    main(args.n_rows, args.repeat)
@@ -0,0 +1,280 @@
+# Utility functions for auxillary data cached in auxillary_dir (e.g. 'Data').
+import os
+import stat
+import json
+import tempfile
+import contextlib
+import pandas
+
+try:
+    import fcntl
+except ImportError: # Not available on Windows, caches are not locked there.
+    fcntl = None
+
+BATCH_SIZE = 50
+
+# umask of the process, read once at import (os.umask can only be read by setting it, which is not thread-safe).
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def journal_path(path):
+    return path + '.journal'
+
+
+@contextlib.contextmanager
+def cache_lock(path):
+    """
+    Exclusive lock of the cache file in path shared by all processes working with the same auxillary_dir.
+    The lock is held on a separate file (path + \'.lock\') so that the cache itself can be replaced by atomic rename.
+
+    Parameters:
+    -----------
+    path : str
+        path to the cache file.
+    """
+    with open(path + '.lock', 'a') as lockfile:
+        if fcntl is not None:
+            fcntl.flock(lockfile.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lockfile.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write(path, write_fn, mode = 'w'):
+    """
+    Write to a temporary file next to path and rename it to path. The rename is atomic,
+    so path contains either the old or the new content, never a truncated file. The file keeps the permissions of path
+    (tempfile.mkstemp creates it readable by the owner only), new files get the default permissions given by umask.
+
+    Parameters:
+    -----------
+    path : str
+        destination file.
+
+    write_fn : callable
+        function taking an open file object and writing the content into it.
+
+    mode : str
+        mode used to open the temporary file.
+    """
+    dirname = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix = '.' + os.path.basename(path) + '.', suffix = '.tmp', dir = dirname)
+    try:
+        with os.fdopen(fd, mode) as f:
+            write_fn(f)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            file_mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            file_mode = 0o666 & ~_UMASK
+        os.chmod(tmp_path, file_mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json_atomic(obj, path):
+    """
+    json.dump obj to path using atomic rename.
+    """
+    atomic_write(path, lambda f: json.dump(obj, f))
+
+
+def write_csv_atomic(df, path, **kwargs):
+    """
+    DataFrame.to_csv to path using atomic rename. kwargs are passed to to_csv.
+    """
+    atomic_write(path, lambda f: df.to_csv(f, **kwargs))
+
+
+def _batches(keys, batch_size):
+    """
+    Split keys to batches. The order of batches is rotated by process id so that processes updating
+    the same cache at the same time start with different batches.
+    """
+    batches = [keys[i:i + batch_size] for i in range(0, len(keys), batch_size)]
+    if len(batches) > 0:
+        start = os.getpid() % len(batches)
+        batches = batches[start:] + batches[:start]
+    return batches
+
+
+def _read_journal(path):
+    NEW = {}
+    try:
+        with open(journal_path(path), 'r') as journal:
+            for line in journal:
+                try:
+                    NEW.update(json.loads(line))
+                except json.JSONDecodeError:
+                    continue # Batch was interrupted while being written.
+    except FileNotFoundError:
+        pass
+    return NEW
+
+
+def load_json_map(path):
+    """
+    Load json dictionary from path and replay the journal of batches that were fetched but not yet
+    compacted to path (see update_json_map).
+
+    Parameters:
+    -----------
+    path : str
+        path to the json file.
+
+    Returns:
+    --------
+    _map : dict
+        loaded dictionary. Empty dictionary if neither path nor its journal exist.
+    """
+    try:
+        with open(path, 'r') as jsonfile:
+            _map = json.load(jsonfile)
+    except FileNotFoundError:
+        _map = {}
+    _map.update(_read_journal(path))
+    return _map
+
+
+def update_json_map(path, _map, new_keys, fetch, batch_size = BATCH_SIZE, logger = None):
+    """
+    Fetch entries for new_keys in batches and add them to _map and to the json file in path.
+
+    Each fetched batch is appended to a journal file (path + \'.journal\') right away, so if the fetching fails
+    midway, the batches fetched so far are kept and load_json_map picks them up on the next run. Once all
+    batches are fetched, the journal is compacted to path using atomic rename.
+
+    The cache can be shared by several processes. Writes are done under cache_lock and merged with the
+    entries other processes wrote in the meantime. Before fetching a batch the keys that were already
+    fetched by other processes are skipped.
+
+    Parameters:
+    -----------
+    path : str
+        path to the json file.
+
+    _map : dict
+        current content of the json file. It is updated inplace.
+
+    new_keys : list
+        keys to fetch.
+
+    fetch : callable
+        function taking a list of keys and returning a dictionary with new entries (e.g. get_map_inchikey_to_synonyms).
+
+    batch_size : int
+        number of keys fetched and commited at once.
+
+    logger : logging.Logger, optional (default=None)
+        logger used to report progress.
+
+    Returns:
+    --------
+    _map : dict
+        updated _map. It contains entries added by other processes as well.
+    """
+    journal_file = journal_path(path)
+    mtime = None
+    for n, batch in enumerate(_batches(new_keys, batch_size)):
+        with cache_lock(path):
+            # json file changes only when some process compacts its journal.
+            if os.path.exists(path) and os.stat(path).st_mtime_ns != mtime:
+                mtime = os.stat(path).st_mtime_ns
+                _map.update(load_json_map(path))
+            else:
+                _map.update(_read_journal(path))
+        batch = [key for key in batch if key not in _map]
+        if len(batch) > 0:
+            NEW = fetch(batch)
+            _map.update(NEW)
+            with cache_lock(path):
+                with open(journal_file, 'a') as journal:
+                    # newline first in case the last write to the journal was interrupted.
+                    journal.write('\n' + json.dumps(NEW) + '\n')
+                    journal.flush()
+                    os.fsync(journal.fileno())
+        if logger is not None:
+            logger.debug('{}: {}/{} keys fetched'.format(os.path.basename(path), min((n + 1) * batch_size, len(new_keys)), len(new_keys)))
+
+    with cache_lock(path):
+        merged = load_json_map(path)
+        merged.update(_map)
+        write_json_atomic(merged, path)
+        if os.path.exists(journal_file):
+            os.remove(journal_file)
+    _map.update(merged)
+    return _map
+
+
+def _read_csv_table(path, like, sep):
+    """
+    Read csv written by update_csv_table. The result has the same type as \'like\' (pandas.DataFrame or pandas.Series).
+    """
+    try:
+        df = pandas.read_csv(path, sep = sep, index_col = 0)
+    except FileNotFoundError:
+        return like.iloc[:0]
+    if isinstance(like, pandas.Series):
+        df = df.squeeze(axis = 1)
+    return df
+
+
+def update_csv_table(path, df, new_keys, fetch, batch_size = BATCH_SIZE, logger = None, **kwargs):
+    """
+    Fetch rows for new_keys in batches and append them to df. After each batch the csv in path is rewritten
+    using atomic rename, so the batches fetched so far are kept if the fetching fails midway.
+
+    The cache can be shared by several processes. The csv is re-read and merged with df under cache_lock before
+    each write, so rows added by other processes are kept, and keys they already fetched are skipped.
+
+    Parameters:
+    -----------
+    path : str
+        path to the csv file.
+
+    df : pandas.DataFrame or pandas.Series
+        current content of the csv file, indexed by key.
+
+    new_keys : list
+        keys to fetch.
+
+    fetch : callable
+        function taking a list of keys and returning pandas.DataFrame (or pandas.Series) indexed by key.
+
+    batch_size : int
+        number of keys fetched and commited at once.
+
+    logger : logging.Logger, optional (default=None)
+        logger used to report progress.
+
+    kwargs :
+        passed to DataFrame.to_csv.
+
+    Returns:
+    --------
+    df : pandas.DataFrame or pandas.Series
+        updated df. It contains rows added by other processes as well.
+    """
+    sep = kwargs.get('sep', ',')
+    for n, batch in enumerate(_batches(new_keys, batch_size)):
+        with cache_lock(path):
+            ON_DISK = _read_csv_table(path, df, sep)
+        df = pandas.concat([df, ON_DISK[~ON_DISK.index.isin(df.index)]])
+        batch = [key for key in batch if key not in df.index]
+        if len(batch) > 0:
+            NEW = fetch(batch)
+            with cache_lock(path):
+                ON_DISK = _read_csv_table(path, df, sep)
+                df = pandas.concat([df, ON_DISK[~ON_DISK.index.isin(df.index)]])
+                df = pandas.concat([df, NEW[~NEW.index.isin(df.index)]], verify_integrity = True)
+                write_csv_atomic(df, path, **kwargs)
+        if logger is not None:
+            logger.debug('{}: {}/{} keys fetched'.format(os.path.basename(path), min((n + 1) * batch_size, len(new_keys)), len(new_keys)))
+    return df
@@ -0,0 +1,170 @@
+# Persistent memo of outcomes of entity-level checks (see Checker._evaluate_entities in checking.py) stored in SQLite database in auxillary_dir.
+import os
+import json
+import inspect
+import hashlib
+import sqlite3
+import pandas
+
+from cache_utils import journal_path
+
+CHECK_MEMO_NAME = 'check_memo.sqlite'
+
+# Seconds to wait for the database locked by other thread or process.
+CHECK_MEMO_TIMEOUT = 60
+
+
+def check_version(method, helpers = (), config = None):
+    """
+    Version of a check: digest of the sources of method and of helpers that decide its outcome (the same way as NORMALIZATION_VERSION
+    in synonyms.py) and of config values it reads. Outcomes are recomputed when any of them changes.
+
+    Parameters:
+    -----------
+    method : callable
+        method of the check.
+
+    helpers : iterable
+        functions and methods called by the check.
+
+    config : dict, optional (default=None)
+        mapping from name to value (json-serializable) of configuration read by the check.
+    """
+    sources = [inspect.getsource(fn) for fn in [method] + list(helpers)]
+    return hashlib.sha1(json.dumps([sources, config], sort_keys = True, default = str).encode()).hexdigest()[:12]
+
+
+def auxillary_version(paths):
+    """
+    Version of auxillary data stored as a whole: digest of names, sizes and modification times of files in paths and of their journals
+    (see update_json_map in cache_utils.py). Missing files are skipped.
+    """
+    stats = []
+    for path in sorted(paths):
+        for _path in (path, journal_path(path)):
+            if os.path.exists(_path):
+                stat = os.stat(_path)
+                stats.append([os.path.basename(_path), stat.st_size, stat.st_mtime_ns])
+    return hashlib.sha1(json.dumps(stats).encode()).hexdigest()[:12]
+
+
+def entity_auxillary_versions(values, version = ''):
+    """
+    Version of auxillary data for each entity: digest of the auxillary values the entity reads (e.g. CIDs or synonyms of its InChI keys)
+    and of version of auxillary data stored as a whole (see auxillary_version). Entries fetched for other entities do not change it.
+
+    Parameters:
+    -----------
+    values : pandas.Series
+        json-serializable auxillary values read by each entity.
+
+    version : str, optional (default='')
+        version of auxillary data stored as a whole.
+
+    Returns:
+    --------
+    versions : pandas.Series
+        versions with the same index as values.
+    """
+    return values.map(lambda x: hashlib.sha1(json.dumps([version, x], sort_keys = True, default = str).encode()).hexdigest()[:12])
+
+
+def entity_keys(df, cols):
+    """
+    Serialize entities (rows of df[cols]) to json lists. NaNs are stored as null and integers (e.g. IDs of sequences, see sequences.py) as numbers.
+
+    Returns:
+    --------
+    keys : pandas.Series
+        keys with the same index as df.
+    """
+    values = df[cols].astype(object)
+    values = values.where(values.notna(), None)
+    return pandas.Series([json.dumps(list(row), default = int) for row in values.itertuples(index = False, name = None)], index = df.index, dtype = object)
+
+
+class CheckMemo:
+    """
+    Outcomes of checks for entities (e.g. molecules or sequences) kept between runs. Each outcome is keyed by check and entity
+    (see entity_keys) and it is valid for the version of the check (see check_version) and the version of the auxillary data
+    the entity reads (see entity_auxillary_versions) it was stored with. Outcomes of other versions of a check are deleted when new
+    outcomes are stored, outcomes of entities whose auxillary data changed are replaced, so only entities that are new or invalidated are checked again.
+
+    Attributes:
+    -----------
+    path : str
+        path to the database.
+    """
+    def __init__(self, path):
+        """
+        Parameters:
+        -----------
+        path : str
+            path to the database. It is created if it does not exist.
+        """
+        self.path = path
+        with self._connect() as con:
+            con.execute('DROP TABLE IF EXISTS outcomes') # Outcomes keyed by versions of whole auxillary files, they can not be matched to entities.
+            con.execute('CREATE TABLE IF NOT EXISTS entity_outcomes ("check" TEXT, entity TEXT, version TEXT, auxillary_version TEXT, reason TEXT, '
+                        'PRIMARY KEY ("check", entity))')
+        con.close()
+
+    def _connect(self):
+        # Each call uses its own connection, so the memo can be used by checks running in threads (see Checker.n_jobs).
+        return sqlite3.connect(self.path, timeout = CHECK_MEMO_TIMEOUT)
+
+    def lookup(self, check, version, auxillary_versions):
+        """
+        Get outcomes of check with version for entities whose outcomes were stored with the same auxillary version.
+
+        Parameters:
+        -----------
+        check : str
+            name of the check.
+
+        version : str
+            version of the check.
+
+        auxillary_versions : dict
+            mapping from entity key to version of auxillary data it reads.
+
+        Returns:
+        --------
+        outcomes : dict
+            mapping from entity key to reason of failure (None if the entity passed).
+        """
+        with self._connect() as con:
+            rows = con.execute('SELECT entity, auxillary_version, reason FROM entity_outcomes WHERE "check" = ? AND version = ?',
+                               (check, version)).fetchall()
+        con.close()
+        return {entity : reason for entity, aux_version, reason in rows if auxillary_versions.get(entity) == aux_version}
+
+    def store(self, check, version, auxillary_versions, outcomes):
+        """
+        Store outcomes of check, replace outcomes of the same entities and delete outcomes of other versions of the check.
+
+        Parameters:
+        -----------
+        check : str
+            name of the check.
+
+        version : str
+            version of the check.
+
+        auxillary_versions : dict
+            mapping from entity key to version of auxillary data it reads.
+
+        outcomes : dict
+            mapping from entity key to reason of failure (None or NaN if the entity passed).
+
+        Returns:
+        --------
+        n_deleted : int
+            number of deleted outcomes of other versions.
+        """
+        rows = [(check, key, version, auxillary_versions[key], reason if isinstance(reason, str) else None) for key, reason in outcomes.items()]
+        with self._connect() as con:
+            n_deleted = con.execute('DELETE FROM entity_outcomes WHERE "check" = ? AND version != ?', (check, version)).rowcount
+            con.executemany('INSERT OR REPLACE INTO entity_outcomes VALUES (?, ?, ?, ?, ?)', rows)
+        con.close()
+        return n_deleted
@@ -6,12 +6,27 @@ import logging
 import re
 import json
 
-from utils import perform_mutation, merge_cols_with_priority, enumerate_isomers
+from utils import merge_cols_with_priority, clean_string_name, count_isomers
+from mutations import mutate_sequence_ids, validate_mutations, parse_mutations, sequence_matrix
 from uniprot_utils import get_uniprot_sequences
 from pubchem_utils import get_map_inchikey_to_CID, get_map_inchikey_to_synonyms, get_map_name_to_inchikeys, get_map_inchikey_to_canonicalSMILES
+from cache_utils import load_json_map, update_json_map, update_csv_table
+from synonyms import SynonymStore, load_synonym_store, ngrams, locants
+from isomers import IsomerCache
+from pubchem_index import load_pubchem_index
+from registry import MolRegistry, component_table
+from sequences import SequenceTable, is_encoded
+from reports import LazyText, FAILURE_REPORT_NAME, build_failure_report, write_failure_report
+from scheduling import select_checks, check_levels, required_auxillary, required_columns, run_levels, entity_codes
+from check_memo import CheckMemo, CHECK_MEMO_NAME, check_version, auxillary_version, entity_auxillary_versions, entity_keys
 
 _logging_file_path = 'Log file path'
 
+# Strings accepted by float() and int() (see Checker._castable).
+_DIGITS = r'\d(?:_?\d)*'
+_CAST_PATTERNS = {float : r'\s*[+-]?(?:(?:{0}\.(?:{0})?|\.{0}|{0})(?:e[+-]?{0})?|inf(?:inity)?|nan)\s*'.format(_DIGITS),
+                  int : r'\s*[+-]?{0}\s*'.format(_DIGITS)}
+
 
 
 # Create logger
@@ -30,7 +45,8 @@ class Checker:
     needs to fix them themselves.
 
     Each check is implemented as a separate method and can in principle be used separately (although there are specific asumptions 
-    for each check like non-NaN values in entries.)
+    for each check like non-NaN values in entries.) Checks do not remove rows, they return reason of failure for each row and the rows
+    are filtered once after all checks (see _run_checks).
 
     Attributes:
     -----------
@@ -38,7 +54,13 @@ class Checker:
         directory with auxillary data like \'uniprot_sequences.csv\'.
 
     log_dir : str
-        loggig dir name.
+        loggig dir name. Failures of each run are also written to \'failures.sqlite\' in log_dir (see reports.py).
+
+    log_level : int
+        level of the logger, e.g. logging.INFO to skip formatting of fail examples.
+
+    n_jobs : int
+        number of threads running independent checks (see run_levels in scheduling.py).
 
     logger : logging.Logger
         logger
@@ -83,39 +105,77 @@ class Checker:
     map_inchikey_to_canonicalSMILES : dict
         auxillary dictionary mapping InChI key to canonical SMILES.
 
-    map_inchikey_to_synonyms : dict
-        auxillary dictionary mapping InChI key to synonyms for pubchem.
+    map_inchikey_to_synonyms : SynonymStore
+        auxillary mapping from InChI key to synonyms for pubchem. See SynonymStore in synonyms.py.
 
     map_name_to_inchikeys : dict
         auxillary dictionary mapping name to InChI key. NOTE: Not used now
 
+    checks : list
+        registry of checks, list of dictionaries with structure {'name' : name, 'method' : method_name, 'cols' : [columns_read], 
+        'auxillary' : [auxillary_data_needed], 'requires' : [names_of_checks], 'entity' : [entity_columns]} in the order in which they are run.
+        Only rows that passed the checks in \'requires\' are checked (\'all\' for all checks before). Result of a check with \'entity\' (None for row-level
+        checks) depends only on values in these columns. See scheduling.py.
+
+    entity_level : bool
+        whether checks with \'entity\' are run on distinct entities only (see _evaluate_entities).
+
+    memo : CheckMemo or None
+        outcomes of checks with \'entity\' kept between runs in \'check_memo.sqlite\' in auxillary_dir (see check_memo.py). If given,
+        checks with \'entity\' are run on distinct entities that are not in the memo.
+
+    auxillary_files : dict
+        mapping from name of auxillary data to files in auxillary_dir that are versioned as a whole. Outcomes in memo are invalidated when these
+        files change. Other auxillary data are versioned by values each entity reads (see _entity_auxillary_values).
+
+    unmemoized_reasons : list
+        reasons of failures that are not kept in memo, because they depend on the run (e.g. time budget) and not on the entity.
+
+    memo_dependencies : dict
+        mapping from name of check with \'entity\' to {'helpers' : [functions_deciding_outcome], 'config' : [names_of_attributes]}.
+        Outcomes in memo are invalidated when any of them changes.
+
+    default_checks : list
+        names of checks run when no checks are selected in __call__.
+
     check_results : dict
         dictionary with the results of the performed checks.
 
+    failures : pandas.DataFrame
+        reasons of failures of the last run with one column per check, NaN where the row passed the check (see _run_checks).
+
+    clean_df : pandas.DataFrame
+        rows of the last run that passed all checks.
+
     References:
     -----------
     InChI Key format: https://gist.github.com/lsauer/1312860/264ae813c2bd2c27a769d261c8c6b38da34e22fb
     """
-    def __init__(self, auxillary_dir = 'Data', log_dir = 'logs'):
+    def __init__(self, auxillary_dir = 'Data', log_dir = 'logs', log_level = logging.DEBUG, n_jobs = 1, entity_level = False, memo = False):
         self.auxillary_dir = auxillary_dir
         self.log_dir = log_dir
+        self.log_level = log_level
+        self.n_jobs = n_jobs
+        self.entity_level = entity_level
+        self.memo = CheckMemo(os.path.join(auxillary_dir, CHECK_MEMO_NAME)) if memo else None
 
         self._init_logger(__class__.__name__)
         self._init_config()
         self.check_results = {}
+        self.failures = pandas.DataFrame()
 
 
     def _init_logger(self, logger_name):
         self.logger = logging.getLogger(logger_name)
-        self.logger.setLevel(logging.DEBUG)
+        self.logger.setLevel(self.log_level)
 
         logger_formatter = logging.Formatter("%(levelname)-10s:\t%(asctime)-20s:\t%(message)s", "%Y-%m-%d %H:%M:%S")
         logger_file_handler = logging.FileHandler(os.path.join(self.log_dir, logger_name + '.log'), mode = 'w')
         logger_file_handler.setFormatter(logger_formatter)
         logger_stdout_handler = logging.StreamHandler(sys.stdout)
 
-        logger_file_handler.setLevel(logging.DEBUG)
-        logger_stdout_handler.setLevel(logging.INFO)
+        logger_file_handler.setLevel(self.log_level)
+        logger_stdout_handler.setLevel(max(self.log_level, logging.INFO))
 
         self.logger.addHandler(logger_file_handler)
         self.logger.addHandler(logger_stdout_handler)
@@ -199,6 +259,11 @@ class Checker:
                                   {'col' : 'Mixture',      'Type' : float, 'except_values' : None, 'ignore_patterns' : None, 'sep' : None},
                                 ]
 
+        # Names that do not match any synonym exactly are accepted if the n-gram similarity
+        # to the closest synonym with the same locants is at least this (see SynonymStore.best_matches). None to disable (default),
+        # fuzzy matching can accept a wrong name, so it is opt-in.
+        self.name_similarity_threshold = None
+
         # String for some columns should be within predefined categories
         self.categorical_values = [{'col' : 'Type',      'allowed_values':['Ca2+','Luc','cAMP','SEAP','I','Conductance','GFP']},
                                    {'col' : 'Cell_line', 'allowed_values':['HEK','H3A','Ocy','OSN','OB','HeLa/Olf','NxG108CC15','ScL21','Yeast','HEPG2','HUH7','LNCAP']},
@@ -209,20 +274,319 @@ class Checker:
                                    {'col' : 'Parameter', 'allowed_values':['ec50','raw','norm_other','norm_pair','norm_rec','norm_mol']}
                                 ]
 
+        # Files of auxillary data in auxillary_dir versioned as a whole. Caches updated by each run are versioned by values each entity reads
+        # (see _entity_auxillary_values). Sequences from \'uniprot_sequences.csv\' are part of entities (see sequences.py) and isomers
+        # are given by canonical SMILES, so they are not listed.
+        self.auxillary_files = {'df_uniprot' : [],
+                                'map_inchikey_to_CID' : [os.path.join('pubchem_index', 'inchikey.npy'), # Offline PubChem index (see pubchem_index.py).
+                                                         os.path.join('pubchem_index', 'inchikey_cid.npy')],
+                                'map_inchikey_to_canonicalSMILES' : [],
+                                'map_inchikey_to_synonyms' : [],
+                                'map_name_to_inchikeys' : [],
+                                'isomer_cache' : [],
+                            }
+
+        # Outcomes of molecules over the time budget (see IsomerCache.counts) are not kept in memo:
+        self.unmemoized_reasons = ['chirality:timeout']
+
+        # Helpers and configuration (names of attributes) deciding outcomes of checks with \'entity\'. Their sources and values
+        # are part of the version of outcomes in memo (see check_version in check_memo.py).
+        self.memo_dependencies = {'inchikey_on_pubchem' :       {'helpers' : [self._components, self._reduce_components, component_table],
+                                                                 'config' : []},
+                                  'check_sep_canonicalSMILES' : {'helpers' : [self._component_smiles, self._components, self._reduce_components, component_table],
+                                                                 'config' : []},
+                                  'check_chirality' :           {'helpers' : [self._has_isomers, self._component_smiles, self._components, self._reduce_components,
+                                                                              component_table, IsomerCache.counts, IsomerCache.count, IsomerCache.isomers, count_isomers],
+                                                                 'config' : []},
+                                  'inchikey_vs_name' :          {'helpers' : [self._check_inchikey_vs_name, self._clean_string_name, clean_string_name,
+                                                                              SynonymStore.clean_synonym_set, SynonymStore.best_matches, ngrams, locants],
+                                                                 'config' : ['name_similarity_threshold']},
+                                  'mutation' :                  {'helpers' : [validate_mutations, parse_mutations, sequence_matrix],
+                                                                 'config' : []},
+                                  'length_sequence' :           {'helpers' : [SequenceTable.get_lengths],
+                                                                 'config' : []},
+                                }
+
+        # Registry of checks: columns they read, auxillary data they need, checks whose failed rows they skip and
+        # columns identifying entities (molecules, sequences) the check depends on for entity-level evaluation:
+        self.checks = [{'name' : 'not_nan',                          'method' : 'check_not_nan',                          'cols' : self.not_nan_cols,                                         'auxillary' : ['df_uniprot'],                                         'requires' : [], 'entity' : None},
+                       {'name' : 'check_sep_canonicalSMILES',        'method' : 'check_sep_canonicalSMILES',              'cols' : ['InChI Key', 'canonicalSMILES'],                          'auxillary' : ['map_inchikey_to_canonicalSMILES'],                    'requires' : ['not_nan'], 'entity' : ['InChI Key', 'canonicalSMILES']},
+                       {'name' : 'conditioned_not_nan',              'method' : 'check_conditioned_not_nan',              'cols' : ['Parameter', 'Value', 'Unit', 'Value_Screen', 'Unit_Screen'], 'auxillary' : [],                                                 'requires' : [], 'entity' : None},
+                       {'name' : 'castable',                         'method' : 'check_castable',                         'cols' : [case['col'] for case in self.castable_cols],              'auxillary' : [],                                                     'requires' : [], 'entity' : None},
+                       {'name' : 'not_castable',                     'method' : 'check_not_castable',                     'cols' : [case['col'] for case in self.not_castable_cols],          'auxillary' : [],                                                     'requires' : [], 'entity' : None},
+                       {'name' : 'format',                           'method' : 'check_format',                           'cols' : [case['col'] for case in self.format_cols],                'auxillary' : [],                                                     'requires' : [], 'entity' : None},
+                       {'name' : 'mixture_format',                   'method' : 'check_mixture_format',                   'cols' : ['Mixture', '_MolID'],                                     'auxillary' : [],                                                     'requires' : [], 'entity' : None},
+                       {'name' : 'inchikey_on_pubchem',              'method' : 'check_inchikey_on_pubchem',              'cols' : ['InChI Key'],                                             'auxillary' : ['map_inchikey_to_CID'],                                'requires' : [], 'entity' : ['InChI Key']},
+                       {'name' : 'check_chirality',                  'method' : 'check_chirality',                        'cols' : ['Mixture', 'InChI Key', 'canonicalSMILES'],               'auxillary' : ['map_inchikey_to_canonicalSMILES', 'isomer_cache'],    'requires' : ['inchikey_on_pubchem'], 'entity' : ['Mixture', 'InChI Key', 'canonicalSMILES']},
+                       {'name' : 'inchikey_vs_name',                 'method' : 'check_inchikey_vs_name',                 'cols' : ['Mixture', 'Name', 'InChI Key'],                          'auxillary' : ['map_inchikey_to_synonyms'],                           'requires' : [], 'entity' : ['Mixture', 'InChI Key', 'Name']},
+                       {'name' : 'mutation',                         'method' : 'check_mutation',                         'cols' : ['Mutation', '_Sequence'],                                 'auxillary' : ['df_uniprot'],                                         'requires' : ['not_nan', 'format'], 'entity' : ['_Sequence', 'Mutation']},
+                       {'name' : 'mutated_sequence_consistency',     'method' : 'check_mutated_sequence_consistency',     'cols' : ['Mutation', '_Sequence', 'Uniprot ID', 'species'],        'auxillary' : ['df_uniprot'],                                         'requires' : 'all', 'entity' : None},
+                       {'name' : 'response_by_article_consistency',  'method' : 'check_response_by_article_consistency',  'cols' : ['Parameter', 'Mutation', '_Sequence', 'InChI Key', 'DOI', 'Value_Screen', 'Tag', 'Cell_line', 'Responsive'], 'auxillary' : ['df_uniprot'], 'requires' : 'all', 'entity' : None},
+                       {'name' : 'mixture_based_on_name',            'method' : 'check_mixture_based_on_name',            'cols' : ['Mixture', 'Name'],                                       'auxillary' : [],                                                     'requires' : [], 'entity' : None},
+                       {'name' : 'isomers_based_on_name',            'method' : 'check_isomers_based_on_name',            'cols' : ['Mixture', 'Name', 'InChI Key'],                          'auxillary' : [],                                                     'requires' : [], 'entity' : None},
+                       {'name' : 'length_sequence',                  'method' : 'check_len_seq',                          'cols' : ['_Sequence'],                                             'auxillary' : ['df_uniprot'],                                         'requires' : [], 'entity' : ['_Sequence']},
+                       {'name' : 'Ec50_non_zero',                    'method' : 'check_ec50_non_zero',                    'cols' : ['Parameter', 'Value'],                                    'auxillary' : [],                                                     'requires' : [], 'entity' : None},
+                       {'name' : 'value_categorical',                'method' : 'check_value_categorical',                'cols' : [case['col'] for case in self.categorical_values],         'auxillary' : [],                                                     'requires' : [], 'entity' : None},
+                       {'name' : 'mutation_based_on_geneid',         'method' : 'check_mutation_based_on_geneid',         'cols' : ['Gene ID', 'Sequence', 'Mutation'],                       'auxillary' : [],                                                     'requires' : [], 'entity' : None},
+                    ]
+
+        self.default_checks = ['not_nan',
+                               'check_sep_canonicalSMILES',
+                               'conditioned_not_nan',
+                               'castable',
+                               'not_castable',
+                               'format',
+                               # 'mixture_format',
+                               'inchikey_on_pubchem',
+                               # 'check_chirality',
+                               # 'inchikey_vs_name',
+                               'mutation',
+                               'mutated_sequence_consistency',
+                               'response_by_article_consistency',
+                               # 'mixture_based_on_name',
+                               # 'isomers_based_on_name',
+                               'length_sequence',
+                               'Ec50_non_zero',
+                               'value_categorical',
+                               'mutation_based_on_geneid',
+                            ]
+
 
-    def _logging_format_dataframe(self, df):
+    def _logging_format_dataframe(self, df, drop_duplicates = None):
         """
-        transform fail examples dataframe to text for logging.
+        transform fail examples dataframe to text for logging. The text is formatted only if the message is emitted (see LazyText in reports.py).
+        If drop_duplicates is given, duplicates in these columns are dropped first.
         """
+        return LazyText(self._format_dataframe, df, drop_duplicates)
+
+    def _format_dataframe(self, df, drop_duplicates = None):
+        if drop_duplicates is not None:
+            df = df.drop_duplicates(subset = drop_duplicates)
         n_fails = len(df)
         msg = 'num. of fails: {}, fail examples: \n' + df[self.logging_cols].head(20).to_string(max_colwidth = 50)
         return msg.format(n_fails)
 
+    @staticmethod
+    def _no_failures(df):
+        """
+        Get reasons of failures (see _add_failures) for df without any failure.
+        """
+        return pandas.Series(numpy.nan, index = df.index, dtype = object)
+
+    @staticmethod
+    def _add_failures(reasons, index, reason):
+        """
+        Set reason of failure for rows in index. Rows that already failed keep their first reason.
+
+        Parameters:
+        -----------
+        reasons : pandas.Series
+            reason of failure for each row, NaN for rows that passed so far.
+
+        index : pandas.Index
+            index of rows that failed.
+
+        reason : str
+            reason code, name of the check optionally followed by \':\' and the failed case (e.g. \'castable:Value\').
+
+        Returns:
+        --------
+        reasons : pandas.Series
+            updated reasons (updated in place).
+        """
+        new_fails = reasons.index.isin(index) & reasons.isna().values
+        reasons[new_fails] = reason
+        return reasons
+
+    def _failed_mask(self, checks = None):
+        """
+        Get boolean series, True for rows that failed any of checks (names in failures). All checks are used if checks is None.
+        """
+        checks = self.failures.columns if checks is None else checks
+        failed = numpy.zeros(len(self.failures), dtype = bool)
+        for check in checks:
+            failed |= self.failures[check].notna().values
+        return pandas.Series(failed, index = self.failures.index)
+
+    def _evaluate_check(self, check, df):
+        """
+        Run check (entry of checks) on df.
+
+        Checks do not remove rows, so every check is evaluated on all rows of df and each row gets reasons of all checks it failed.
+        Checks that need valid entries (e.g. mutations with correct format) or that compare rows with each other (consistency checks) 
+        declare \'requires\', names of checks run before. Only rows that passed all of them are checked.
+
+        Returns:
+        --------
+        reasons : pandas.Series
+            reason of failure for each checked row (see _add_failures).
+
+        passed : bool
+            result of the check.
+        """
+        if len(check['requires']) > 0:
+            failed = self._failed_mask(check['requires'])
+            if failed.any():
+                df = df[~failed]
+        if (self.entity_level or self.memo is not None) and check['entity'] is not None:
+            return self._evaluate_entities(check, df)
+        return getattr(self, check['method'])(df)
+
+    def _evaluate_entities(self, check, df):
+        """
+        Run check on one row of each distinct entity in df (combination of values in check[\'entity\'], see entity_codes in scheduling.py)
+        and broadcast the reasons back to all rows of the entity. Fail examples in logs show one row per entity.
 
-    def _load_auxillary(self):
+        Returns:
+        --------
+        reasons : pandas.Series
+            reason of failure for each row of df (see _add_failures).
+
+        passed : bool
+            result of the check.
+        """
+        codes, first = entity_codes(df, check['entity'])
+        df_entities = df.iloc[first]
+        self.logger.debug('{}: {} entities in {} rows'.format(check['name'], len(df_entities), len(df)))
+        if self.memo is None:
+            reasons, passed = getattr(self, check['method'])(df_entities)
+        else:
+            reasons, passed = self._evaluate_memo(check, df_entities)
+        reasons = pandas.Series(reasons.reindex(df_entities.index).values[codes], index = df.index, dtype = object)
+        return reasons, passed
+
+    def _entity_auxillary_values(self, check, df_entities):
+        """
+        Get auxillary values read by each entity in df_entities: CIDs, canonical SMILES or normalized synonyms of InChI keys of its components
+        (see _components) and InChI keys of its name for \'map_name_to_inchikeys\'. Other auxillary data add no values (see auxillary_files).
+
+        Returns:
+        --------
+        values : pandas.Series
+            list of values for each auxillary data of check for each row of df_entities.
+        """
+        values = []
+        df_components = self._components(df_entities)
+        for aux in check['auxillary']:
+            if aux == 'map_inchikey_to_CID':
+                mapped = df_components['InChI Key'].map(self.map_inchikey_to_CID[~self.map_inchikey_to_CID.index.duplicated()])
+            elif aux == 'map_inchikey_to_canonicalSMILES':
+                mapped = df_components['InChI Key'].map(self.map_inchikey_to_canonicalSMILES)
+            elif aux == 'map_inchikey_to_synonyms':
+                store = self.map_inchikey_to_synonyms
+                mapped = df_components['InChI Key'].map(lambda key: sorted(store.clean_synonym_set(key)) if key in store else None)
+            elif aux == 'map_name_to_inchikeys':
+                values.append(df_entities['Name'].map(lambda name: self.map_name_to_inchikeys.get(name)))
+                continue
+            else:
+                continue
+            values.append(mapped.groupby(df_components['_row_id'].values, sort = False).agg(list).reindex(df_entities.index))
+        return pandas.Series([list(row) for row in zip(*values)] if len(values) > 0 else [[]] * len(df_entities), index = df_entities.index, dtype = object)
+
+    def _evaluate_memo(self, check, df_entities):
+        """
+        Get outcomes of check for entities in df_entities (one row per entity) from memo and run the check only on entities that are not there.
+        Outcomes are keyed by the method (e.g. \'Checker.check_chirality\'), sources of the method and its helpers and values of configuration
+        it reads (see memo_dependencies and check_version in check_memo.py) and by the auxillary values each entity reads (see _entity_auxillary_values)
+        together with files of auxillary data versioned as a whole (see auxillary_files). New outcomes are stored in memo except reasons
+        in unmemoized_reasons, outdated outcomes of the check are removed.
+
+        Returns:
+        --------
+        reasons : pandas.Series
+            reason of failure for each row of df_entities (see _add_failures).
+
+        passed : bool
+            result of the check.
+        """
+        method = getattr(self, check['method'])
+        name = method.__qualname__
+        dependencies = self.memo_dependencies[check['name']]
+        version = check_version(method, dependencies['helpers'], {attr : getattr(self, attr) for attr in dependencies['config']})
+        aux_version = auxillary_version([os.path.join(self.auxillary_dir, path) for aux in check['auxillary'] for path in self.auxillary_files[aux]])
+        keys = entity_keys(df_entities, check['entity'])
+        aux_versions = dict(zip(keys, entity_auxillary_versions(self._entity_auxillary_values(check, df_entities), aux_version)))
+        MEMO = self.memo.lookup(name, version, aux_versions)
+        known = keys.isin(MEMO.keys())
+        reasons = keys[known].map(MEMO)
+        reasons = reasons.where(reasons.notna(), numpy.nan).astype(object)
+        n_failed = reasons.notna().sum()
+        if n_failed > 0:
+            self.logger.warning('{}: {} of {} entities found in memo, {} of them failed'.format(check['name'], known.sum(), len(keys), n_failed))
+        else:
+            self.logger.info('{}: {} of {} entities found in memo'.format(check['name'], known.sum(), len(keys)))
+        if not known.all():
+            new_reasons = getattr(self, check['method'])(df_entities[~known])[0].reindex(keys[~known].index)
+            memoized = ~new_reasons.isin(self.unmemoized_reasons)
+            n_deleted = self.memo.store(name, version, aux_versions, dict(zip(keys[~known][memoized], new_reasons[memoized])))
+            if n_deleted > 0:
+                self.logger.info('{}: {} outdated outcomes removed from memo (check or its configuration changed)'.format(check['name'], n_deleted))
+            reasons = pandas.concat([reasons, new_reasons])
+        reasons = reasons.reindex(df_entities.index)
+        return reasons, bool(reasons.isna().all())
+
+    def _run_checks(self, checks, df):
+        """
+        Run checks (resolved entries of checks, see select_checks in scheduling.py) on df and store their results in check_results and
+        reasons of failures in failures. Checks are run by levels of their dependency graph, independent checks in n_jobs threads.
+        """
+        missing_cols = [col for col in required_columns(checks) if col not in df.columns]
+        if len(missing_cols) > 0:
+            raise ValueError('Columns needed by checks not found: {}'.format(missing_cols))
+        for check, (reasons, passed) in run_levels(check_levels(checks), lambda check: self._evaluate_check(check, df), n_jobs = self.n_jobs):
+            self.check_results[check['name']] = passed
+            self.failures[check['name']] = reasons
+
+    def failure_table(self):
+        """
+        Get all failures of the last run as long table.
+
+        Returns:
+        --------
+        df_failures : pandas.DataFrame
+            dataframe with columns \'_row_id\', \'check\' and \'reason\' with one row per failed check of a row.
+        """
+        if self.failures.empty:
+            return pandas.DataFrame([], columns = ['_row_id', 'check', 'reason'])
+        failures = self.failures.stack().rename('reason')
+        failures.index.names = ['_row_id', 'check']
+        return failures.reset_index()
+
+    def _write_failure_report(self, df):
+        """
+        Write failures of the last run with values of logging_cols to the table named after the checker in \'failures.sqlite\' in log_dir
+        (see reports.py).
+        """
+        path = os.path.join(self.log_dir, FAILURE_REPORT_NAME)
+        write_failure_report(path, self.logger.name, build_failure_report(self.failure_table(), df, self.logging_cols))
+        self.logger.info('Failure report: {}, table: \'{}\''.format(path, self.logger.name))
+
+    def failed_checks(self):
+        """
+        Get list of failed checks for each row that failed at least one check in the last run.
+
+        Returns:
+        --------
+        failed_checks : pandas.Series
+            lists of names of failed checks indexed by \'_row_id\'.
+        """
+        return self.failure_table().groupby('_row_id', sort = False)['check'].agg(list)
+
+
+    @staticmethod
+    def _auxillary_names(auxillary):
+        """
+        Get set of names of auxillary data (see checks), all of them if auxillary is None.
+        """
+        if auxillary is None:
+            return {'df_uniprot', 'map_inchikey_to_CID', 'map_inchikey_to_canonicalSMILES', 'map_inchikey_to_synonyms', 'map_name_to_inchikeys', 'isomer_cache'}
+        return set(auxillary)
+
+    def _load_auxillary(self, auxillary = None):
         """
         load auxillary files: \'uniprot_sequences.csv\', \'map_inchikey_to_CID.csv\', \'map_inchikey_to_canonicalSMILES.json\', \'map_inchikey_to_synonyms.json\' 
-        and put the result to attributes.
+        and put the result to attributes. Only auxillary data in auxillary (names of attributes, see checks) are loaded, the rest is empty.
+        All are loaded if auxillary is None.
 
         Returns:
         --------
@@ -235,15 +599,22 @@ class Checker:
         map_inchikey_to_canonicalSMILES : dict
             loaded \'map_inchikey_to_canonicalSMILES.json\'.
 
-        map_inchikey_to_synonyms : dict
-            loaded \'map_inchikey_to_synonyms.json\'
+        map_inchikey_to_synonyms : SynonymStore
+            loaded \'map_inchikey_to_synonyms.json\' (see load_synonym_store in synonyms.py)
+
+        map_name_to_inchikeys : dict
+            loaded \'map_name_to_inchikeys.json\'
         """
+        auxillary = self._auxillary_names(auxillary)
+
         # df_uniprot:
-        try:
-            df_uniprot = pandas.read_csv(os.path.join(self.auxillary_dir, 'uniprot_sequences.csv'), sep = ';', index_col = None)
-        except FileNotFoundError:
-            df_uniprot = pandas.DataFrame([], columns = self.df_uniprot_cols)
-            # raise FileNotFoundError('Support file: \'uniprot_sequences.csv\' not found. Please call self.update_df_uniprot or run uniprot_utils.py to download sequences.')
+        df_uniprot = pandas.DataFrame([], columns = self.df_uniprot_cols)
+        if 'df_uniprot' in auxillary:
+            try:
+                df_uniprot = pandas.read_csv(os.path.join(self.auxillary_dir, 'uniprot_sequences.csv'), sep = ';', index_col = None)
+            except FileNotFoundError:
+                pass
+                # raise FileNotFoundError('Support file: \'uniprot_sequences.csv\' not found. Please call self.update_df_uniprot or run uniprot_utils.py to download sequences.')
 
         assert len(df_uniprot.columns) == len(self.df_uniprot_cols)
         for i in range(len(df_uniprot.columns)):
@@ -252,11 +623,13 @@ class Checker:
         df_uniprot.set_index(self.df_uniprot_cols[0], drop = True, inplace = True)
 
         # map_inchikey_to_CID:
-        try:
-            map_inchikey_to_CID = pandas.read_csv(os.path.join(self.auxillary_dir, 'map_inchikey_to_CID.csv'), sep = ';', index_col = None)
-        except FileNotFoundError:
-            map_inchikey_to_CID = pandas.DataFrame([], columns = self.map_inchikey_to_CID_cols)
-            # raise FileNotFoundError('Support file: \'map_inchikey_to_CID.csv\' not found. Please run pubchem_utils.py to download inchi key to cid mapping.')
+        map_inchikey_to_CID = pandas.DataFrame([], columns = self.map_inchikey_to_CID_cols)
+        if 'map_inchikey_to_CID' in auxillary:
+            try:
+                map_inchikey_to_CID = pandas.read_csv(os.path.join(self.auxillary_dir, 'map_inchikey_to_CID.csv'), sep = ';', index_col = None)
+            except FileNotFoundError:
+                pass
+                # raise FileNotFoundError('Support file: \'map_inchikey_to_CID.csv\' not found. Please run pubchem_utils.py to download inchi key to cid mapping.')
 
         assert len(map_inchikey_to_CID.columns) == len(self.map_inchikey_to_CID_cols)
         for i in range(len(map_inchikey_to_CID.columns)):
@@ -266,33 +639,36 @@ class Checker:
         map_inchikey_to_CID = map_inchikey_to_CID.squeeze()
 
         # map_inchikey_to_canonicalSMILES:
-        try:
-            with open(os.path.join(self.auxillary_dir, 'map_inchikey_to_canonicalSMILES.json'), 'r') as jsonfile:
-                map_inchikey_to_canonicalSMILES = json.load(jsonfile)
-        except FileNotFoundError:
-            map_inchikey_to_canonicalSMILES = {}
+        map_inchikey_to_canonicalSMILES = {}
+        if 'map_inchikey_to_canonicalSMILES' in auxillary:
+            map_inchikey_to_canonicalSMILES = load_json_map(os.path.join(self.auxillary_dir, 'map_inchikey_to_canonicalSMILES.json'))
 
         # map_inchikey_to_synonyms:
-        try:
-            with open(os.path.join(self.auxillary_dir, 'map_inchikey_to_synonyms.json'), 'r') as jsonfile:
-                map_inchikey_to_synonyms = json.load(jsonfile)
-        except FileNotFoundError:
-            map_inchikey_to_synonyms = {}
+        map_inchikey_to_synonyms = None
+        if 'map_inchikey_to_synonyms' in auxillary:
+            map_inchikey_to_synonyms = load_synonym_store(self.auxillary_dir)
+
+        # map_canonicalSMILES_to_isomers:
+        self.isomer_cache = None
+        if 'isomer_cache' in auxillary:
+            self.isomer_cache = IsomerCache(self.auxillary_dir, logger = self.logger)
+
+        # offline PubChem index:
+        self.pubchem_index = None
+        if 'map_inchikey_to_CID' in auxillary:
+            self.pubchem_index = load_pubchem_index(self.auxillary_dir)
 
         # map_name_to_inchikeys:
-        # try:
-        #     with open(os.path.join(self.auxillary_dir, 'map_name_to_inchikeys.json'), 'r') as jsonfile:
-        #         map_name_to_inchikeys = json.load(jsonfile)
-        # except FileNotFoundError:
-        #     map_name_to_inchikeys = {}
+        map_name_to_inchikeys = {}
+        if 'map_name_to_inchikeys' in auxillary:
+            map_name_to_inchikeys = load_json_map(os.path.join(self.auxillary_dir, 'map_name_to_inchikeys.json'))
 
-        #
         self.df_uniprot = df_uniprot
         self.map_inchikey_to_CID = map_inchikey_to_CID
         self.map_inchikey_to_canonicalSMILES = map_inchikey_to_canonicalSMILES
         self.map_inchikey_to_synonyms = map_inchikey_to_synonyms
-        # self.map_name_to_inchikeys = map_name_to_inchikeys
-        return df_uniprot, map_inchikey_to_CID, map_inchikey_to_canonicalSMILES, map_inchikey_to_synonyms # , map_name_to_inchikeys
+        self.map_name_to_inchikeys = map_name_to_inchikeys
+        return df_uniprot, map_inchikey_to_CID, map_inchikey_to_canonicalSMILES, map_inchikey_to_synonyms, map_name_to_inchikeys
 
     def _update_auxilary_df_uniprot(self, full_df):
         """
@@ -313,15 +689,35 @@ class Checker:
         new_idx = candidate_idx.difference(df_uniprot.index)
         if len(new_idx) > 0:
             self.logger.info('Updating df_uniprot...')
-            NEW = get_uniprot_sequences(new_idx.tolist())
-            NEW.set_index(self.df_uniprot_cols[0], drop = True, inplace = True)
-            df_uniprot = df_uniprot.append(NEW, ignore_index = False, verify_integrity = True)
-            df_uniprot.to_csv(os.path.join(self.auxillary_dir, 'uniprot_sequences.csv'), sep = ';', index = True)
+            df_uniprot = update_csv_table(os.path.join(self.auxillary_dir, 'uniprot_sequences.csv'), df_uniprot, new_idx.tolist(),
+                                          lambda ids: get_uniprot_sequences(ids).set_index(self.df_uniprot_cols[0], drop = True),
+                                          logger = self.logger, sep = ';', index = True)
         return df_uniprot
 
+    def _components(self, df):
+        """
+        Get long table with InChI keys of components of rows in df (see component_table in registry.py). The table is built once
+        in add_implied_columns and the rows of df are selected by index.
+        """
+        df_components = getattr(self, 'df_components', None)
+        if df_components is None:
+            return component_table(df['InChI Key'])
+        return df_components[df_components['_row_id'].isin(df.index)]
+
+    def _fetch_map_inchikey_to_CID(self, inchikeys, fetch = get_map_inchikey_to_CID):
+        """
+        get_map_inchikey_to_CID (or other fetch function, e.g. PubChemIndex.get_map_inchikey_to_CID) wrapped to pandas.Series in the format of \'map_inchikey_to_CID.csv\'.
+        """
+        NEW = fetch(inchikeys)
+        NEW = pandas.Series(NEW, dtype = float)
+        NEW.index.name = self.map_inchikey_to_CID_cols[0] # InChI Key
+        NEW.name = self.map_inchikey_to_CID_cols[1] # CID
+        return NEW
+
     def _update_auxilary_map_inchikey_to_CID(self, full_df):
         """
-        update \'map_inchikey_to_CID.csv\' with new InChI Keys found in full_df.
+        update \'map_inchikey_to_CID.csv\' with new InChI Keys found in full_df. If offline PubChem index is available
+        (see pubchem_index.py), InChI keys are looked up there first and PubChem is queried only for the rest.
 
         Parameters:
         -----------
@@ -334,19 +730,18 @@ class Checker:
             updated map_inchikey_to_CID
         """
         map_inchikey_to_CID = self.map_inchikey_to_CID.copy()
-        candidate_idx = full_df['InChI Key'].dropna()
-        candidate_idx = candidate_idx.str.split(' ').explode() # TODO: pandas FutureWarning for this row.
-        candidate_idx = pandas.Index(candidate_idx.unique())
+        candidate_idx = pandas.Index(self._components(full_df)['InChI Key'].unique())
         new_idx = candidate_idx.difference(map_inchikey_to_CID.index)
+        LOCAL = map_inchikey_to_CID.iloc[:0]
+        if len(new_idx) > 0 and self.pubchem_index is not None:
+            # InChI keys found in the offline index are not saved to the csv, only rows fetched from PubChem are.
+            LOCAL = self._fetch_map_inchikey_to_CID(new_idx.tolist(), fetch = self.pubchem_index.get_map_inchikey_to_CID)
+            new_idx = new_idx.difference(LOCAL.index)
         if len(new_idx) > 0:
             self.logger.info('Updating map_inchikey_to_CID...')
-            NEW = get_map_inchikey_to_CID(new_idx.tolist())
-            NEW = pandas.Series(NEW, dtype = float)
-            NEW.index.name = self.map_inchikey_to_CID_cols[0] # InChI Key
-            NEW.name = self.map_inchikey_to_CID_cols[1] # CID
-            map_inchikey_to_CID = map_inchikey_to_CID.append(NEW, ignore_index = False, verify_integrity = True)
-            map_inchikey_to_CID.to_csv(os.path.join(self.auxillary_dir, 'map_inchikey_to_CID.csv'), sep = ';')
-        return map_inchikey_to_CID
+            map_inchikey_to_CID = update_csv_table(os.path.join(self.auxillary_dir, 'map_inchikey_to_CID.csv'), map_inchikey_to_CID, new_idx.tolist(),
+                                                   self._fetch_map_inchikey_to_CID, logger = self.logger, sep = ';')
+        return pandas.concat([map_inchikey_to_CID, LOCAL[~LOCAL.index.isin(map_inchikey_to_CID.index)]])
 
     def _update_auxilary_map_inchikey_to_canonicalSMILES(self, full_df):
         """
@@ -364,16 +759,12 @@ class Checker:
         """
         map_inchikey_to_canonicalSMILES = self.map_inchikey_to_canonicalSMILES.copy()
         current_idx = pandas.Index(map_inchikey_to_canonicalSMILES.keys(), name = 'InChI Key')
-        candidate_idx = full_df['InChI Key'].dropna()
-        candidate_idx = candidate_idx.str.split(' ').explode() # TODO: pandas FutureWarning for this row.
-        candidate_idx = pandas.Index(candidate_idx.unique())
+        candidate_idx = pandas.Index(self._components(full_df)['InChI Key'].unique())
         new_idx = candidate_idx.difference(current_idx)
         if len(new_idx) > 0:
             self.logger.info('Updating map_inchikey_to_canonicalSMILES...')
-            NEW = get_map_inchikey_to_canonicalSMILES(new_idx.tolist())
-            map_inchikey_to_canonicalSMILES.update(NEW)
-            with open(os.path.join(self.auxillary_dir, 'map_inchikey_to_canonicalSMILES.json'), 'w') as jsonfile:
-                json.dump(map_inchikey_to_canonicalSMILES, jsonfile)
+            map_inchikey_to_canonicalSMILES = update_json_map(os.path.join(self.auxillary_dir, 'map_inchikey_to_canonicalSMILES.json'), map_inchikey_to_canonicalSMILES, new_idx.tolist(),
+                                                              get_map_inchikey_to_canonicalSMILES, logger = self.logger)
         return map_inchikey_to_canonicalSMILES
 
     def _update_auxilary_map_inchikey_to_synonyms(self, full_df):
@@ -387,21 +778,17 @@ class Checker:
         
         Returns:
         --------
-        map_inchikey_to_synonyms : dict
+        map_inchikey_to_synonyms : SynonymStore
             updated map_inchikey_to_synonyms
         """
-        map_inchikey_to_synonyms = self.map_inchikey_to_synonyms.copy()
-        current_idx = pandas.Index(map_inchikey_to_synonyms.keys(), name = 'InChI Key')
-        candidate_idx = full_df['InChI Key'].dropna()
-        candidate_idx = candidate_idx.str.split(' ').explode() # TODO: pandas FutureWarning for this row.
-        candidate_idx = pandas.Index(candidate_idx.unique())
-        new_idx = candidate_idx.difference(current_idx)
+        map_inchikey_to_synonyms = self.map_inchikey_to_synonyms
+        candidate_idx = pandas.Index(self._components(full_df)['InChI Key'].unique())
+        new_idx = candidate_idx[~map_inchikey_to_synonyms.isin(candidate_idx)]
         if len(new_idx) > 0:
             self.logger.info('Updating map_inchikey_to_synonyms...')
-            NEW = get_map_inchikey_to_synonyms(new_idx.tolist())
-            map_inchikey_to_synonyms.update(NEW)
-            with open(os.path.join(self.auxillary_dir, 'map_inchikey_to_synonyms.json'), 'w') as jsonfile:
-                json.dump(map_inchikey_to_synonyms, jsonfile)
+            path = os.path.join(self.auxillary_dir, 'map_inchikey_to_synonyms.json')
+            NEW = update_json_map(path, load_json_map(path), new_idx.tolist(), get_map_inchikey_to_synonyms, logger = self.logger)
+            map_inchikey_to_synonyms = load_synonym_store(self.auxillary_dir, NEW)
         return map_inchikey_to_synonyms
 
     # def _update_auxilary_map_name_to_inchikeys(self, full_df):
@@ -419,24 +806,31 @@ class Checker:
     #     return map_name_to_inchikeys
 
     
-    def _update_auxillary(self, full_df):
-        """
-        call and other operation necessery for all _update_auxillary_*.
-        """
-        self.df_uniprot = self._update_auxilary_df_uniprot(full_df)
-        self.map_inchikey_to_CID = self._update_auxilary_map_inchikey_to_CID(full_df)
-        self.map_inchikey_to_canonicalSMILES = self._update_auxilary_map_inchikey_to_canonicalSMILES(full_df)
-        self.map_inchikey_to_synonyms = self._update_auxilary_map_inchikey_to_synonyms(full_df)
+    def _update_auxillary(self, full_df, auxillary = None):
+        """
+        call and other operation necessery for all _update_auxillary_* of auxillary data in auxillary (all if None).
+        """
+        auxillary = self._auxillary_names(auxillary)
+        if 'df_uniprot' in auxillary:
+            self.df_uniprot = self._update_auxilary_df_uniprot(full_df)
+        if 'map_inchikey_to_CID' in auxillary:
+            self.map_inchikey_to_CID = self._update_auxilary_map_inchikey_to_CID(full_df)
+        if 'map_inchikey_to_canonicalSMILES' in auxillary:
+            self.map_inchikey_to_canonicalSMILES = self._update_auxilary_map_inchikey_to_canonicalSMILES(full_df)
+        if 'map_inchikey_to_synonyms' in auxillary:
+            self.map_inchikey_to_synonyms = self._update_auxilary_map_inchikey_to_synonyms(full_df)
         # self.map_name_to_inchikey = self._update_auxilary_map_name_to_inchikeys(full_df)
         return 
 
 
-    def add_implied_columns(self, full_df):
+    def add_implied_columns(self, full_df, auxillary = None):
         """
-        Add \'_Sequence\' and \'_MolID\' columns to df. 
+        Add \'_Sequence\' and \'_MolID\' columns to df. Only auxillary data in auxillary are loaded and updated (all if None, see _load_auxillary).
         
-        \'_Sequence\' column has retrieved sequences from UniProt in it (or keeping sequence if no UniProt ID is provided). 
-        \'_MolID\' column has InChI Key if available and canonical SMILES if InChI key is missing.
+        \'_Sequence\' column has retrieved sequences from UniProt in it (or keeping sequence if no UniProt ID is provided). Sequences in \'_Sequence\' and
+        \'Uniprot_Sequence\' are stored as IDs in sequence_table (see SequenceTable in sequences.py).
+        \'_MolID\' column has InChI Key if available and canonical SMILES if InChI key is missing. Values of \'_MolID\' are registered in mol_registry
+        and InChI keys of mixture components are split to df_components (see registry.py).
 
         Parameters:
         -----------
@@ -448,15 +842,20 @@ class Checker:
         df_join : pandas.DataFrame
             dataframe with added columns.
         """
-        self._load_auxillary()
-        self._update_auxillary(full_df)
+        self.df_components = component_table(full_df['InChI Key'])
+        self._load_auxillary(auxillary)
+        self._update_auxillary(full_df, auxillary)
         df_join = full_df.copy()
         if df_join["Uniprot ID"].isna().all():
             df_join['Uniprot_Sequence'] = float('nan')
         else:
             df_join = df_join.join(self.df_uniprot[['Uniprot_Sequence']], on = 'Uniprot ID', how = 'left')
-        df_join['_Sequence'] = df_join.apply(lambda x: merge_cols_with_priority(x, primary_col = 'Uniprot_Sequence', secondary_col = 'Sequence'), axis = 1)
+        self.sequence_table = SequenceTable()
+        df_join['Uniprot_Sequence'] = self.sequence_table.encode(df_join['Uniprot_Sequence'])
+        df_join['_Sequence'] = df_join['Uniprot_Sequence'].fillna(self.sequence_table.encode(df_join['Sequence']))
         df_join['_MolID'] = df_join.apply(lambda x: merge_cols_with_priority(x, primary_col = 'InChI Key', secondary_col = 'canonicalSMILES'), axis = 1)
+        self.mol_registry = MolRegistry(self.map_inchikey_to_canonicalSMILES)
+        self.mol_registry.register(df_join['_MolID'])
         return df_join
 
 
@@ -473,29 +872,29 @@ class Checker:
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
         """
         self.logger.info('STARTED: check_not_nan')
         passed = True
-        clean_df = full_df.copy()
+        reasons = self._no_failures(full_df)
         for case in self.not_nan_cols:
-            _df = clean_df
+            _df = full_df
             condition = _df[case].isna()
             if condition.any():
                 passed = False
                 fail_example = _df[condition]
                 self.logger.debug('FAIL in check_not_nan:  col: \'{}\''.format(case))
                 self.logger.debug(self._logging_format_dataframe(fail_example))
-                clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)] # Clean from found errors.
+                reasons = self._add_failures(reasons, fail_example.index, 'not_nan:{}'.format(case))
         if passed:
             self.logger.info('FINISHED: check_not_nan:  PASS')
         else:
             self.logger.warning('FINISHED: check_not_nan:  FAIL')
-        return clean_df, passed
+        return reasons, passed
 
 
     def check_conditioned_not_nan(self, full_df):
@@ -510,29 +909,29 @@ class Checker:
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
         """
         self.logger.info('STARTED: check_conditioned_not_nan')
         passed = True
-        clean_df = full_df.copy()
+        reasons = self._no_failures(full_df)
         for case in self.conditioned_not_nan_cols:
-            _df = clean_df[clean_df[case['cond_col']] == case['cond_val']]
+            _df = full_df[full_df[case['cond_col']] == case['cond_val']]
             condition = _df[case['cols']].isna().any(axis = 1)
             if condition.any():
                 passed = False
                 fail_example = _df[condition]
                 self.logger.debug('FAIL in check_conditioned_not_nan:  cond_col: \'{}\'  cond_val: \'{}\'  cols:  \'{}\''.format(*case.values()))
                 self.logger.debug(self._logging_format_dataframe(fail_example))
-                clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+                reasons = self._add_failures(reasons, fail_example.index, 'conditioned_not_nan:{}'.format(case['cond_val']))
         if passed:
             self.logger.info('FINISHED: check_conditioned_not_nan:  PASS')
         else:
             self.logger.warning('FINISHED: check_conditioned_not_nan:  FAIL')
-        return clean_df, passed
+        return reasons, passed
 
 
     @staticmethod
@@ -546,38 +945,77 @@ class Checker:
         except ValueError:
             return False
 
-    def _check_castable_multiple(self, x, _type, sep = None):
+    @staticmethod
+    def _castable(elements, _type):
         """
-        Try if input x is castable to a given data type _type. If sep is not None, x is first split and then each element is checked separately.
-        x passes the check if all elements inside are passing _check_castable.
-
-        This function is expected to be used in pandas apply.
+        Vectorized _check_castable. Strings are matched with patterns in _CAST_PATTERNS that follow the syntax accepted by float() and int(),
+        other values are converted by pandas.to_numeric (int needs a finite number). Types without pattern fall back to _check_castable.
 
         Parameters:
         -----------
-        x : Any
-            input
+        elements : pandas.Series
+            values to check.
 
         _type : object
             data type to try to cast to.
 
-        sep : str, optional (default=None)
-            separator if there are multiple entries.
-
         Returns:
         --------
-        passed : bool
-            result of the check.
+        castable : pandas.Series
+            boolean series with the same index as elements.
+        """
+        if _type not in _CAST_PATTERNS:
+            return elements.apply(lambda x: Checker._check_castable(x, _type)).astype(bool)
+        is_str = elements.map(type).eq(str)
+        castable = pandas.Series(False, index = elements.index)
+        if is_str.any():
+            castable[is_str] = elements[is_str].str.fullmatch(_CAST_PATTERNS[_type], flags = re.IGNORECASE)
+        other = ~is_str
+        if other.any():
+            values = pandas.to_numeric(elements[other], errors = 'coerce')
+            if _type is float:
+                castable[other] = values.notna() | elements[other].isna()
+            else:
+                castable[other] = numpy.isfinite(values.astype(float))
+        return castable.astype(bool)
+
+    @staticmethod
+    def _split_entries(col, sep = None):
         """
-        passed = True
-        if isinstance(x, str) and sep is not None:
-            for ele in x.split(sep):
-                if not self._check_castable(ele, _type):
-                    passed = False
-        else:
-            if not self._check_castable(x, _type):
-                passed = False
-        return passed
+        Split string entries of col by sep to one element per row (the index of col is repeated). Other entries and all entries if sep is None are kept as they are.
+        """
+        is_str = col.map(type).eq(str)
+        if sep is None or not is_str.any():
+            return col
+        elements = col.astype(object).where(is_str)
+        elements = elements.where(~is_str, elements.str.split(sep))
+        return elements.where(is_str, col).explode()
+
+    @staticmethod
+    def _all_elements(condition, index):
+        """
+        Reduce condition on elements (see _split_entries) to rows with index.
+        """
+        return condition.groupby(level = 0).all().reindex(index, fill_value = True)
+
+    @staticmethod
+    def _check_unique(col, check):
+        """
+        Evaluate check (function taking pandas.Series and returning boolean pandas.Series with the same index) only on distinct values of col
+        and map the result back to all rows. col must not contain NaN.
+        """
+        codes, uniques = pandas.factorize(col)
+        result = check(pandas.Series(uniques, dtype = object))
+        return pandas.Series(result.values[codes], index = col.index)
+
+    @staticmethod
+    def _remove_patterns(col, patterns):
+        """
+        Replace patterns in col with empty string. Single character patterns are literal (as in pandas 1.x str.replace), longer ones are regular expressions.
+        """
+        for pat in patterns:
+            col = col.str.replace(re.escape(pat) if len(pat) == 1 else pat, '', regex = True)
+        return col
 
     def check_castable(self, full_df):
         """
@@ -594,74 +1032,37 @@ class Checker:
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
         """
         self.logger.info('STARTED: check_castable')
         passed = True
-        clean_df = full_df
+        reasons = self._no_failures(full_df)
         for case in self.castable_cols:
-            _df = clean_df
+            _df = full_df
             _df = _df.dropna(subset = [case['col']])
             if case['except_values'] is not None:
-                for except_value in case['except_values']:
-                    _df = _df[~(_df[case['col']] == except_value)]
-            if case['ignore_patterns'] is not None:
-                for pat in case['ignore_patterns']:
-                    _df[case['col']] = _df[case['col']].astype(str).str.replace(pat, '', regex = True)
-            # if case['col'] == "Value_Screen":
-            #     condition = _df[case['col']].apply(lambda x: x.replace(" ","").replace('.','').isdigit() if isinstance(x, str) else isinstance(x, (int, float))) #Split and check (see mutation)
-            # else:
-            #     condition = _df[case['col']].apply(lambda x: self._check_castable(x, _type = case['Type']))
-            condition = _df[case['col']].apply(lambda x: self._check_castable_multiple(x, _type = case['Type'], sep = case['sep']))
+                _df = _df[~_df[case['col']].isin(case['except_values'])]
+            def check(values, case = case):
+                if case['ignore_patterns'] is not None:
+                    values = self._remove_patterns(values.astype(str), case['ignore_patterns'])
+                elements = self._split_entries(values, sep = case['sep'])
+                return self._all_elements(self._castable(elements, case['Type']), values.index)
+            condition = self._check_unique(_df[case['col']], check)
             if not condition.all():
                 passed = False
                 fail_example = _df[~condition]
                 self.logger.debug('FAIL in check_castable:  col: \'{}\'  type: \'{}\''.format(*case.values()))
                 self.logger.debug(self._logging_format_dataframe(fail_example))
-                clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+                reasons = self._add_failures(reasons, fail_example.index, 'castable:{}'.format(case['col']))
         if passed:
             self.logger.info('FINISHED: check_castable:  PASS')
         else:
             self.logger.warning('FINISHED: check_castable:  FAIL')
-        return clean_df, passed
-
-
-    def _check_not_castable_multiple(self, x, _type, sep = None):
-        """
-        Try if input x is castable to a given data type _type and if yes the check fails. If sep is not None, x is first split and then each 
-        element is checked separately. x passes the check if all elements inside are *not* passing _check_castable.
-
-        This function is expected to be used in pandas apply.
-
-        Parameters:
-        -----------
-        x : Any
-            input
-
-        _type : object
-            data type to try to cast to.
-
-        sep : str, optional (default=None)
-            separator if there are multiple entries.
-
-        Returns:
-        --------
-        passed : bool
-            result of the check.
-        """
-        passed = True
-        if isinstance(x, str) and sep is not None:
-            for ele in x.split(sep):
-                if self._check_castable(ele, _type):
-                    passed = False
-        else:
-            if self._check_castable(x, _type):
-                passed = False
-        return passed
+        return reasons, passed
 
 
     def check_not_castable(self, full_df):
@@ -679,45 +1080,39 @@ class Checker:
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
         """
         self.logger.info('STARTED: check_not_castable')
         passed = True
-        clean_df = full_df
+        reasons = self._no_failures(full_df)
         for case in self.not_castable_cols:
-            _df = clean_df
+            _df = full_df
             _df = _df.dropna(subset = [case['col']]) # TODO: Is this necessary since we clean df along the way (NaN can be tested before this)? ?
             if case['except_values'] is not None:
-                for except_value in case['except_values']:
-                    _df = _df[~(_df[case['col']] == except_value)]
-            if case['ignore_patterns'] is not None:
-                for pat in case['ignore_patterns']:
-                    _df[case['col']] = _df[case['col']].str.replace(pat, '', regex = True)
-            # condition = ~_df[case['col']].apply(lambda x: self._check_castable(x, _type = case['Type']))
-            condition = _df[case['col']].apply(lambda x: self._check_not_castable_multiple(x, _type = case['Type'], sep = case['sep']))
+                _df = _df[~_df[case['col']].isin(case['except_values'])]
+            def check(values, case = case):
+                if case['ignore_patterns'] is not None:
+                    values = self._remove_patterns(values, case['ignore_patterns'])
+                elements = self._split_entries(values, sep = case['sep'])
+                return self._all_elements(~self._castable(elements, case['Type']), values.index)
+            condition = self._check_unique(_df[case['col']], check)
             if not condition.all():
                 passed = False
                 fail_example = _df[~condition]
                 self.logger.debug('FAIL in check_not_castable:  col: \'{}\'  type: \'{}\''.format(*case.values()))
                 self.logger.debug(self._logging_format_dataframe(fail_example))
-                clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+                reasons = self._add_failures(reasons, fail_example.index, 'not_castable:{}'.format(case['col']))
         if passed:
             self.logger.info('FINISHED: check_not_castable:  PASS')
         else:
             self.logger.warning('FINISHED: check_not_castable:  FAIL')
-        return clean_df, passed
+        return reasons, passed
 
     
-    @staticmethod
-    def _check_concat_format(x, pat, sep):
-        if sep is None:
-            sep = ' '
-        return all([True if re.match(pat, s) else False for s in x.split(sep)])
-
     def check_format(self, full_df):
         """
         Check if entries in columns given by \'format_cols\' have correct format. For example if InChI Key is 27 characters 
@@ -732,30 +1127,33 @@ class Checker:
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
         """
         self.logger.info('STARTED: check_format')
         passed = True
-        clean_df = full_df
+        reasons = self._no_failures(full_df)
         for case in self.format_cols:
-            _df = clean_df
+            _df = full_df
             _df = _df.dropna(subset = [case['col']]) # NaNs are checked in check_not_nan
-            condition = _df[case['col']].apply(lambda x: self._check_concat_format(x, case['pattern'], case['sep']))
+            def check(values, case = case):
+                elements = self._split_entries(values, sep = case['sep'] if case['sep'] is not None else ' ')
+                return self._all_elements(elements.str.match(case['pattern']).fillna(False).astype(bool), values.index)
+            condition = self._check_unique(_df[case['col']], check)
             if not condition.all():
                 passed = False
                 fail_example = _df[~condition]
                 self.logger.debug('FAIL in check_format:  col: \'{}\'  pattern: \'{}\'  sep:  \'{}\''.format(*case.values()))
                 self.logger.debug(self._logging_format_dataframe(fail_example))
-                clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+                reasons = self._add_failures(reasons, fail_example.index, 'format:{}'.format(case['col']))
         if passed:
             self.logger.info('FINISHED: check_format:  PASS')
         else:
             self.logger.warning('FINISHED: check_format:  FAIL')
-        return clean_df, passed
+        return reasons, passed
 
 
     def check_mixture_format(self, full_df):
@@ -770,19 +1168,19 @@ class Checker:
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
         """
         self.logger.info('STARTED: check_mixture_format')
         passed = True
-        clean_df = full_df
+        reasons = self._no_failures(full_df)
 
         sep = ' ' # TODO check separator here
 
-        _df = clean_df[clean_df['Mixture'].str.lower() != 'mixture']
+        _df = full_df[full_df['Mixture'].str.lower() != 'mixture']
         # condition_mono_sum = ~_df['InChI Key'].dropna().str.contains(sep)
         condition_mono_sum = ~_df['_MolID'].dropna().str.contains(sep)
         if not condition_mono_sum.all():
@@ -790,9 +1188,9 @@ class Checker:
             self.logger.debug('FAIL in check_mixture_format: Mixture: \'mono or sum of isomers\', \'_MolID\' contains \'{}\''.format(sep))
             fail_example = _df[~condition_mono_sum]
             self.logger.debug(self._logging_format_dataframe(fail_example))
-            clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+            reasons = self._add_failures(reasons, fail_example.index, 'mixture_format:separator_in_mono')
 
-        _df = clean_df[clean_df['Mixture'].str.lower() == 'mixture']
+        _df = full_df[full_df['Mixture'].str.lower() == 'mixture']
         # condition_mix = _df['InChI Key'].dropna().str.contains(sep)
         condition_mix = _df['_MolID'].dropna().str.contains(sep)
         if not condition_mix.all():
@@ -800,28 +1198,18 @@ class Checker:
             self.logger.debug('FAIL in check_mixture_format: Mixture:  \'mixture\', \'InChI Key\' without \'{}\''.format(sep))
             fail_example = _df[~condition_mix]
             self.logger.debug(self._logging_format_dataframe(fail_example))
-            clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+            reasons = self._add_failures(reasons, fail_example.index, 'mixture_format:no_separator_in_mixture')
 
         if passed:
             self.logger.info('FINISHED: check_mixture_format:  PASS')
         else:
             self.logger.warning('FINISHED: check_mixture_format:  FAIL')
-        return clean_df, passed
-
-    @staticmethod
-    def _check_inchikey_on_pubchem(x, list_inchikeys):
-        passed = True
-        if x == x:
-            x = x.split()
-            for inchikey in x:
-                if inchikey not in list_inchikeys:
-                    passed = False
-        return passed
+        return reasons, passed
 
     def check_inchikey_on_pubchem(self, full_df):
         """
         Check if InChI keys in \'InChI Key\' column can be found on PubChem. This is using \'map_inchikey_to_CID\' and 
-        internally pubchempy.get_compounds (see get_map_inchikey_to_CID in pubchem_utils.py). For multiple elements the
+        internally offline PubChem index if available (see pubchem_index.py) and pubchempy.get_compounds (see get_map_inchikey_to_CID in pubchem_utils.py). For multiple elements the
         check is performed on each separately. Separator is assumed to be *space*.
 
         Parameters:
@@ -831,65 +1219,85 @@ class Checker:
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
         """
         self.logger.info('STARTED: check_inchikey_on_pubchem')
         passed = True
-        clean_df = full_df.copy()
-        _df = clean_df
-        condition = _df['InChI Key'].apply(lambda x: self._check_inchikey_on_pubchem(x, list(self.map_inchikey_to_CID.index)))
+        reasons = self._no_failures(full_df)
+        _df = full_df
+        df_components = self._components(_df)
+        df_components = df_components[df_components['InChI Key'] != ''] # Same as str.split() without separator.
+        condition = self._reduce_components(df_components['InChI Key'].isin(self.map_inchikey_to_CID.index), df_components, _df.index, 'all', True)
         if not condition.all():
             passed = False
             fail_example = _df[~condition]
             self.logger.debug(self._logging_format_dataframe(fail_example))
-            clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+            reasons = self._add_failures(reasons, fail_example.index, 'inchikey_on_pubchem')
         if passed:
             self.logger.info('FINISHED: check_inchikey_on_pubchem:  PASS')
         else:
             self.logger.warning('FINISHED: check_inchikey_on_pubchem:  FAIL')
-        return clean_df, passed
+        return reasons, passed
 
 
+    def _component_smiles(self, df):
+        """
+        Get long table with canonical SMILES of components of rows in df. InChI keys of components (see _components) are mapped using
+        \'map_inchikey_to_canonicalSMILES\', rows without InChI key have their \'canonicalSMILES\' as the only component.
+
+        Returns:
+        --------
+        df_components : pandas.DataFrame
+            dataframe with columns \'_row_id\', \'_component\', \'InChI Key\' (NaN for rows without InChI key) and \'canonicalSMILES\'.
+        """
+        df_components = self._components(df).copy()
+        df_components['canonicalSMILES'] = df_components['InChI Key'].map(self.map_inchikey_to_canonicalSMILES)
+        missing = df_components.loc[df_components['canonicalSMILES'].isna(), 'InChI Key']
+        if len(missing) > 0:
+            raise KeyError('InChI keys not in map_inchikey_to_canonicalSMILES: {}'.format(missing.unique().tolist()))
+        smiles = df.loc[df['InChI Key'].isna(), 'canonicalSMILES'].dropna()
+        df_smiles = pandas.DataFrame({'_row_id' : smiles.index, '_component' : 0, 'InChI Key' : float('nan'), 'canonicalSMILES' : smiles.values})
+        return pandas.concat([df_components, df_smiles], ignore_index = True)
+
     @staticmethod
-    def _check_chirality(x, _map):
+    def _reduce_components(condition, df_components, index, how, fill_value):
+        """
+        Reduce condition on components to rows using groupby with how (\'all\' or \'any\'). Rows without components get fill_value.
         """
-        Check if molecules that are supposed to be achiral have more than 1 stereoisomer. 
+        condition = condition.groupby(df_components['_row_id']).agg(how)
+        return condition.reindex(index, fill_value = fill_value).astype(bool)
 
-        InChI keys containing \'-UHFFFAOYSA-\' should be achiral as well as all having cacnonical SMILES.
+    def _has_isomers(self, df):
+        """
+        Check for each row of df if the molecule has more than 1 stereoisomer. For InChI keys only components containing \'-UHFFFAOYSA-\'
+        are considered and the row has isomers if any of them has. Isomers of all molecules are counted at once up to 2 (see IsomerCache.counts).
 
-        Parameters:
-        -----------
-        x : pandas.Series
-            row of the dataframe.
+        Returns:
+        --------
+        has_isomers : pandas.Series
+            boolean series with the same index as df.
 
-        _map : dict
-            mapping from InChI key to canonical SMILES.
+        timed_out : pandas.Series
+            boolean series with the same index as df, True for rows with a component whose isomers were not counted within the time budget.
+            has_isomers of these rows is not known.
         """
-        passed = True
-        if x['InChI Key'] == x['InChI Key']:
-            for inchikey in x['InChI Key'].split(' '):
-                if '-UHFFFAOYSA-' in inchikey:
-                    isomers = enumerate_isomers(_map[inchikey])
-                    # mol = Chem.MolFromSmiles(_map[inchikey])
-                    # chiralCenters = Chem.FindMolChiralCenters(mol, force=True, includeUnassigned=True, includeCIP=False, useLegacyImplementation=False)
-                    # isomers = tuple(EnumerateStereoisomers(mol))
-                    if len(isomers) > 1:
-                        passed = False
-        elif x["canonicalSMILES"] == x["canonicalSMILES"]:
-            isomers = enumerate_isomers(x["canonicalSMILES"])
-            if len(isomers) > 1:
-                passed = False
-        return passed
+        df_components = self._component_smiles(df)
+        df_components = df_components[df_components['InChI Key'].isna() | df_components['InChI Key'].str.contains('-UHFFFAOYSA-', regex = False)]
+        counts = self.isomer_cache.counts(df_components['canonicalSMILES'], cap = 2)
+        n_isomers = df_components['canonicalSMILES'].map(counts).astype(float)
+        has_isomers = self._reduce_components(n_isomers > 1, df_components, df.index, 'any', False)
+        timed_out = self._reduce_components(n_isomers.isna(), df_components, df.index, 'any', False)
+        return has_isomers, timed_out
 
     def check_chirality(self, full_df):
         """
         For InChI keys containing \'-UHFFFAOYSA-\' and for canonical SMILES check if number of stereoisomers is 1. These records should not have isomers
         and check fails if there are any (i.e. more than 1). For multiple elements the check is performed for each element and separator is assumed to
-        be *space*. NaNs are ignored. Isomers are identified using rdkit.Chem.EnumerateStereoisomers.EnumerateStereoisomers (see enumerate_isomers is utils.py).
+        be *space*. NaNs are ignored. Isomers are counted using rdkit.Chem.EnumerateStereoisomers (see count_isomers is utils.py).
 
         InChI keys are mapped to canonical SMILES using \'map_inchikey_to_canonicalSMILES\' and stereoisomers are identified using these SMILES.
 
@@ -900,8 +1308,8 @@ class Checker:
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
@@ -912,60 +1320,62 @@ class Checker:
         """
         self.logger.info('STARTED: check_chirality')
         passed = True
-        clean_df = full_df.copy()
+        reasons = self._no_failures(full_df)
+
+        has_isomers, timed_out = self._has_isomers(full_df[full_df['Mixture'].isin(["mono", "sum of isomers"])])
+
+        # Molecules over the time budget are reported separately, their number of isomers is not guessed.
+        if timed_out.any():
+            passed = False
+            fail_example = full_df.loc[timed_out[timed_out].index]
+            self.logger.debug(self._logging_format_dataframe(fail_example))
+            reasons = self._add_failures(reasons, fail_example.index, 'chirality:timeout')
 
-        _df = clean_df[clean_df['Mixture'] == "mono"]
-        condition = _df.apply(lambda x: self._check_chirality(x, _map = self.map_inchikey_to_canonicalSMILES), axis=1)
+        _df = full_df[full_df['Mixture'] == "mono"]
+        _df = _df[~timed_out.loc[_df.index]]
+        condition = ~has_isomers.loc[_df.index]
         if not condition.all():
             passed = False
             fail_example = _df[~condition]
             self.logger.debug(self._logging_format_dataframe(fail_example))
-            clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+            reasons = self._add_failures(reasons, fail_example.index, 'chirality:mono_with_isomers')
 
-        _df = clean_df[clean_df['Mixture'] == "sum of isomers"]
-        condition = ~_df.apply(lambda x: self._check_chirality(x, _map = self.map_inchikey_to_canonicalSMILES), axis=1)
+        _df = full_df[full_df['Mixture'] == "sum of isomers"]
+        _df = _df[~timed_out.loc[_df.index]]
+        condition = has_isomers.loc[_df.index]
         if not condition.all():
             passed = False
             fail_example = _df[~condition]
             self.logger.debug(self._logging_format_dataframe(fail_example))
-            clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+            reasons = self._add_failures(reasons, fail_example.index, 'chirality:sum_of_isomers_without_isomers')
         
         if passed:
             self.logger.info('FINISHED: check_chirality:  PASS')
         else:
             self.logger.warning('FINISHED: check_chirality:  FAIL')
-        return clean_df, passed
+        return reasons, passed
 
     @staticmethod
     def _clean_string_name(x):
         """
-        Perform string cleaning and normalization on molecule's name.
+        Perform string cleaning and normalization on molecule's name. See clean_string_name in utils.py.
         """
-        try:
-            x_clean = re.sub(r'\s+','', x.strip()).lower()
-            x_clean = re.sub(r'[0-9]{0,1}r\/[0-9]{0,1}s', '', x_clean)
-            x_clean = re.sub(r'[0-9]{0,1}e,[0-9]{0,1}z', '', x_clean)
-            x_clean = re.sub(r'[0-9]{1}[ez]', '', x_clean)
-            x_clean = x_clean.replace(",sumofisomers", "").replace("(+/-)-","").replace("-","").replace("+","")
-            x_clean = x_clean.replace("\u03b1","alpha").replace("\u03B4","delta").replace("\u03B3","gamma").replace("\u03B2","beta")
-            x_clean = x_clean.replace("d","").replace("l","")
-            x_clean = x_clean.replace("(","").replace(")","")
-        except Exception as e:
-            print(x)
-            raise e
-        return x_clean
-
-    def _check_inchikey_vs_name(self, x, cond_col, test_col, _map):
+        return clean_string_name(x)
+
+    def _check_inchikey_vs_name(self, df, cond_col, test_col, _map):
         """
         Check if text in \'test_col\' is in the list of possible synonyms for \'cond_col\'. It is mainly used to check if name of molecule is in synonyms retrieved
         from PubChem by InChI key.
 
-        This is expected to be used with pandas apply.
+        Synonyms of each identifier are normalized into a set once (for SynonymStore the normalized synonyms are precomputed and
+        persisted with the cache) and each unique text is normalized once, so each row is a single set-membership test.
+        For SynonymStore, rows without exact match pass if the similarity to the closest synonym is at least
+        \'name_similarity_threshold\' and the numbers (locants) of both are the same (see SynonymStore.best_matches).
 
         Parameters:
         -----------
-        x : pandas.Series
-            row of a dataframe
+        df : pandas.DataFrame
+            dataframe being processed
 
         cond_col : str
             name of the column containing identifier. Entry from here are mapped to synonyms using _map.
@@ -973,28 +1383,47 @@ class Checker:
         test_col : str
             name of the column with text that should be in the list of synonyms.
 
-        _map : dict
+        _map : dict or SynonymStore
             mapping form identifier to synonyms.
 
+        Returns:
+        --------
+        condition : pandas.Series
+            boolean series with the same index as df. True if the row passed.
+
         Notes:
         ------
         This works only with non-mixtures only, because mixtures can have name that is unrelated to names of the elements inside.
         *Entries in \'cond_col\' that are not in _map.keys() are ignored*.
         """
-        # TODO: This is not checking for cols not in map.keys() ! ! !
-        passed = True
-        if x[cond_col] in _map.keys():
-            x_clean = self._clean_string_name(x[test_col])
-            
-            for synonym in _map[x[cond_col]]:
-                try: 
-                    self._clean_string_name(synonym)
-                except Exception as e:
-                    print(_map[x[cond_col]], x[cond_col])
-                    raise e
-            if not x_clean in [self._clean_string_name(synonym) for synonym in _map[x[cond_col]]]:
-                passed = False
-        return passed
+        condition = pandas.Series(True, index = df.index)
+        if isinstance(_map, SynonymStore):
+            in_map = pandas.Series(_map.isin(df[cond_col]), index = df.index)
+        else:
+            in_map = df[cond_col].isin(list(_map.keys()))
+        ids = df.loc[in_map, cond_col]
+        values = df.loc[in_map, test_col]
+
+        if isinstance(_map, SynonymStore):
+            synonym_sets = {key : _map.clean_synonym_set(key) for key in ids.unique()}
+        else:
+            synonym_sets = {key : frozenset(self._clean_string_name(synonym) for synonym in _map[key]) for key in ids.unique()}
+        clean_values = {value : self._clean_string_name(value) for value in values.unique()}
+
+        condition[in_map] = [clean_values[value] in synonym_sets[key] for key, value in zip(ids, values)]
+
+        if isinstance(_map, SynonymStore) and self.name_similarity_threshold is not None and not condition.all():
+            ids = ids[~condition[in_map]]
+            matches = _map.best_matches(ids, values[ids.index].map(clean_values), same_locants = True)
+            accepted = matches['score'] >= self.name_similarity_threshold
+            if accepted.any():
+                self.logger.debug('check_inchikey_vs_name: {} names accepted by similarity to synonyms: \n'.format(accepted.sum()) +
+                                  df.loc[accepted[accepted].index, [cond_col, test_col]].join(matches).head(20).to_string(max_colwidth = 50))
+            condition[accepted[accepted].index] = True
+            if not accepted.all():
+                self.logger.debug('check_inchikey_vs_name: closest synonyms of failed names: \n' +
+                                  df.loc[accepted[~accepted].index, [cond_col, test_col]].join(matches).head(20).to_string(max_colwidth = 50))
+        return condition
 
     def check_inchikey_vs_name(self, full_df):
         """
@@ -1007,8 +1436,8 @@ class Checker:
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
@@ -1020,21 +1449,21 @@ class Checker:
         # TODO: For now this is checked only for non-mixtures.
         self.logger.info('STARTED: check_inchikey_vs_name')
         passed = True
-        clean_df = full_df.copy()
+        reasons = self._no_failures(full_df)
 
-        # _df = clean_df[clean_df['Mixture'] == 'mixture']
+        # _df = full_df[full_df['Mixture'] == 'mixture']
         # _df = _df.dropna(subset = ['Name'])
-        # condition_name = _df.apply(lambda x: self._check_inchikey_vs_name(x, cond_col = 'Name', test_col = 'InChI Key', _map = self.map_name_to_inchikeys), axis = 1)
+        # condition_name = self._check_inchikey_vs_name(_df, cond_col = 'Name', test_col = 'InChI Key', _map = self.map_name_to_inchikeys)
         # if not condition_name.all():
         #     passed = False
         #     self.logger.debug('FAIL in check_inchikey_vs_name: cond_col: \'Name\', test_col: \'InChI Key\'')
         #     fail_example = _df[~condition_name]
         #     self.logger.debug(self._logging_format_dataframe(fail_example))
-        #     clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+        #     reasons = self._add_failures(reasons, fail_example.index, 'inchikey_vs_name:name')
 
-        _df = clean_df[clean_df['Mixture'] != 'mixture']
+        _df = full_df[full_df['Mixture'] != 'mixture']
         _df = _df.dropna(subset = ['InChI Key'])
-        condition_inchikey = _df.apply(lambda x: self._check_inchikey_vs_name(x, cond_col = 'InChI Key', test_col = 'Name', _map = self.map_inchikey_to_synonyms), axis = 1)
+        condition_inchikey = self._check_inchikey_vs_name(_df, cond_col = 'InChI Key', test_col = 'Name', _map = self.map_inchikey_to_synonyms)
         if not condition_inchikey.all():
             passed = False
             self.logger.debug('FAIL in check_inchikey_vs_name: cond_col: \'InChI Key\', test_col: \'Name\'')
@@ -1042,58 +1471,19 @@ class Checker:
             print(fail_example["InChI Key"].unique())
             print(len(fail_example["InChI Key"].unique()))
             self.logger.debug(self._logging_format_dataframe(fail_example))
-            clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+            reasons = self._add_failures(reasons, fail_example.index, 'inchikey_vs_name:inchikey')
 
         if passed:
             self.logger.info('FINISHED: check_inchikey_vs_name:  PASS')
         else:
             self.logger.warning('FINISHED: check_inchikey_vs_name:  FAIL')
-        return clean_df, passed
+        return reasons, passed
 
 
-    @staticmethod
-    def _check_mutation(row, seq_col, mutation_col):
-        """
-        Check if amino acid that is mutated is in original sequence at the correct position.
-
-        This function is expected to be used with pandas apply.
-
-        Parameters:
-        -----------
-        row : pandas.Series
-            row in the dataframe
-
-        seq_col : str
-            name of the column with sequence information
-
-        mutation_col : str
-            name of the column containing mutation.
-
-        Returns:
-        --------
-        passed : bool
-            result of the check.
-        """
-        seq = row[seq_col]
-        try:
-            mutations = row[mutation_col].strip().replace('\s\s+', '_').split('_')
-            passed = True
-            for mutation in mutations:
-                _from = mutation[0]
-                _to = mutation[-1]
-                _position = int(mutation[1:-1]) - 1
-                if _position >= len(seq):
-                    passed = False
-                elif not seq[_position] == _from:
-                    passed = False
-        except Exception as e:
-            print(row[mutation_col])
-            raise e
-        return passed
-
     def check_mutation(self, full_df):
         """
         Check if amino acid that is supposed to be mutated at a given position can be found on that position.
+        All mutations are validated at once (see validate_mutations in mutations.py) and each failed mutation is logged with its context in the sequence.
 
         Parameters:
         -----------
@@ -1102,32 +1492,34 @@ class Checker:
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
         """
         self.logger.info('STARTED: check_mutation')
         passed = True
-        clean_df = full_df
-        _df = clean_df
+        reasons = self._no_failures(full_df)
+        _df = full_df
         if _df["Mutation"].isna().all():
             passed = True
         else:
             _df = _df.dropna(subset = ['Mutation'])
-            condition = _df.apply(lambda x: self._check_mutation(x, seq_col='_Sequence', mutation_col='Mutation'), axis = 1)
+            condition, failed_mutations = validate_mutations(_df, mutation_col = 'Mutation', seq_col = '_Sequence', sequence_table = self.sequence_table)
             if not condition.all():
                 passed = False
                 fail_example = _df[~condition]
                 self.logger.debug('FAIL in check_mutation')
+                for message in failed_mutations['message']:
+                    self.logger.debug(message)
                 self.logger.debug(self._logging_format_dataframe(fail_example))
-                clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+                reasons = self._add_failures(reasons, fail_example.index, 'mutation')
         if passed:
             self.logger.info('FINISHED: check_mutation:  PASS')
         else:
             self.logger.warning('FINISHED: check_mutation:  FAIL')
-        return clean_df, passed
+        return reasons, passed
 
 
     @staticmethod
@@ -1140,15 +1532,49 @@ class Checker:
             return x
 
     @staticmethod
-    def _check_consistency(x, col):
-        return len(x[col].unique()) == 1
+    def _check_consistency(df, by, col, dropna = True):
+        """
+        Check if all rows in each group of df (grouped by columns in by) have the same value in col. NaN counts as a value.
+        Groups are compared at once using groupby transform (no callback per group).
+
+        Parameters:
+        -----------
+        df : pandas.DataFrame
+            dataframe being processed.
+
+        by : list
+            columns to group by.
+
+        col : str
+            column that should have one value in each group.
+
+        dropna : bool
+            passed to groupby. If True, rows with NaN in by are not checked.
+
+        Returns:
+        --------
+        condition : pandas.Series
+            boolean series with the same index as df, False for rows in groups with more than 1 value in col.
+        """
+        n_values = df.groupby(by, dropna = dropna, sort = False)[col].transform('nunique', dropna = False)
+        return ~(n_values > 1)
 
     @staticmethod
-    def _check_consistency_examples(x, col):
+    def _check_consistency_examples(df, by, col):
+        """
+        Get examples that violate _check_consistency (distinct values of col for each group).
+        """
+        return df.groupby(by)[col].unique()
+
+    def _add_mutated_columns(self, df):
         """
-        Get examples that violate check_mutated_sequence_consistency.
+        Add \'mutated_Sequence\' (IDs in sequence_table), \'ordered_Mutation\' and \'mutated_Uniprot ID\' columns to a copy of df.
         """
-        return x[col].unique()
+        df = df.copy()
+        df['mutated_Sequence'] = mutate_sequence_ids(df, self.sequence_table, mutation_col = 'Mutation', seq_col = '_Sequence')
+        df['ordered_Mutation'] = df['Mutation'].apply(lambda x: self.order_mutations(x, sep = '_'))
+        df['mutated_Uniprot ID'] = df.apply(lambda x: x['Uniprot ID'] + '_' + x['ordered_Mutation'] if (isinstance(x['ordered_Mutation'], str)) & (~isinstance(x['Uniprot ID'], float)) else x['Uniprot ID'], axis = 1)#In case of Mutation but no Uniprot ID 
+        return df
 
     def check_mutated_sequence_consistency(self, full_df):
         """
@@ -1164,8 +1590,8 @@ class Checker:
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
@@ -1176,56 +1602,51 @@ class Checker:
         """
         self.logger.info('STARTED: check_mutated_sequence_consistency')
         passed = True
-        clean_df = full_df.copy()
-        clean_df['mutated_Sequence'] = clean_df.apply(lambda x: perform_mutation(x, mutation_col = 'Mutation', seq_col = '_Sequence'), axis = 1)
-        clean_df['ordered_Mutation'] = clean_df['Mutation'].apply(lambda x: self.order_mutations(x, sep = '_'))
-        clean_df['mutated_Uniprot ID'] = clean_df.apply(lambda x: x['Uniprot ID'] + '_' + x['ordered_Mutation'] if (isinstance(x['ordered_Mutation'], str)) & (~isinstance(x['Uniprot ID'], float)) else x['Uniprot ID'], axis = 1)#In case of Mutation but no Uniprot ID 
+        reasons = self._no_failures(full_df)
+        df_mutated = self._add_mutated_columns(full_df)
         
-        _df = clean_df.copy()
+        _df = df_mutated
         if not _df['Uniprot ID'].isna().all():
             _df = _df.dropna(subset = ['Uniprot ID'])
-        condition_seq = _df.groupby(['mutated_Sequence','species']).apply(lambda x : self._check_consistency(x, col = 'mutated_Uniprot ID'))
+        condition_seq = self._check_consistency(_df, by = ['mutated_Sequence','species'], col = 'mutated_Uniprot ID')
         if not condition_seq.all():
             passed = False
             self.logger.debug('FAIL in check_mutated_sequence_consistency: groupby: \'mutated_Sequence\'')
-            fail_example = _df[_df['mutated_Sequence'].isin(condition_seq[~condition_seq].index)]
-            _fail_example = fail_example.groupby(['mutated_Sequence','species']).apply(lambda x : self._check_consistency_examples(x, col = 'mutated_Uniprot ID'))
+            fail_example = _df[~condition_seq]
             self.logger.debug(self._logging_format_dataframe(fail_example))
-            self.logger.debug(_fail_example)
-            clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+            self.logger.debug(LazyText(self._check_consistency_examples, fail_example, by = ['mutated_Sequence','species'], col = 'mutated_Uniprot ID'))
+            reasons = self._add_failures(reasons, fail_example.index, 'mutated_sequence_consistency:mutated_Sequence')
 
-        _df = clean_df.copy()
+        _df = df_mutated[reasons.isna()] # Rows that passed the first step.
         if _df['Uniprot ID'].isna().all():
             passed = True
         else:
             _df = _df.dropna(subset = ['Uniprot ID'])
-            condition_id = _df.groupby(['mutated_Uniprot ID']).apply(lambda x : self._check_consistency(x, col = 'mutated_Sequence'))
+            condition_id = self._check_consistency(_df, by = ['mutated_Uniprot ID'], col = 'mutated_Sequence')
             if not condition_id.all():
                     passed = False
                     self.logger.debug('FAIL in check_mutated_sequence_consistency: groupby: \'mutated_Uniprot ID\'')
-                    fail_example = _df[_df['mutated_Uniprot ID'].isin(condition_id[~condition_id].index)]
-                    _fail_example = fail_example.groupby(['mutated_Uniprot ID']).apply(lambda x : self._check_consistency_examples(x, col = 'mutated_Sequence'))
+                    fail_example = _df[~condition_id]
                     self.logger.debug(self._logging_format_dataframe(fail_example))
-                    self.logger.debug(_fail_example)
-                    clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+                    self.logger.debug(LazyText(self._check_consistency_examples, fail_example, by = ['mutated_Uniprot ID'], col = 'mutated_Sequence'))
+                    reasons = self._add_failures(reasons, fail_example.index, 'mutated_sequence_consistency:mutated_Uniprot ID')
         
         # TODO: Uncomment if you want to check for the same sequence obtained by different mutations.
-        # _df = clean_df.copy()
-        # condition_id = _df.groupby('mutated_Sequence').apply(lambda x : self._check_consistency(x, col = 'Mutation'))
+        # _df = df_mutated[reasons.isna()]
+        # condition_id = self._check_consistency(_df, by = ['mutated_Sequence'], col = 'Mutation')
         # if not condition_id.all():
         #         passed = False
         #         self.logger.debug('FAIL in check_mutated_sequence_consistency: groupby: \'mutated_Sequence\'')
-        #         fail_example = _df[_df['mutated_Sequence'].isin(condition_id[~condition_id].index)]
-        #         _fail_example = fail_example.groupby('mutated_Sequence').apply(lambda x : self._check_consistency_examples(x, col = 'Mutation'))
+        #         fail_example = _df[~condition_id]
         #         self.logger.debug(self._logging_format_dataframe(fail_example))
-        #         self.logger.debug(_fail_example)
-        #         clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+        #         self.logger.debug(LazyText(self._check_consistency_examples, fail_example, by = ['mutated_Sequence'], col = 'Mutation'))
+        #         reasons = self._add_failures(reasons, fail_example.index, 'mutated_sequence_consistency:Mutation')
 
         if passed:
             self.logger.info('FINISHED: check_mutated_sequence_consistency:  PASS')
         else:
             self.logger.warning('FINISHED: check_mutated_sequence_consistency:  FAIL')
-        return clean_df, passed
+        return reasons, passed
         
 
     def check_response_by_article_consistency(self, full_df):
@@ -1239,71 +1660,45 @@ class Checker:
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
         """
         self.logger.info('STARTED: check_response_by_article_consistency')
         passed = True
-        clean_df = full_df.copy()
+        reasons = self._no_failures(full_df)
+        if 'mutated_Sequence' not in full_df.columns:
+            full_df = full_df.assign(mutated_Sequence = mutate_sequence_ids(full_df, self.sequence_table, mutation_col = 'Mutation', seq_col = '_Sequence'))
         
-        _df = clean_df
+        _df = full_df
         _df = _df[_df['Parameter'] == 'ec50']
-        if _df.empty:
-            passed = True
-        else:
-            condition = _df.groupby(['mutated_Sequence', 'InChI Key', 'DOI', 'Value_Screen', 'Tag','Cell_line'], dropna=False).apply(lambda x: self._check_consistency(x, col = 'Responsive'))
+        if not _df.empty:
+            condition = self._check_consistency(_df, by = ['mutated_Sequence', 'InChI Key', 'DOI', 'Value_Screen', 'Tag','Cell_line'], col = 'Responsive', dropna = False)
             if not condition.all():
                 passed = False
                 self.logger.debug('FAIL in check_response_by_article_consistency ec50')
-                _df = _df.reset_index()
-                _df = _df.set_index(['mutated_Sequence', 'InChI Key', 'DOI','Value_Screen'])
-                fail_example = _df.loc[(condition[~condition].index)]
-                fail_example = fail_example.reset_index()
-                fail_example = fail_example.set_index('_row_id')
-                fail_example.index.name = None
+                fail_example = _df[~condition]
                 self.logger.debug(self._logging_format_dataframe(fail_example))
-                clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+                reasons = self._add_failures(reasons, fail_example.index, 'response_by_article_consistency:ec50')
         
-        clean_df = full_df.copy()
-        _df = clean_df
+        _df = full_df
         _df = _df[_df['Parameter'] != 'ec50']
-        if _df.empty:
-            passed = True
-        else:
-            condition = _df.groupby(['mutated_Sequence', 'InChI Key', 'DOI', 'Value_Screen', 'Tag','Cell_line'], dropna=False).apply(lambda x: self._check_consistency(x, col = 'Responsive'))
+        if not _df.empty:
+            condition = self._check_consistency(_df, by = ['mutated_Sequence', 'InChI Key', 'DOI', 'Value_Screen', 'Tag','Cell_line'], col = 'Responsive', dropna = False)
             if not condition.all():
                 passed = False
                 self.logger.debug('FAIL in check_response_by_article_consistency norm and raw')
-                _df = _df.reset_index()
-                _df = _df.set_index(['mutated_Sequence', 'InChI Key', 'DOI','Value_Screen'])
-                fail_example = _df.loc[(condition[~condition].index)]
-                fail_example = fail_example.reset_index()
-                fail_example = fail_example.set_index('_row_id')
-                fail_example.index.name = None
+                fail_example = _df[~condition]
                 self.logger.debug(self._logging_format_dataframe(fail_example))
-                clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+                reasons = self._add_failures(reasons, fail_example.index, 'response_by_article_consistency:norm_and_raw')
 
         if passed:
             self.logger.info('FINISHED: check_response_by_article_consistency:  PASS')
         else:
             self.logger.warning('FINISHED: check_response_by_article_consistency:  FAIL')
-        return clean_df, passed
-
-    @staticmethod
-    def _check_sep_canonicalSMILES(x, _map):
-        passed = True
-
-        if x["InChI Key"] == x["InChI Key"]:
-            for inchikey in x["InChI Key"].split(' '):
-                if re.search('\.', _map[inchikey]):
-                    passed = False
-        elif x["canonicalSMILES"] == x["canonicalSMILES"]:
-            if re.search('\.', x["canonicalSMILES"]):
-                passed = False
-        return passed
+        return reasons, passed
 
     def check_sep_canonicalSMILES(self, full_df):
         """
@@ -1316,28 +1711,29 @@ class Checker:
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
         """
         self.logger.info('STARTED: check_canonicalSMILES')
         passed = True
-        clean_df = full_df.copy()
-        _df = clean_df
-        condition = _df.apply(lambda x: self._check_sep_canonicalSMILES(x, _map = self.map_inchikey_to_canonicalSMILES), axis=1)
+        reasons = self._no_failures(full_df)
+        _df = full_df
+        df_components = self._component_smiles(_df)
+        condition = ~self._reduce_components(df_components['canonicalSMILES'].str.contains('.', regex = False), df_components, _df.index, 'any', False)
         if not condition.all():
             passed = False
             fail_example = _df[~condition]
             self.logger.debug(self._logging_format_dataframe(fail_example))
-            clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+            reasons = self._add_failures(reasons, fail_example.index, 'sep_canonicalSMILES')
         
         if passed:
             self.logger.info('FINISHED: check_canonicalSMILES:  PASS')
         else:
             self.logger.warning('FINISHED: check_canonicalSMILES:  FAIL')
-        return clean_df, passed
+        return reasons, passed
 
     def check_mixture_based_on_name(self, full_df):
         """
@@ -1352,31 +1748,31 @@ class Checker:
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
         """
         self.logger.info('STARTED: check_mixture_based_on_name')
         passed = True
-        clean_df = full_df
+        reasons = self._no_failures(full_df)
 
         expression = r"[0-9]\([0-9]\)|[0-9]/[0-9]"
 
-        _df = clean_df[clean_df['Mixture'].str.lower() != 'mixture']
+        _df = full_df[full_df['Mixture'].str.lower() != 'mixture']
         condition_mixname = ~_df['Name'].str.contains(expression)
         if not condition_mixname.all():
             passed = False
             self.logger.debug('FAIL in check_mixture_based_on_name: \'Name\' contains \'{}\' and not a Mixture'.format(expression))
             fail_example = _df[~condition_mixname]
             self.logger.debug(self._logging_format_dataframe(fail_example))
-            clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+            reasons = self._add_failures(reasons, fail_example.index, 'mixture_based_on_name')
         if passed:
             self.logger.info('FINISHED: check_mixture_based_on_name:  PASS')
         else:
             self.logger.warning('FINISHED: check_mixture_based_on_name:  FAIL')
-        return clean_df, passed
+        return reasons, passed
 
 
     def check_isomers_based_on_name(self, full_df):
@@ -1390,31 +1786,31 @@ class Checker:
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
         """
         self.logger.info('STARTED: check_isomers_based_on_name')
         passed = True
-        clean_df = full_df
+        reasons = self._no_failures(full_df)
 
         expression = r"(?i)\([0-9]{0,1}[e,z,s,r](\,[0-9]{0,1}[e,z,s,r]){0,1}\)|cis|trans|^d-|^l-|\(\+\)|\(-\)"
 
-        _df = clean_df[clean_df['Mixture'].str.lower() != 'mixture']
+        _df = full_df[full_df['Mixture'].str.lower() != 'mixture']
         condition = ~(_df['Name'].str.contains(expression) & _df["InChI Key"].str.contains("UHFFFAOYSA"))
         if not condition.all():
             passed = False
             self.logger.debug('FAIL in check_isomers_based_on_name: \'Name\' contains \'E,Z,R,S,cis,trans,+,-,d or l\' and \'InChI Key\' contains \'UHFFAOYSA\'')
             fail_example = _df[~condition]
             self.logger.debug(self._logging_format_dataframe(fail_example))
-            clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+            reasons = self._add_failures(reasons, fail_example.index, 'isomers_based_on_name')
         if passed:
             self.logger.info('FINISHED: check_isomers_based_on_name:  PASS')
         else:
             self.logger.warning('FINISHED: check_isomers_based_on_name:  FAIL')
-        return clean_df, passed
+        return reasons, passed
 
 
     def check_len_seq(self, full_df):
@@ -1428,28 +1824,28 @@ class Checker:
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
         """
         self.logger.info('STARTED: check_length_sequence')
         passed = True
-        clean_df = full_df
-        _df = clean_df
-        condition = _df["_Sequence"].apply(lambda x: len(x) >= 200 and len(x) <= 380)
+        reasons = self._no_failures(full_df)
+        _df = full_df.dropna(subset = ['_Sequence']) # Missing sequences are reported by check_not_nan.
+        condition = self.sequence_table.get_lengths(_df["_Sequence"]).between(200, 380)
         if not condition.all():
             passed = False
             fail_example = _df[~condition]
             self.logger.debug('FAIL in check_length_sequence')
             self.logger.debug(self._logging_format_dataframe(fail_example))
-            clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+            reasons = self._add_failures(reasons, fail_example.index, 'length_sequence')
         if passed:
             self.logger.info('FINISHED: check_length_sequence:  PASS')
         else:
             self.logger.warning('FINISHED: check_length_sequence:  FAIL')
-        return clean_df, passed
+        return reasons, passed
 
     def check_ec50_non_zero(self, full_df):
         """
@@ -1457,25 +1853,25 @@ class Checker:
         """
         self.logger.info('STARTED: check_ec50_non_zero')
         passed = True
-        clean_df = full_df
-        _df = clean_df
+        reasons = self._no_failures(full_df)
+        _df = full_df
         _df = _df[_df['Parameter'] == 'ec50']
         if _df.empty:
             passed = True
         else:
-            _df = _df[_df['Value'].apply(lambda x: self._check_castable(x, float))]
+            _df = _df[self._castable(_df['Value'], float)]
             condition = _df['Value'].astype(float) != 0.0
             if not condition.all():
                 passed = False
                 fail_example = _df[~condition]
                 self.logger.debug('FAIL in check_ec50_non_zero')
                 self.logger.debug(self._logging_format_dataframe(fail_example))
-                clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+                reasons = self._add_failures(reasons, fail_example.index, 'ec50_non_zero')
         if passed:
             self.logger.info('FINISHED: check_ec50_non_zero:  PASS')
         else:
             self.logger.warning('FINISHED: check_ec50_non_zero:  FAIL')
-        return clean_df, passed
+        return reasons, passed
 
 
     def check_value_categorical(self, full_df):
@@ -1484,9 +1880,9 @@ class Checker:
         """
         self.logger.info('STARTED: check_value_categorical')
         passed = True
-        clean_df = full_df
+        reasons = self._no_failures(full_df)
         for case in self.categorical_values:
-            _df = clean_df
+            _df = full_df
             if case['col'] == 'Parameter':
                 _df = _df.dropna(subset=[case['col']])
             else:
@@ -1498,12 +1894,12 @@ class Checker:
                 fail_example = _df[~condition]
                 self.logger.debug('FAIL in check_value_categorical:  col: \'{}\'  allowed values: {} '.format(*case.values()))
                 self.logger.debug(self._logging_format_dataframe(fail_example))
-                clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+                reasons = self._add_failures(reasons, fail_example.index, 'value_categorical:{}'.format(case['col']))
         if passed:
             self.logger.info('FINISHED: check_value_categorical:  PASS')
         else:
             self.logger.warning('FINISHED: check_value_categorical:  FAIL')
-        return clean_df, passed
+        return reasons, passed
 
     def check_mutation_based_on_geneid(self, full_df):
         """
@@ -1511,8 +1907,8 @@ class Checker:
         """
         self.logger.info('STARTED: check_mutation_based_on_geneid')
         passed = True
-        clean_df = full_df
-        _df = clean_df
+        reasons = self._no_failures(full_df)
+        _df = full_df
         _df = _df[(_df["Gene ID"].str.contains(r'_[A-Z]{1}[0-9]+')) & (_df['Sequence'].isna())]
         condition = _df['Mutation'].isna()
         if condition.empty:
@@ -1522,42 +1918,37 @@ class Checker:
             fail_example = _df[condition]
             self.logger.debug('FAIL in check_mutation_based_on_geneid')
             self.logger.debug(self._logging_format_dataframe(fail_example))
-            clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+            reasons = self._add_failures(reasons, fail_example.index, 'mutation_based_on_geneid')
         if passed:
             self.logger.info('FINISHED: check_mutation_based_on_geneid:  PASS')
         else:
             self.logger.warning('FINISHED: check_mutation_based_on_geneid:  FAIL')
-        return clean_df, passed
+        return reasons, passed
 
-    def __call__(self, df):
+    def __call__(self, df, only = None, skip = None):
         """
+        Run selected checks. Only auxillary data needed by the selected checks are loaded (see checks).
+
         Parameters:
         -----------
         df : pandas.DataFrame
             dataframe to process.
+
+        only : list, optional (default=None)
+            names of checks to run. default_checks are run if None. Names that are not in checks are ignored.
+            Checks required by them (see \'requires\' in checks) are run too.
+
+        skip : list, optional (default=None)
+            names of checks that are not run unless they are required by a selected check (see select_checks in scheduling.py).
         """
+        checks = select_checks(self.checks, self.default_checks if only is None else only, skip)
         df_join = df.copy()
         df_join.index.name = '_row_id'
-        df_join = self.add_implied_columns(df_join)
-        df_join, self.check_results['not_nan'] = self.check_not_nan(df_join)
-        df_join, self.check_results['check_sep_canonicalSMILES'] = self.check_sep_canonicalSMILES(df_join)
-        df_join, self.check_results['conditioned_not_nan'] = self.check_conditioned_not_nan(df_join)
-        df_join, self.check_results['castable'] = self.check_castable(df_join)
-        df_join, self.check_results['not_castable'] = self.check_not_castable(df_join)
-        df_join, self.check_results['format'] = self.check_format(df_join)
-        #df_join, self.check_results['mixture_format'] = self.check_mixture_format(df_join)
-        df_join, self.check_results['inchikey_on_pubchem'] = self.check_inchikey_on_pubchem(df_join)
-        #df_join, self.check_results['check_chirality'] = self.check_chirality(df_join)
-        #df_join, self.check_results['inchikey_vs_name'] = self.check_inchikey_vs_name(df_join)
-        df_join, self.check_results['mutation'] = self.check_mutation(df_join)
-        df_join, self.check_results['mutated_sequence_consistency'] = self.check_mutated_sequence_consistency(df_join)
-        #df_join, self.check_results['response_by_article_consistency'] = self.check_response_by_article_consistency(df_join)
-        #df_join, self.check_results['mixture_based_on_name'] = self.check_mixture_based_on_name(df_join)
-        #df_join, self.check_results['isomers_based_on_name'] = self.check_isomers_based_on_name(df_join)
-        df_join, self.check_results['length_sequence'] = self.check_len_seq(df_join)
-        df_join, self.check_results['Ec50_non_zero'] = self.check_ec50_non_zero(df_join)
-        df_join, self.check_results['value_categorical'] = self.check_value_categorical(df_join)
-        df_join, self.check_results['mutation_based_on_geneid'] = self.check_mutation_based_on_geneid(df_join)
+        df_join = self.add_implied_columns(df_join, auxillary = required_auxillary(checks))
+        self.failures = pandas.DataFrame(index = df_join.index)
+        self._run_checks(checks, df_join)
+        self.clean_df = df_join[~self._failed_mask()]
+        self._write_failure_report(df_join)
 
         if all(self.check_results.values()):
             self.logger.info('--FINAL STATUS--:\tPASS\n----------------------------\n')
@@ -1574,53 +1965,41 @@ class PostChecker(Checker):
 
     See documentation of Checker for details about checks.
     """
-    def __init__(self, auxillary_dir = 'Data', log_dir = 'logs'):
+    def __init__(self, auxillary_dir = 'Data', log_dir = 'logs', log_level = logging.DEBUG, n_jobs = 1, entity_level = False, memo = False):
         self.auxillary_dir = auxillary_dir
         self.log_dir = log_dir
+        self.log_level = log_level
+        self.n_jobs = n_jobs
+        self.entity_level = entity_level
+        self.memo = CheckMemo(os.path.join(auxillary_dir, CHECK_MEMO_NAME)) if memo else None
 
         self._init_logger(__class__.__name__)
         self._init_config()
         # Chage logging columns:
         self.logging_cols.append('Mixture')
+        self.default_checks = ['not_nan',
+                               'check_sep_canonicalSMILES',
+                               'conditioned_not_nan',
+                               'castable',
+                               'not_castable',
+                               'format',
+                               'mixture_format',
+                               'inchikey_on_pubchem',
+                               'check_chirality',
+                               # 'inchikey_vs_name',
+                               'mutation',
+                               'mutated_sequence_consistency',
+                               'response_by_article_consistency',
+                               'mixture_based_on_name',
+                               # 'isomers_based_on_name',
+                               'length_sequence',
+                               'Ec50_non_zero',
+                               'value_categorical',
+                               'mutation_based_on_geneid',
+                            ]
 
         self.check_results = {}
-
-    def __call__(self, df):
-        """
-        Parameters:
-        -----------
-        df : pandas.DataFrame
-            dataframe to process.
-        """
-        df_join = df.copy()
-        df_join.index.name = '_row_id'
-        df_join = self.add_implied_columns(df_join)
-        df_join, self.check_results['not_nan'] = self.check_not_nan(df_join)
-        df_join, self.check_results['check_sep_canonicalSMILES'] = self.check_sep_canonicalSMILES(df_join)
-        df_join, self.check_results['conditioned_not_nan'] = self.check_conditioned_not_nan(df_join)
-        df_join, self.check_results['castable'] = self.check_castable(df_join)
-        df_join, self.check_results['not_castable'] = self.check_not_castable(df_join)
-        df_join, self.check_results['format'] = self.check_format(df_join)
-        df_join, self.check_results['mixture_format'] = self.check_mixture_format(df_join)
-        df_join, self.check_results['inchikey_on_pubchem'] = self.check_inchikey_on_pubchem(df_join)
-        df_join, self.check_results['check_chirality'] = self.check_chirality(df_join)
-        #df_join, self.check_results['inchikey_vs_name'] = self.check_inchikey_vs_name(df_join)
-        df_join, self.check_results['mutation'] = self.check_mutation(df_join)
-        df_join, self.check_results['mutated_sequence_consistency'] = self.check_mutated_sequence_consistency(df_join)
-        df_join, self.check_results['response_by_article_consistency'] = self.check_response_by_article_consistency(df_join)
-        df_join, self.check_results['mixture_based_on_name'] = self.check_mixture_based_on_name(df_join)
-        #df_join, self.check_results['isomers_based_on_name'] = self.check_isomers_based_on_name(df_join)
-        df_join, self.check_results['length_sequence'] = self.check_len_seq(df_join)
-        df_join, self.check_results['Ec50_non_zero'] = self.check_ec50_non_zero(df_join)
-        df_join, self.check_results['value_categorical'] = self.check_value_categorical(df_join)
-        df_join, self.check_results['mutation_based_on_geneid'] = self.check_mutation_based_on_geneid(df_join)
-        
-        if all(self.check_results.values()):
-            self.logger.info('--FINAL STATUS--:\tPASS\n----------------------------\n')
-            return True
-        else:
-            self.logger.critical('--FINAL STATUS--:\tFAIL\n----------------------------\n')
-            raise ValueError('--FINAL STATUS--:\tFAIL.  See {} for details'.format(_logging_file_path))
+        self.failures = pandas.DataFrame()
 
 
 
@@ -1630,139 +2009,65 @@ class OptionalChecker(Checker):
 
     See documentation of Checker for details about checks.
     """
-    def __init__(self, auxillary_dir = 'Data', log_dir = 'logs'):
+    def __init__(self, auxillary_dir = 'Data', log_dir = 'logs', log_level = logging.DEBUG, n_jobs = 1, entity_level = False, memo = False):
         self.auxillary_dir = auxillary_dir
         self.log_dir = log_dir
+        self.log_level = log_level
+        self.n_jobs = n_jobs
+        self.entity_level = entity_level
+        self.memo = CheckMemo(os.path.join(auxillary_dir, CHECK_MEMO_NAME)) if memo else None
 
         self._init_logger(__class__.__name__)
         self._init_config()
         # Chage logging columns:
         self.logging_cols.append('Mixture')
+        # Optional checks are informative, they are run on all rows:
+        for check in self.checks:
+            check['requires'] = []
+            if check['name'] == 'inchikey_vs_name':
+                check['auxillary'] = ['map_inchikey_to_synonyms', 'map_name_to_inchikeys']
+        self.checks.insert(0, {'name' : 'check_blast_result', 'method' : 'check_blast_result', 'cols' : ['blast_identity', 'Gene ID', 'Uniprot ID', 'blast_uniprot_id', 'species', 'mutated_Sequence', 'blast_seq'], 'auxillary' : [], 'requires' : [], 'entity' : None})
+        self.default_checks = ['check_blast_result',
+                               'check_chirality',
+                               'inchikey_vs_name',
+                               'length_sequence',
+                               'isomers_based_on_name',
+                            ]
 
         self.check_results = {}
-
-    def _load_auxillary(self):
-        try:
-            df_uniprot = pandas.read_csv(os.path.join(self.auxillary_dir, 'uniprot_sequences.csv'), sep = ';', index_col = None)
-        except FileNotFoundError:
-            df_uniprot = pandas.DataFrame([], columns = self.df_uniprot_cols)
-            # raise FileNotFoundError('Support file: \'uniprot_sequences.csv\' not found. Please call self.update_df_uniprot or run uniprot_utils.py to download sequences.')
-
-        assert len(df_uniprot.columns) == len(self.df_uniprot_cols)
-        for i in range(len(df_uniprot.columns)):
-            if df_uniprot.columns[i] != self.df_uniprot_cols[i]:
-                raise ValueError('df_uniprot has different columns or column positions than in self.df_uniprot_cols')
-        df_uniprot.set_index(self.df_uniprot_cols[0], drop = True, inplace = True)
-
-        # map_inchikey_to_CID:
-        try:
-            map_inchikey_to_CID = pandas.read_csv(os.path.join(self.auxillary_dir, 'map_inchikey_to_CID.csv'), sep = ';', index_col = None)
-        except FileNotFoundError:
-            map_inchikey_to_CID = pandas.DataFrame([], columns = self.map_inchikey_to_CID_cols)
-            # raise FileNotFoundError('Support file: \'map_inchikey_to_CID.csv\' not found. Please run pubchem_utils.py to download inchi key to cid mapping.')
-
-        assert len(map_inchikey_to_CID.columns) == len(self.map_inchikey_to_CID_cols)
-        for i in range(len(map_inchikey_to_CID.columns)):
-            if map_inchikey_to_CID.columns[i] != self.map_inchikey_to_CID_cols[i]:
-                raise ValueError('map_inchikey_to_CID has different columns or column positions than in self.map_inchikey_to_CID_cols')
-        map_inchikey_to_CID.set_index(self.map_inchikey_to_CID_cols[0], drop = True, inplace = True)
-        map_inchikey_to_CID = map_inchikey_to_CID.squeeze()
-
-        # map_inchikey_to_canonicalSMILES:
-        try:
-            with open(os.path.join(self.auxillary_dir, 'map_inchikey_to_canonicalSMILES.json'), 'r') as jsonfile:
-                map_inchikey_to_canonicalSMILES = json.load(jsonfile)
-        except FileNotFoundError:
-            map_inchikey_to_canonicalSMILES = {}
-
-        # map_inchikey_to_synonyms:
-        try:
-            with open(os.path.join(self.auxillary_dir, 'map_inchikey_to_synonyms.json'), 'r') as jsonfile:
-                map_inchikey_to_synonyms = json.load(jsonfile)
-        except FileNotFoundError:
-            map_inchikey_to_synonyms = {}
-
-        #map_name_to_inchikeys:
-        try:
-            with open(os.path.join(self.auxillary_dir, 'map_name_to_inchikeys.json'), 'r') as jsonfile:
-                 map_name_to_inchikeys = json.load(jsonfile)
-        except FileNotFoundError:
-            map_name_to_inchikeys = {}
-        
-        self.df_uniprot = df_uniprot
-        self.map_inchikey_to_CID = map_inchikey_to_CID
-        self.map_inchikey_to_canonicalSMILES = map_inchikey_to_canonicalSMILES
-        self.map_inchikey_to_synonyms = map_inchikey_to_synonyms
-        self.map_name_to_inchikeys = map_name_to_inchikeys
-        return df_uniprot, map_inchikey_to_CID, map_inchikey_to_canonicalSMILES, map_inchikey_to_synonyms, map_name_to_inchikeys
+        self.failures = pandas.DataFrame()
 
     def _update_auxilary_map_name_to_inchikeys(self, full_df):
+        """
+        Map names to InChI keys. Names are first looked up in the inverted index of synonyms (map_inchikey_to_synonyms),
+        PubChem is queried only for names that are neither in the index nor in \'map_name_to_inchikeys.json\'.
+        InChI keys found locally are merged with the ones from PubChem but they are not saved to the json.
+        """
         map_name_to_inchikeys = self.map_name_to_inchikeys.copy()
         current_idx = pandas.Index(map_name_to_inchikeys.keys(), name = 'Name')
         candidate_idx = full_df[full_df['Mixture'] == 'mono']['Name'].dropna() # TODO: Can we somehow work with mixtures?
         candidate_idx = pandas.Index(candidate_idx.unique())
-        new_idx = candidate_idx.difference(current_idx)
+        map_local = self.map_inchikey_to_synonyms.lookup_names(candidate_idx.tolist())
+        new_idx = candidate_idx.difference(current_idx).difference(pandas.Index(map_local.keys(), dtype = object))
+        self.logger.debug('map_name_to_inchikeys: {} names found in synonyms, {} names not found'.format(len(map_local), len(new_idx)))
         if len(new_idx) > 0:
             self.logger.info('Updating map_name_to_inchikeys...')
-            NEW = get_map_name_to_inchikeys(new_idx.tolist())
-            map_name_to_inchikeys.update(NEW)
-            with open(os.path.join(self.auxillary_dir, 'map_name_to_inchikeys.json'), 'w') as jsonfile:
-                json.dump(map_name_to_inchikeys, jsonfile)
+            map_name_to_inchikeys = update_json_map(os.path.join(self.auxillary_dir, 'map_name_to_inchikeys.json'), map_name_to_inchikeys, new_idx.tolist(),
+                                                    get_map_name_to_inchikeys, logger = self.logger)
+        for name, inchikeys in map_local.items():
+            map_name_to_inchikeys[name] = list(dict.fromkeys(map_name_to_inchikeys.get(name, []) + inchikeys))
         return map_name_to_inchikeys
 
     
-    def _update_auxillary(self, full_df):
+    def _update_auxillary(self, full_df, auxillary = None):
         """
-        call and other operation necessery for all _update_auxillary_*.
+        call and other operation necessery for all _update_auxillary_* of auxillary data in auxillary (all if None).
         """
-        self.df_uniprot = self._update_auxilary_df_uniprot(full_df)
-        self.map_inchikey_to_CID = self._update_auxilary_map_inchikey_to_CID(full_df)
-        self.map_inchikey_to_canonicalSMILES = self._update_auxilary_map_inchikey_to_canonicalSMILES(full_df)
-        self.map_inchikey_to_synonyms = self._update_auxilary_map_inchikey_to_synonyms(full_df)
-        self.map_name_to_inchikey = self._update_auxilary_map_name_to_inchikeys(full_df)
+        super()._update_auxillary(full_df, auxillary)
+        if 'map_name_to_inchikeys' in self._auxillary_names(auxillary):
+            self.map_name_to_inchikeys = self._update_auxilary_map_name_to_inchikeys(full_df)
         return 
 
-    def _check_inchikey_vs_name(self, x, cond_col, test_col, _map):
-        """
-        Check if text in \'test_col\' is in the list of possible synonyms for \'cond_col\'. It is mainly used to check if name of molecule is in synonyms retrieved
-        from PubChem by InChI key.
-
-        This is expected to be used with pandas apply.
-
-        Parameters:
-        -----------
-        x : pandas.Series
-            row of a dataframe
-
-        cond_col : str
-            name of the column containing identifier. Entry from here are mapped to synonyms using _map.
-
-        test_col : str
-            name of the column with text that should be in the list of synonyms.
-
-        _map : dict
-            mapping form identifier to synonyms.
-
-        Notes:
-        ------
-        This works only with non-mixtures only, because mixtures can have name that is unrelated to names of the elements inside.
-        *Entries in \'cond_col\' that are not in _map.keys() are ignored*.
-        """
-        # TODO: This is not checking for cols not in map.keys() ! ! !
-        passed = True
-        if x[cond_col] in _map.keys():
-            x_clean = self._clean_string_name(x[test_col])
-            
-            for synonym in _map[x[cond_col]]:
-                try: 
-                    self._clean_string_name(synonym)
-                except Exception as e:
-                    print(_map[x[cond_col]], x[cond_col])
-                    raise e
-            if not x_clean in [self._clean_string_name(synonym) for synonym in _map[x[cond_col]]]:
-                passed = False
-        return passed
-
     def check_inchikey_vs_name(self, full_df):
         """
         Check if names can be found inside synonyms retrieved by InChI Key.
@@ -1774,8 +2079,8 @@ class OptionalChecker(Checker):
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
@@ -1787,22 +2092,22 @@ class OptionalChecker(Checker):
         # TODO: For now this is checked only for non-mixtures.
         self.logger.info('STARTED: check_inchikey_vs_name')
         passed = True
-        clean_df = full_df.copy()
+        reasons = self._no_failures(full_df)
 
-        _df = clean_df[clean_df['Mixture'] != 'mixture']
+        _df = full_df[full_df['Mixture'] != 'mixture']
         _df = _df.dropna(subset = ['Name'])
-        condition_name = _df.apply(lambda x: self._check_inchikey_vs_name(x, cond_col = 'Name', test_col = 'InChI Key', _map = self.map_name_to_inchikeys), axis = 1)
+        condition_name = self._check_inchikey_vs_name(_df, cond_col = 'Name', test_col = 'InChI Key', _map = self.map_name_to_inchikeys)
         if not condition_name.all():
             passed = False
             self.logger.debug('FAIL in check_inchikey_vs_name: cond_col: \'Name\', test_col: \'InChI Key\'')
             fail_example = _df[~condition_name]
             self.logger.debug(self._logging_format_dataframe(fail_example))
-            self.logger.debug(self._logging_format_dataframe(fail_example.drop_duplicates(subset=['Name'])))
-            clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+            self.logger.debug(self._logging_format_dataframe(fail_example, drop_duplicates = ['Name']))
+            reasons = self._add_failures(reasons, fail_example.index, 'inchikey_vs_name:name')
 
-        _df = clean_df[clean_df['Mixture'] != 'mixture']
+        _df = full_df[full_df['Mixture'] != 'mixture']
         _df = _df.dropna(subset = ['InChI Key'])
-        condition_inchikey = _df.apply(lambda x: self._check_inchikey_vs_name(x, cond_col = 'InChI Key', test_col = 'Name', _map = self.map_inchikey_to_synonyms), axis = 1)
+        condition_inchikey = self._check_inchikey_vs_name(_df, cond_col = 'InChI Key', test_col = 'Name', _map = self.map_inchikey_to_synonyms)
         if not condition_inchikey.all():
             passed = False
             self.logger.debug('FAIL in check_inchikey_vs_name: cond_col: \'InChI Key\', test_col: \'Name\'')
@@ -1810,51 +2115,21 @@ class OptionalChecker(Checker):
             print(fail_example["InChI Key"].unique())
             print(len(fail_example["InChI Key"].unique()))
             self.logger.debug(self._logging_format_dataframe(fail_example))
-            self.logger.debug(self._logging_format_dataframe(fail_example.drop_duplicates(subset=['Name'])))
-            clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+            self.logger.debug(self._logging_format_dataframe(fail_example, drop_duplicates = ['Name']))
+            reasons = self._add_failures(reasons, fail_example.index, 'inchikey_vs_name:inchikey')
 
         if passed:
             self.logger.info('FINISHED: check_inchikey_vs_name:  PASS')
         else:
             self.logger.warning('FINISHED: check_inchikey_vs_name:  FAIL')
-        return full_df, passed
+        return reasons, passed
 
-    @staticmethod
-    def _check_chirality(x, _map):
-        """
-        Check if molecules that are supposed to be achiral have more than 1 stereoisomer. 
-
-        InChI keys containing \'-UHFFFAOYSA-\' should be achiral as well as all having cacnonical SMILES.
-
-        Parameters:
-        -----------
-        x : pandas.Series
-            row of the dataframe.
-
-        _map : dict
-            mapping from InChI key to canonical SMILES.
-        """
-        passed = True
-        if x['InChI Key'] == x['InChI Key']:
-            for inchikey in x['InChI Key'].split(' '):
-                if '-UHFFFAOYSA-' in inchikey:
-                    isomers = enumerate_isomers(_map[inchikey])
-                    # mol = Chem.MolFromSmiles(_map[inchikey])
-                    # chiralCenters = Chem.FindMolChiralCenters(mol, force=True, includeUnassigned=True, includeCIP=False, useLegacyImplementation=False)
-                    # isomers = tuple(EnumerateStereoisomers(mol))
-                    if len(isomers) > 1:
-                        passed = False
-        elif x["canonicalSMILES"] == x["canonicalSMILES"]:
-            isomers = enumerate_isomers(x["canonicalSMILES"])
-            if len(isomers) > 1:
-                passed = False
-        return passed
 
     def check_chirality(self, full_df):
         """
         For InChI keys containing \'-UHFFFAOYSA-\' and for canonical SMILES check if number of stereoisomers is 1. These records should not have isomers
         and check fails if there are any (i.e. more than 1). For multiple elements the check is performed for each element and separator is assumed to
-        be *space*. NaNs are ignored. Isomers are identified using rdkit.Chem.EnumerateStereoisomers.EnumerateStereoisomers (see enumerate_isomers is utils.py).
+        be *space*. NaNs are ignored. Isomers are counted using rdkit.Chem.EnumerateStereoisomers (see count_isomers is utils.py).
 
         InChI keys are mapped to canonical SMILES using \'map_inchikey_to_canonicalSMILES\' and stereoisomers are identified using these SMILES.
 
@@ -1865,8 +2140,8 @@ class OptionalChecker(Checker):
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
@@ -1877,25 +2152,31 @@ class OptionalChecker(Checker):
         """
         self.logger.info('STARTED: check_chirality')
         passed = True
-        clean_df = full_df.copy()
+        reasons = self._no_failures(full_df)
 
-        _df = clean_df[clean_df['Mixture'] == "mixture"]
+        _df = full_df[full_df['Mixture'] == "mixture"]
         if _df.empty:
             passed = True
         else:
-            condition = _df.apply(lambda x: self._check_chirality(x, _map = self.map_inchikey_to_canonicalSMILES), axis=1)
+            has_isomers, timed_out = self._has_isomers(_df)
+            if timed_out.any():
+                passed = False
+                fail_example = _df[timed_out]
+                self.logger.debug(self._logging_format_dataframe(fail_example))
+                reasons = self._add_failures(reasons, fail_example.index, 'chirality:timeout')
+            condition = ~has_isomers | timed_out
             if not condition.all():
                 passed = False
                 fail_example = _df[~condition]
                 self.logger.debug(self._logging_format_dataframe(fail_example))
-                self.logger.debug(self._logging_format_dataframe(fail_example.drop_duplicates(subset=['Name'])))
-                clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+                self.logger.debug(self._logging_format_dataframe(fail_example, drop_duplicates = ['Name']))
+                reasons = self._add_failures(reasons, fail_example.index, 'chirality:mixture_with_isomers')
 
         if passed:
             self.logger.info('FINISHED: check_chirality:  PASS')
         else:
             self.logger.warning('FINISHED: check_chirality:  FAIL')
-        return full_df, passed
+        return reasons, passed
 
     def check_len_seq(self, full_df):
         """
@@ -1908,29 +2189,29 @@ class OptionalChecker(Checker):
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
         """
         self.logger.info('STARTED: check_length_sequence')
         passed = True
-        clean_df = full_df
-        _df = clean_df
-        condition = _df["_Sequence"].apply(lambda x: len(x) >= 300 and len(x) <= 330)
+        reasons = self._no_failures(full_df)
+        _df = full_df
+        condition = self.sequence_table.get_lengths(_df["_Sequence"]).between(300, 330)
         if not condition.all():
             passed = False
             fail_example = _df[~condition]
             self.logger.debug('FAIL in check_length_sequence')
             self.logger.debug(self._logging_format_dataframe(fail_example))
-            self.logger.debug(self._logging_format_dataframe(fail_example.drop_duplicates(subset=['Name'])))
-            clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+            self.logger.debug(self._logging_format_dataframe(fail_example, drop_duplicates = ['Name']))
+            reasons = self._add_failures(reasons, fail_example.index, 'length_sequence')
         if passed:
             self.logger.info('FINISHED: check_length_sequence:  PASS')
         else:
             self.logger.warning('FINISHED: check_length_sequence:  FAIL')
-        return full_df, passed
+        return reasons, passed
 
     def check_isomers_based_on_name(self, full_df):
         """
@@ -1943,32 +2224,41 @@ class OptionalChecker(Checker):
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
         """
         self.logger.info('STARTED: check_isomers_based_on_name')
         passed = True
-        clean_df = full_df
+        reasons = self._no_failures(full_df)
 
         expression = r"(?i)\([0-9]{0,1}[e,z,s,r](\,[0-9]{0,1}[e,z,s,r]){0,1}\)|cis|trans|^d-|^l-|\(\+\)|\(-\)"
 
-        _df = clean_df[clean_df['Mixture'].str.lower() != 'mixture']
+        _df = full_df[full_df['Mixture'].str.lower() != 'mixture']
         condition = ~(_df['Name'].str.contains(expression) & _df["InChI Key"].str.contains("UHFFFAOYSA"))
         if not condition.all():
             passed = False
             self.logger.debug('FAIL in check_isomers_based_on_name: \'Name\' contains \'E,Z,R,S,cis,trans,+,-,d or l\' and \'InChI Key\' contains \'UHFFAOYSA\'')
             fail_example = _df[~condition]
             self.logger.debug(self._logging_format_dataframe(fail_example))
-            self.logger.debug(self._logging_format_dataframe(fail_example.drop_duplicates(subset=['Name'])))
-            clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+            self.logger.debug(self._logging_format_dataframe(fail_example, drop_duplicates = ['Name']))
+            reasons = self._add_failures(reasons, fail_example.index, 'isomers_based_on_name')
         if passed:
             self.logger.info('FINISHED: check_isomers_based_on_name:  PASS')
         else:
             self.logger.warning('FINISHED: check_isomers_based_on_name:  FAIL')
-        return full_df, passed
+        return reasons, passed
+
+    def _blast_example(self, fail_example):
+        """
+        Get examples of failed blast results with decoded sequences for logging.
+        """
+        blast_example = fail_example.drop_duplicates(subset='mutated_Sequence')[['Gene ID','Uniprot ID','blast_uniprot_id','species','mutated_Sequence','blast_seq']]
+        if is_encoded(blast_example['mutated_Sequence']):
+            blast_example = blast_example.assign(mutated_Sequence = self.sequence_table.decode(blast_example['mutated_Sequence']))
+        return blast_example
 
     def check_blast_result(self, full_df):
         """
@@ -1981,54 +2271,29 @@ class OptionalChecker(Checker):
 
         Returns:
         --------
-        clean_df : pandas.DataFrame
-            dataframe where rows that do not pass the check are discarded.
+        reasons : pandas.Series
+            reason of failure for each row of full_df, NaN for rows that passed (see _add_failures).
 
         passed : bool
             result of the check.
         """
         self.logger.info('STARTED: check_blast_result')
         passed = True
-        clean_df = full_df
-        _df = clean_df
+        reasons = self._no_failures(full_df)
+        _df = full_df
         condition = _df["blast_identity"].apply(lambda x: x >= 96)
         if not condition.all():
             passed = False
             fail_example = _df[~condition]
             self.logger.debug('FAIL in check_blast_result')
-            self.logger.debug(self._logging_format_dataframe(fail_example.drop_duplicates(subset='mutated_Sequence')))
-            self.logger.debug(fail_example.drop_duplicates(subset='mutated_Sequence')[['Gene ID','Uniprot ID','blast_uniprot_id','species','mutated_Sequence','blast_seq']])
-            clean_df = clean_df.loc[clean_df.index.difference(fail_example.index)]
+            self.logger.debug(self._logging_format_dataframe(fail_example, drop_duplicates = 'mutated_Sequence'))
+            self.logger.debug(LazyText(self._blast_example, fail_example))
+            reasons = self._add_failures(reasons, fail_example.index, 'blast_result')
         if passed:
             self.logger.info('FINISHED: check_blast_result:  PASS')
         else:
             self.logger.warning('FINISHED: check_blast_result:  FAIL')
-            return full_df, passed
-
-    def __call__(self, df):
-        """
-        Parameters:
-        -----------
-        df : pandas.DataFrame
-            dataframe to process.
-        """
-        df_join = df.copy()
-        df_join.index.name = '_row_id'
-        df_join = self.add_implied_columns(df_join)
-        df_join, self.check_results['check_blast_result'] = self.check_blast_result(df_join)
-        df_join, self.check_results['check_chirality'] = self.check_chirality(df_join)
-        df_join, self.check_results['inchikey_vs_name'] = self.check_inchikey_vs_name(df_join)
-        df_join, self.check_results['length_sequence'] = self.check_len_seq(df_join)
-        df_join, self.check_results['isomers_based_on_name'] = self.check_isomers_based_on_name(df_join)
-        
-        if all(self.check_results.values()):
-            self.logger.info('--FINAL STATUS--:\tPASS\n----------------------------\n')
-            return True
-        else:
-            self.logger.critical('--FINAL STATUS--:\tFAIL\n----------------------------\n')
-            raise ValueError('--FINAL STATUS--:\tFAIL.  See {} for details'.format(_logging_file_path))
-
-
+        return reasons, passed
 
 if __name__ == '__main__':
     from formatting import PreFormatter
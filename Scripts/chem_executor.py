@@ -0,0 +1,111 @@
+# Run RDKit work on many molecules in a process pool.
+import os
+import signal
+import threading
+import concurrent.futures
+import pandas
+
+from errors import MoleculeTimeoutError
+
+# Time budget in seconds for one molecule.
+TIMEOUT = 60
+# Below this number of unique molecules the work is done in the current process.
+MIN_PARALLEL = 32
+
+
+def _alarm_available(timeout):
+    """
+    Check if the time budget can be kept in the current thread (see _run_with_budget). Without signal.setitimer it is not available anywhere.
+    """
+    return timeout is None or not hasattr(signal, 'setitimer') or threading.current_thread() is threading.main_thread()
+
+
+def _raise_timeout(signum, frame):
+    raise MoleculeTimeoutError()
+
+
+def _run_with_budget(fn, smiles, timeout):
+    """
+    Call fn(smiles) with a time budget. The budget is implemented with SIGALRM, so it is available only on platforms with
+    signal.setitimer and only in the main thread. The alarm interrupts python code (e.g. the EnumerateStereoisomers generator)
+    but not a single long call into RDKit.
+
+    Returns:
+    --------
+    result : tuple
+        (fn(smiles), False) or (None, True) if the time budget was exceeded.
+    """
+    use_alarm = timeout is not None and hasattr(signal, 'setitimer') and _alarm_available(timeout)
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn(smiles), False
+    except MoleculeTimeoutError:
+        return None, True
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+
+def _run_chunk(fn, chunk, timeout):
+    return [_run_with_budget(fn, smiles, timeout) for smiles in chunk]
+
+
+def map_molecules(fn, smiles, timeout = TIMEOUT, default = None, max_workers = None, logger = None):
+    """
+    Apply fn on each SMILES. Duplicated SMILES are computed once and the work is distributed over a process pool
+    (concurrent.futures.ProcessPoolExecutor). For less than MIN_PARALLEL unique SMILES it runs in the current process,
+    unless it is called outside the main thread (e.g. from checks run in threads, see Checker.n_jobs) where the time budget
+    can not be kept.
+
+    Parameters:
+    -----------
+    fn : callable
+        function taking SMILES. It must be picklable, i.e. defined on module level (e.g. enumerate_isomers in utils.py)
+        or functools.partial of such function.
+
+    smiles : iterable
+        SMILES to process.
+
+    timeout : float, optional (default=TIMEOUT)
+        time budget in seconds for one molecule. None for no limit.
+
+    default : optional (default=None)
+        result used for molecules that exceeded the time budget.
+
+    max_workers : int, optional (default=None)
+        number of processes. None for number of CPUs, 1 to run in the current process (in one worker process outside the main thread).
+
+    logger : logging.Logger, optional (default=None)
+        logger used to report molecules that exceeded the time budget.
+
+    Returns:
+    --------
+    results : list
+        fn(smiles) for each SMILES in the input order.
+    """
+    smiles = list(smiles)
+    unique = list(pandas.unique(pandas.Series(smiles, dtype = object)))
+    if len(unique) == 0 or ((len(unique) < MIN_PARALLEL or max_workers == 1) and _alarm_available(timeout)):
+        outputs = _run_chunk(fn, unique, timeout)
+    else:
+        if not _alarm_available(timeout):
+            max_workers = min(max_workers or os.cpu_count() or 1, len(unique))
+        n_chunks = 4 * (max_workers or os.cpu_count() or 1)
+        with concurrent.futures.ProcessPoolExecutor(max_workers = max_workers) as executor:
+            chunks = [unique[i::n_chunks] for i in range(n_chunks)]
+            chunk_outputs = list(executor.map(_run_chunk, [fn] * n_chunks, chunks, [timeout] * n_chunks))
+        outputs = [None] * len(unique)
+        for i, chunk_output in enumerate(chunk_outputs):
+            outputs[i::n_chunks] = chunk_output
+
+    results = {}
+    for x, (result, timed_out) in zip(unique, outputs):
+        if timed_out:
+            if logger is not None:
+                logger.warning('Time budget of {} s exceeded for {}'.format(timeout, x))
+            result = default
+        results[x] = result
+    return [results[x] for x in smiles]
@@ -5,4 +5,7 @@ class UniprotNotFoundError(Exception):
     pass
 
 class UniprotMultipleOutputError(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class MoleculeTimeoutError(Exception):
+    pass
@@ -1,6 +1,7 @@
 # Formating before merging and checking.
 import os
 import sys
+import numpy
 import pandas
 import re
 import json
@@ -8,10 +9,14 @@ import itertools
 import logging
 
 
-from utils import perform_mutation, merge_cols_with_priority, enumerate_isomers
+from mutations import mutate_sequence_ids
+from sequences import SequenceTable
 from uniprot_utils import get_uniprot_sequences
 from blast_utils import get_blast_data
 from pubchem_utils import get_map_inchikey_to_canonicalSMILES, get_map_isomericSMILES_to_inchikey
+from cache_utils import load_json_map, update_json_map, update_csv_table, write_csv_atomic, cache_lock
+from isomers import IsomerCache
+from registry import component_table
 
 # (OK) TODO: Order mutations (for mutated_Uniprot_ID)
 # (OK) TODO: Stip spaces
@@ -20,6 +25,9 @@ from pubchem_utils import get_map_inchikey_to_canonicalSMILES, get_map_isomericS
 # (OK) TODO: normalize separator
 # (OK) TODO: exclude examples without sequence to separate csv.
 
+# Normalization steps of PreFormatter in the order in which they are applied (see PreFormatter.normalize_strings).
+NORMALIZATION_STEPS = ('strip_whitespace', 'lowercase_string', 'replace_', 'normalize_entries')
+
 
 class PreFormatter:
     """
@@ -55,6 +63,9 @@ class PreFormatter:
         list of dictionaries in the form {'col' : colname, 'from' : words_to_replace, 'to' : replace_with_this}. This is 
         used in normalize_entries method to fix obvious problems like writing \'luciferase assay\' instead of \'luciferase\'.
 
+        Rules of strip_whitespace_cols, lowercase_string_cols, replace_cols and normalize_entries_col are compiled to one plan per column
+        (see _normalization_plan) and applied in one pass (see normalize_strings).
+
     conditioned_set_value_cols : list
         list of dictionaries in the form {'cond_col' : colname, 'cond_val' : value, 'target_col' : colname, 'target_val' : value} which is
         used to set values for column \'target_col\' in entries where \'cond_col\' are \'cond_val\' to \'target_val\'. For instance if there is 
@@ -153,10 +164,9 @@ class PreFormatter:
         new_idx = candidate_idx.difference(df_uniprot.index)
         if len(new_idx) > 0:
             self.logger.info('Updating df_uniprot...')
-            NEW = get_uniprot_sequences(new_idx.tolist())
-            NEW.set_index(self.df_uniprot_cols[0], drop = True, inplace = True)
-            df_uniprot = df_uniprot.append(NEW, ignore_index = False, verify_integrity = True)
-            df_uniprot.to_csv(os.path.join(self.auxillary_dir, 'uniprot_sequences.csv'), sep = ';', index = True)
+            df_uniprot = update_csv_table(os.path.join(self.auxillary_dir, 'uniprot_sequences.csv'), df_uniprot, new_idx.tolist(),
+                                          lambda ids: get_uniprot_sequences(ids).set_index(self.df_uniprot_cols[0], drop = True),
+                                          logger = self.logger, sep = ';', index = True)
         return df_uniprot
 
     def _update_auxillary(self, full_df):
@@ -170,6 +180,7 @@ class PreFormatter:
     def add_implied_columns(self, df):
         """
         Add \'_Sequence\' column to df with retrieved sequences from UniProt (or keeping sequence if no UniProt ID is provided).
+        Sequences in \'_Sequence\' and \'Uniprot_Sequence\' are stored as IDs in sequence_table (see SequenceTable in sequences.py).
 
         Paramters:
         ----------
@@ -191,7 +202,9 @@ class PreFormatter:
             print(df_join.columns)
             df_join = df_join.join(self.df_uniprot[['Uniprot_Sequence']], on = 'Uniprot ID', how = 'left')
         
-        df_join['_Sequence'] = df_join.apply(lambda x: merge_cols_with_priority(x, primary_col = 'Uniprot_Sequence', secondary_col = 'Sequence'), axis = 1)
+        self.sequence_table = SequenceTable()
+        df_join['Uniprot_Sequence'] = self.sequence_table.encode(df_join['Uniprot_Sequence'])
+        df_join['_Sequence'] = df_join['Uniprot_Sequence'].fillna(self.sequence_table.encode(df_join['Sequence']))
         return df_join
         
     @staticmethod
@@ -201,32 +214,144 @@ class PreFormatter:
         else:
             return x
 
-    def strip_whitespace(self, df):
+    @staticmethod
+    def _lower(x):
+        if isinstance(x, str):
+            return x.lower()
+        else:
+            return x
+
+    @staticmethod
+    def _replace_(x, _from, _to):
+        if isinstance(x, str):
+            for s in _from:
+                x = x.replace(s, _to)
+            return x
+        else:
+            return x
+
+    @staticmethod
+    def _normalize_entries(x, from_entry, to_entry):
+        if isinstance(x, str):
+            return x.replace(from_entry, to_entry)
+        else:
+            return x
+
+    def _normalization_plan(self, steps = NORMALIZATION_STEPS):
         """
-        for each entry in \'strip_whitespace_cols\' normalize whitespaces.
+        Compile rules of normalization steps to plan for each column. Operations of a column keep the order of steps and rules.
+
+        Parameters:
+        -----------
+        steps : iterable
+            names of steps (see NORMALIZATION_STEPS).
+
+        Returns:
+        --------
+        plan : dict
+            mapping from column to list of operations (\'strip\', None, None), (\'lower\', None, None) or (\'replace\', _from, _to).
+        """
+        plan = {}
+        for step in NORMALIZATION_STEPS:
+            if step not in steps:
+                continue
+            if step == 'strip_whitespace':
+                for col in self.strip_whitespace_cols:
+                    plan.setdefault(col, []).append(('strip', None, None))
+            elif step == 'lowercase_string':
+                for col in self.lowercase_string_cols:
+                    plan.setdefault(col, []).append(('lower', None, None))
+            elif step == 'replace_':
+                for case in self.replace_cols:
+                    for _from in case['from']:
+                        plan.setdefault(case['col'], []).append(('replace', _from, case['to']))
+            elif step == 'normalize_entries':
+                for case in self.normalize_entries_col:
+                    plan.setdefault(case['col'], []).append(('replace', case['from'], case['to']))
+        return plan
+
+    @staticmethod
+    def _apply_plan(col, operations):
+        """
+        Apply operations (see _normalization_plan) to strings in col. Each distinct string is processed once with vectorized str operations.
+        Other values (NaNs, numbers) are kept, so the result is the same as applying _strip_whitespace, _lower, _replace_ and
+        _normalize_entries to each entry.
+
+        Parameters:
+        -----------
+        col : pandas.Series
+            column being processed.
+
+        operations : list
+            operations of the column.
+
+        Returns:
+        --------
+        col : pandas.Series
+            processed copy of col.
+        """
+        if isinstance(col.dtype, pandas.StringDtype):
+            col = col.astype(object) # Series.apply returns object column as well.
+        elif col.dtype != object:
+            return col.copy() # No strings in the column.
+        if pandas.api.types.infer_dtype(col, skipna = True) == 'string':
+            is_str = col.notna().values # All values except NaNs are strings.
+        else:
+            is_str = numpy.fromiter((isinstance(x, str) for x in col.values), dtype = bool, count = len(col))
+        if not is_str.any():
+            return col.infer_objects() # The same dtype as Series.apply gives.
+        codes, uniques = pandas.factorize(col[is_str])
+        strings = pandas.Series(numpy.asarray(uniques, dtype = object), dtype = object)
+        for operation, _from, _to in operations:
+            if operation == 'strip':
+                strings = strings.str.strip().str.replace(r'\s\s+', ' ', regex = True)
+            elif operation == 'lower':
+                strings = strings.str.lower()
+            elif operation == 'replace':
+                strings = strings.str.replace(_from, _to, regex = False)
+        col = col.copy()
+        col[is_str] = strings.values[codes]
+        return col
+
+    def normalize_strings(self, df, steps = NORMALIZATION_STEPS):
+        """
+        Apply normalization steps (strip_whitespace, lowercase_string, replace_ and normalize_entries) to df in one pass over each column
+        (see _normalization_plan and _apply_plan).
 
         Paramters:
         ----------
         df : pandas.DataFrame
             dataframe being processed.
 
+        steps : iterable
+            names of steps (see NORMALIZATION_STEPS).
+
         Returns:
         --------
         transformed_df : pandas.DataFrame
             copy of df with updated columns.
         """
         transformed_df = df.copy()
-        for col in self.strip_whitespace_cols:
-            transformed_df[col] = transformed_df[col].apply(self._strip_whitespace)
+        for col, operations in self._normalization_plan(steps).items():
+            transformed_df[col] = self._apply_plan(transformed_df[col], operations)
         return transformed_df
 
+    def strip_whitespace(self, df):
+        """
+        for each entry in \'strip_whitespace_cols\' normalize whitespaces.
+
+        Paramters:
+        ----------
+        df : pandas.DataFrame
+            dataframe being processed.
+
+        Returns:
+        --------
+        transformed_df : pandas.DataFrame
+            copy of df with updated columns.
+        """
+        return self.normalize_strings(df, steps = ['strip_whitespace'])
 
-    @staticmethod
-    def _lower(x):
-        if isinstance(x, str):
-            return x.lower()
-        else:
-            return x
 
     def lowercase_string(self, df):
         """
@@ -242,21 +367,9 @@ class PreFormatter:
         transformed_df : pandas.DataFrame
             copy of df with updated columns.
         """
-        transformed_df = df.copy()
-        for col in self.lowercase_string_cols:
-            transformed_df[col] = transformed_df[col].apply(self._lower)
-        return transformed_df
+        return self.normalize_strings(df, steps = ['lowercase_string'])
 
 
-    @staticmethod
-    def _replace_(x, _from, _to):
-        if isinstance(x, str):
-            for s in _from:
-                x = x.replace(s, _to)
-            return x
-        else:
-            return x
-
     def replace_(self, df):
         """
         for each entry in \'replace_cols\', for a for a column given by \'col\' replace patterns in \'from\' to pattern in \'to\'.
@@ -271,19 +384,9 @@ class PreFormatter:
         transformed_df : pandas.DataFrame
             copy of df with updated columns.
         """
-        transformed_df = df.copy()
-        for case in self.replace_cols:
-            transformed_df[case['col']] = transformed_df[case['col']].apply(lambda x: self._replace_(x, case['from'], case['to']))
-        return transformed_df
+        return self.normalize_strings(df, steps = ['replace_'])
 
 
-    @staticmethod
-    def _normalize_entries(x, from_entry, to_entry):
-        if isinstance(x, str):
-            return x.replace(from_entry, to_entry)
-        else:
-            return x
-
     def normalize_entries(self, df):
         """
         for each entry in \'normalize_entries_col\', for a column given by \'col\' replace phrase in \'from\' to phrase in \'to\'.
@@ -298,10 +401,7 @@ class PreFormatter:
         transformed_df : pandas.DataFrame
             copy of df with updated columns.
         """
-        transformed_df = df.copy()
-        for case in self.normalize_entries_col:
-            transformed_df[case['col']] = transformed_df[case['col']].apply(lambda x: self._normalize_entries(x, case['from'], case['to']))
-        return transformed_df
+        return self.normalize_strings(df, steps = ['normalize_entries'])
 
     
     def conditioned_set_value(self, df):
@@ -418,10 +518,7 @@ class PreFormatter:
         exclude_df : pandas.DataFrame
         excluded records either without sequence or having some exotic class.
         """
-        df = self.strip_whitespace(df)
-        df = self.lowercase_string(df)
-        df = self.replace_(df)
-        df = self.normalize_entries(df)
+        df = self.normalize_strings(df)
         df = self.conditioned_set_value(df)
         df, excluded_df = self.exclude_empty_sequence(df)
         df, excluded_df = self.exclude_antagonist(df, excluded_df)
@@ -494,11 +591,7 @@ class PostFormatter:
             loaded \'uniprot_sequences.csv\'.
         """
         # map_inchikey_to_canonicalSMILES:
-        try:
-            with open(os.path.join(self.auxillary_dir, 'map_inchikey_to_canonicalSMILES.json'), 'r') as jsonfile:
-                map_inchikey_to_canonicalSMILES = json.load(jsonfile)
-        except FileNotFoundError:
-            map_inchikey_to_canonicalSMILES = {}
+        map_inchikey_to_canonicalSMILES = load_json_map(os.path.join(self.auxillary_dir, 'map_inchikey_to_canonicalSMILES.json'))
 
         # df_uniprot
         try:
@@ -524,6 +617,9 @@ class PostFormatter:
             if df_blast.columns[i] != self.df_blast_col[i]:
                 raise ValueError('df_blast has different columns or column positions than in self.df_blast_cols')
         
+        # map_canonicalSMILES_to_isomers:
+        self.isomer_cache = IsomerCache(self.auxillary_dir, logger = self.logger)
+
         #
         self.map_inchikey_to_canonicalSMILES = map_inchikey_to_canonicalSMILES
         self.df_uniprot = df_uniprot
@@ -547,10 +643,8 @@ class PostFormatter:
         new_idx = candidate_idx.difference(current_idx)
         if len(new_idx) > 0:
             self.logger.info('Updating map_inchikey_to_canonicalSMILES...')
-            NEW = get_map_inchikey_to_canonicalSMILES(new_idx.tolist())
-            map_inchikey_to_canonicalSMILES.update(NEW)
-            with open(os.path.join(self.auxillary_dir, 'map_inchikey_to_canonicalSMILES.json'), 'w') as jsonfile:
-                json.dump(map_inchikey_to_canonicalSMILES, jsonfile)
+            map_inchikey_to_canonicalSMILES = update_json_map(os.path.join(self.auxillary_dir, 'map_inchikey_to_canonicalSMILES.json'), map_inchikey_to_canonicalSMILES, new_idx.tolist(),
+                                                              get_map_inchikey_to_canonicalSMILES, logger = self.logger)
         return map_inchikey_to_canonicalSMILES
 
 
@@ -573,10 +667,9 @@ class PostFormatter:
         new_idx = candidate_idx.difference(df_uniprot.index)
         if len(new_idx) > 0:
             self.logger.info('Updating df_uniprot...')
-            NEW = get_uniprot_sequences(new_idx.tolist())
-            NEW.set_index(self.df_uniprot_cols[0], drop = True, inplace = True)
-            df_uniprot = df_uniprot.append(NEW, ignore_index = False, verify_integrity = True)
-            df_uniprot.to_csv(os.path.join(self.auxillary_dir, 'uniprot_sequences.csv'), sep = ';', index = True)
+            df_uniprot = update_csv_table(os.path.join(self.auxillary_dir, 'uniprot_sequences.csv'), df_uniprot, new_idx.tolist(),
+                                          lambda ids: get_uniprot_sequences(ids).set_index(self.df_uniprot_cols[0], drop = True),
+                                          logger = self.logger, sep = ';', index = True)
         return df_uniprot
 
     def _update_auxillary_df_blast(self, full_df):
@@ -608,7 +701,16 @@ class PostFormatter:
         if len(new_sequences) > 0:
             self.logger.info('Appending to df_blast...')
             df_blast = pandas.concat([df_blast, NEW], axis=0, ignore_index=True).reset_index(drop=True)
-            df_blast.to_csv(os.path.join(self.auxillary_dir, 'df_blast.csv'), sep = ';', index = True)
+            path = os.path.join(self.auxillary_dir, 'df_blast.csv')
+            with cache_lock(path):
+                # Keep sequences blasted by other processes in the meantime.
+                try:
+                    ON_DISK = pandas.read_csv(path, sep = ';', index_col = [0])
+                except FileNotFoundError:
+                    ON_DISK = df_blast.iloc[:0]
+                df_blast = pandas.concat([ON_DISK, df_blast], axis=0, ignore_index=True)
+                df_blast = df_blast.drop_duplicates(subset=['species','mutated_Sequence']).reset_index(drop=True)
+                write_csv_atomic(df_blast, path, sep = ';', index = True)
         return df_blast
 
     def update_auxillary(self, df):
@@ -630,6 +732,7 @@ class PostFormatter:
     def add_implied_columns(self, df):
         """
         Add \'_Sequence\' column to df with retrieved sequences from UniProt (or keeping sequence if no UniProt ID is provided).
+        Sequences in \'_Sequence\' and \'Uniprot_Sequence\' are stored as IDs in sequence_table (see SequenceTable in sequences.py).
 
         Paramters:
         ----------
@@ -651,14 +754,16 @@ class PostFormatter:
             print(df_join.columns)
             df_join = df_join.join(self.df_uniprot[['Uniprot_Sequence']], on = 'Uniprot ID', how = 'left')
         
-        df_join['_Sequence'] = df_join.apply(lambda x: merge_cols_with_priority(x, primary_col = 'Uniprot_Sequence', secondary_col = 'Sequence'), axis = 1)
+        self.sequence_table = SequenceTable()
+        df_join['Uniprot_Sequence'] = self.sequence_table.encode(df_join['Uniprot_Sequence'])
+        df_join['_Sequence'] = df_join['Uniprot_Sequence'].fillna(self.sequence_table.encode(df_join['Sequence']))
         return df_join
 
 
     def get_map_inchikey_to_isomers(self, df):
         """
         For each InChI key that contains \'-UHFFFAOYSA-\' get all the isomers. 
-        Isomers are identified using rdkit.Chem.EnumerateStereoisomers.EnumerateStereoisomers
+        Isomers are identified using rdkit.Chem.EnumerateStereoisomers.EnumerateStereoisomers and cached in isomer_cache (see IsomerCache in isomers.py).
 
         If there are multiple InChI key in a record (i.e. mixture) then isomers are found for each InChI key separately.
 
@@ -672,22 +777,16 @@ class PostFormatter:
         map_inchikey_to_isomers : dict
             mapping from InChI key to list of isomers.
         """
-        _df = df.copy()
-        _df = _df.dropna(subset = ['InChI Key'])
-        map_inchikey_to_isomers = {}
-        for x in _df['InChI Key'].unique():
-            _res = {}
-            for inchikey in x.split(' '):
-                if '-UHFFFAOYSA-' in inchikey: # This is done only for non-isomeric
-                    _res[inchikey] = enumerate_isomers(self.map_inchikey_to_canonicalSMILES[inchikey])
-            map_inchikey_to_isomers.update(_res)
+        inchikeys = pandas.Index(component_table(df['InChI Key'])['InChI Key'].unique())
+        inchikeys = inchikeys[inchikeys.str.contains('-UHFFFAOYSA-', regex = False)] # This is done only for non-isomeric
+        map_inchikey_to_isomers = self.isomer_cache.isomers_of({inchikey : self.map_inchikey_to_canonicalSMILES[inchikey] for inchikey in inchikeys})
         return map_inchikey_to_isomers
 
 
     def get_map_canonicalSMILES_to_isomers(self, df):
         """
         For each canonical SMILES get all the isomers. Isomers are identified 
-        using rdkit.Chem.EnumerateStereoisomers.EnumerateStereoisomers
+        using rdkit.Chem.EnumerateStereoisomers.EnumerateStereoisomers and cached in isomer_cache (see IsomerCache in isomers.py).
 
         If there are multiple canonical SMILES in a record (i.e. mixture) then isomers are found for each SMILES separately.
 
@@ -701,53 +800,63 @@ class PostFormatter:
         map_canonicalSMILES_to_isomers : dict
             mapping from canonical SMILES to list of isomers.
         """
-        _df = df.copy()
-        _df = _df.dropna(subset = ['canonicalSMILES'])
-        map_canonicalSMILES_to_isomers = {}
-        for x in _df['canonicalSMILES'].unique():
-            _res = {}
-            for smiles in x.split(' '):
-                _res[smiles] = enumerate_isomers(smiles)
-            map_canonicalSMILES_to_isomers.update(_res)
+        smiles = component_table(df['canonicalSMILES'])['canonicalSMILES'].unique()
+        map_canonicalSMILES_to_isomers = self.isomer_cache.isomers_of({x : x for x in smiles})
         return map_canonicalSMILES_to_isomers
 
 
-    @staticmethod
-    def _update_mixture(x, _map_inchikey, _map_smiles):
+    def get_map_inchikey_to_isomer_count(self, df, cap = 2):
         """
-        Notes:
-        ------
-        NaN is kept and retured as NaN.
-        """
-        if x['InChI Key'] == x['InChI Key']:
-            if ' ' in x['InChI Key']:
-                return 'mixture'
-            elif x['InChI Key'] in _map_inchikey.keys():
-                if len(_map_inchikey[x['InChI Key']]) > 1:
-                    return 'sum of isomers'
-                else:
-                    return 'mono'
-            else:
-                return 'mono'
-        elif x['canonicalSMILES'] == x['canonicalSMILES']:
-            if ' ' in x:
-                return 'mixture'
-            elif x['canonicalSMILES'] in _map_smiles.keys():
-                if len(_map_smiles[x['canonicalSMILES']]) > 1:
-                    return 'sum of isomers'
-                else:
-                    return 'mono'
-            else:
-                return 'mono'
-        return float("nan")
+        For each InChI key that contains \'-UHFFFAOYSA-\' count the isomers up to cap (see IsomerCache.counts in isomers.py).
+        This is cheaper than get_map_inchikey_to_isomers when only the number of isomers matters.
+
+        Paramters:
+        ----------
+        df : pandas.DataFrame
+            dataframe  to process
+
+        cap : int
+            maximal number of isomers to count.
+
+        Returns:
+        --------
+        map_inchikey_to_count : dict
+            mapping from InChI key to number of isomers, None if the counting exceeded the time budget.
+        """
+        inchikeys = pandas.Index(component_table(df['InChI Key'])['InChI Key'].unique())
+        inchikeys = inchikeys[inchikeys.str.contains('-UHFFFAOYSA-', regex = False)] # This is done only for non-isomeric
+        map_canonicalSMILES_to_count = self.isomer_cache.counts([self.map_inchikey_to_canonicalSMILES[inchikey] for inchikey in inchikeys], cap = cap)
+        return {inchikey : map_canonicalSMILES_to_count[self.map_inchikey_to_canonicalSMILES[inchikey]] for inchikey in inchikeys}
+
+
+    def get_map_canonicalSMILES_to_isomer_count(self, df, cap = 2):
+        """
+        For each canonical SMILES count the isomers up to cap (see IsomerCache.counts in isomers.py).
+
+        Paramters:
+        ----------
+        df : pandas.DataFrame
+            dataframe  to process
+
+        cap : int
+            maximal number of isomers to count.
+
+        Returns:
+        --------
+        map_canonicalSMILES_to_count : dict
+            mapping from canonical SMILES to number of isomers, None if the counting exceeded the time budget.
+        """
+        smiles = component_table(df['canonicalSMILES'])['canonicalSMILES'].unique()
+        return self.isomer_cache.counts(smiles, cap = cap)
+
 
     def update_mixture_col(self, df):
         """
-        Create/update \'Mixture\' column based on isomers from map_inchikey_to_isomers and map_canonicalSMILES_to_isomers.
+        Create/update \'Mixture\' column based on number of isomers from get_map_inchikey_to_isomer_count and get_map_canonicalSMILES_to_isomer_count.
 
         If \'InChI Key\' (or \'canonicalSMILES\' if InChI key is not provided) contains space put label \'mixture\',
         else if number of isomers is greater than 1 put \'sum of isomers\' and 
-        for other cases put \'mono\'.
+        for other cases put \'mono\'. Rows with molecules whose isomers were not counted within the time budget keep their label.
 
         NaNs are kept as NaNs.
 
@@ -762,10 +871,26 @@ class PostFormatter:
             copy of df with updated \'Mixture\' column.
         """
         new_df = df.copy()
-        map_inchikey_to_isomers = self.get_map_inchikey_to_isomers(df)
-        map_canonicalSMILES_to_isomers = self.get_map_canonicalSMILES_to_isomers(df)
-        new_df['Mixture'] = new_df.apply(lambda x: self._update_mixture(x, _map_inchikey = map_inchikey_to_isomers, _map_smiles = map_canonicalSMILES_to_isomers), axis = 1)
-        return new_df   
+        map_inchikey_to_count = self.get_map_inchikey_to_isomer_count(df)
+        map_canonicalSMILES_to_count = self.get_map_canonicalSMILES_to_isomer_count(df)
+        has_inchikey = df['InChI Key'].notna()
+        has_smiles = ~has_inchikey & df['canonicalSMILES'].notna()
+        # Number of components of InChI key (or canonical SMILES if InChI key is not provided) and its number of isomers.
+        identifiers = df['InChI Key'].where(has_inchikey, df['canonicalSMILES'])
+        n_components = component_table(identifiers.rename('_MolID')).groupby('_row_id').size().reindex(df.index, fill_value = 0)
+        n_isomers = df['InChI Key'].map(map_inchikey_to_count).where(has_inchikey, df['canonicalSMILES'].map(map_canonicalSMILES_to_count)).astype(float)
+        # Molecules whose isomers were not counted within the time budget (count None, see IsomerCache.counts) keep their label.
+        timed_out = df['InChI Key'].isin([key for key, count in map_inchikey_to_count.items() if count is None]).where(
+            has_inchikey, df['canonicalSMILES'].isin([key for key, count in map_canonicalSMILES_to_count.items() if count is None]))
+        mixture = pandas.Series('mono', index = df.index, dtype = object)
+        mixture[n_isomers > 1] = 'sum of isomers'
+        if timed_out.any():
+            self.logger.warning('Mixture column not updated for {} rows with molecules over the time budget of isomer counting'.format(timed_out.sum()))
+            mixture[timed_out] = df.loc[timed_out, 'Mixture'] if 'Mixture' in df.columns else float("nan")
+        mixture[n_components > 1] = 'mixture'
+        mixture[~has_inchikey & ~has_smiles] = float("nan")
+        new_df['Mixture'] = mixture
+        return new_df
         
 
     def update_mutated_sequence_col(self, df):
@@ -787,7 +912,8 @@ class PostFormatter:
         """
         new_df = df.copy()
         new_df_with_implied = self.add_implied_columns(df)
-        new_df['mutated_Sequence'] = new_df_with_implied.apply(lambda x: perform_mutation(x, mutation_col = 'Mutation', seq_col = '_Sequence'), axis = 1)
+        mutated_ids = mutate_sequence_ids(new_df_with_implied, self.sequence_table, mutation_col = 'Mutation', seq_col = '_Sequence')
+        new_df['mutated_Sequence'] = self.sequence_table.decode(mutated_ids)
         return new_df
 
     def add_blast_data(self, df):
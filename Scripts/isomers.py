@@ -3,17 +3,166 @@ import sys
 import pandas
 import json
 import itertools
+import functools
 import logging
 
-from utils import enumerate_isomers
+from utils import enumerate_isomers, count_isomers, smiles_to_inchikey
 from pubchem_utils import get_map_inchikey_to_canonicalSMILES, get_map_isomericSMILES_to_inchikey
+from cache_utils import load_json_map, update_json_map
+from chem_executor import map_molecules
+from errors import MoleculeTimeoutError
 
 
+class IsomerCache:
+    """
+    Persistent mapping from canonical SMILES to the list of its stereoisomers (see enumerate_isomers in utils.py), stored in
+    \'map_canonicalSMILES_to_isomers.json\' in auxillary_dir. Each molecule is enumerated once and the result is shared by all runs.
+
+    New molecules are processed with map_molecules (see chem_executor.py), i.e. in a process pool and with a time budget per molecule.
+    Molecules exceeding the time budget are not saved and are not enumerated again during the same run.
+
+    Attributes:
+    -----------
+    path : str
+        path to the json file.
+
+    map_canonicalSMILES_to_isomers : dict
+        mapping from canonical SMILES to list of isomeric SMILES.
+    """
+    def __init__(self, auxillary_dir, logger = None):
+        """
+        Parameters:
+        -----------
+        auxillary_dir : str
+            directory with auxillary data.
+
+        logger : logging.Logger, optional (default=None)
+            logger used to report updates.
+        """
+        self.path = os.path.join(auxillary_dir, 'map_canonicalSMILES_to_isomers.json')
+        self.logger = logger
+        self.map_canonicalSMILES_to_isomers = load_json_map(self.path)
+        self._counts = {}
+        self._timed_out = set()
+
+    def update(self, canonicalSMILES):
+        """
+        Enumerate isomers of canonical SMILES that are not in the cache yet and save them. NaNs are ignored.
+
+        Parameters:
+        -----------
+        canonicalSMILES : iterable
+            canonical SMILES of single molecules.
+
+        Returns:
+        --------
+        map_canonicalSMILES_to_isomers : dict
+            updated mapping.
+        """
+        candidate_idx = pandas.Index(pandas.Series(list(canonicalSMILES), dtype = object).dropna().unique())
+        current_idx = pandas.Index(self.map_canonicalSMILES_to_isomers.keys(), dtype = object)
+        new_idx = candidate_idx.difference(current_idx).difference(pandas.Index(list(self._timed_out), dtype = object))
+        if len(new_idx) > 0:
+            if self.logger is not None:
+                self.logger.info('Updating map_canonicalSMILES_to_isomers...')
+            isomers = map_molecules(enumerate_isomers, new_idx, logger = self.logger)
+            NEW = {smiles : val for smiles, val in zip(new_idx, isomers) if val is not None}
+            self._timed_out.update(smiles for smiles in new_idx if smiles not in NEW)
+            self.map_canonicalSMILES_to_isomers = update_json_map(self.path, self.map_canonicalSMILES_to_isomers, list(NEW.keys()),
+                                                                  lambda batch: {smiles : NEW[smiles] for smiles in batch}, logger = self.logger)
+        return self.map_canonicalSMILES_to_isomers
+
+    def isomers(self, canonicalSMILES):
+        """
+        Get list of isomers of a canonical SMILES. It is enumerated and saved if it is not in the cache.
+        None is returned if the enumeration exceeded the time budget (an empty list would read as a molecule without isomers).
+        """
+        if canonicalSMILES not in self.map_canonicalSMILES_to_isomers:
+            self.update([canonicalSMILES])
+        return self.map_canonicalSMILES_to_isomers.get(canonicalSMILES)
+
+    def isomers_of(self, map_key_to_canonicalSMILES):
+        """
+        Get lists of isomers of many molecules. Molecules whose enumeration exceeded the time budget are skipped and reported as a warning.
+        Keys without canonical SMILES get an empty list.
+
+        Parameters:
+        -----------
+        map_key_to_canonicalSMILES : dict
+            mapping from key (e.g. InChI key) to canonical SMILES.
+
+        Returns:
+        --------
+        map_key_to_isomers : dict
+            mapping from key to list of isomeric SMILES.
+        """
+        self.update(map_key_to_canonicalSMILES.values())
+        map_key_to_isomers = {key : [] if pandas.isna(smiles) else self.isomers(smiles) for key, smiles in map_key_to_canonicalSMILES.items()}
+        timed_out = [key for key, val in map_key_to_isomers.items() if val is None]
+        if len(timed_out) > 0 and self.logger is not None:
+            self.logger.warning('Isomers of {} molecules were not enumerated within the time budget and are skipped: {}'.format(len(timed_out), timed_out))
+        return {key : val for key, val in map_key_to_isomers.items() if val is not None}
+
+    def counts(self, canonicalSMILES, cap = 2):
+        """
+        Count isomers of many canonical SMILES up to cap. SMILES that are not in the cache are counted with count_isomers (see utils.py)
+        using map_molecules and nothing is saved. NaNs are ignored.
+
+        SMILES whose counting exceeded the time budget get None (the number of their isomers is unknown) and are reported as a warning.
+        They are not counted again during the same run.
+
+        Parameters:
+        -----------
+        canonicalSMILES : iterable
+            canonical SMILES of single molecules.
+
+        cap : int
+            maximal number of isomers to count.
+
+        Returns:
+        --------
+        map_canonicalSMILES_to_count : dict
+            mapping from canonical SMILES to number of isomers (at most cap) or None.
+        """
+        smiles = pandas.Series(list(canonicalSMILES), dtype = object).dropna().unique()
+        new = [x for x in smiles if x not in self.map_canonicalSMILES_to_isomers and (x, cap) not in self._counts]
+        if len(new) > 0:
+            for x, count in zip(new, map_molecules(functools.partial(count_isomers, cap = cap), new, logger = self.logger)):
+                self._counts[(x, cap)] = count
+        map_canonicalSMILES_to_count = {x : self.count(x, cap = cap) for x in smiles}
+        timed_out = [x for x, count in map_canonicalSMILES_to_count.items() if count is None]
+        if len(timed_out) > 0 and self.logger is not None:
+            self.logger.warning('Isomers of {} molecules were not counted within the time budget: {}'.format(len(timed_out), timed_out))
+        return map_canonicalSMILES_to_count
+
+    def count(self, canonicalSMILES, cap = None):
+        """
+        Get number of isomers of a canonical SMILES. If cap is given and the SMILES is not in the cache, isomers are only counted
+        up to cap (see count_isomers in utils.py) and nothing is saved, None is returned if the counting exceeded the time budget.
+        MoleculeTimeoutError is raised if cap is not given and the enumeration exceeded the time budget.
+        """
+        if canonicalSMILES in self.map_canonicalSMILES_to_isomers or cap is None:
+            isomers = self.isomers(canonicalSMILES)
+            if isomers is None:
+                raise MoleculeTimeoutError('Isomers of {} were not enumerated within the time budget'.format(canonicalSMILES))
+            return len(isomers) if cap is None else min(len(isomers), cap)
+        if (canonicalSMILES, cap) not in self._counts:
+            self.counts([canonicalSMILES], cap = cap)
+        return self._counts[(canonicalSMILES, cap)]
+
 
 class IsoRetriever:
-    def __init__(self):
+    def __init__(self, validate_on_pubchem = False):
+        """
+        Parameters:
+        -----------
+        validate_on_pubchem : bool, optional (default=False)
+            if True, InChI keys of isomers computed locally by rdkit are compared with InChI keys retrieved from PubChem and
+            differences are logged (see validate_isomericSMILES_on_pubchem).
+        """
         self.auxillary_dir = 'Data'
         self.log_dir = 'logs'
+        self.validate_on_pubchem = validate_on_pubchem
 
         self.logger = logging.getLogger(__class__.__name__)
         self.logger.setLevel(logging.DEBUG)
@@ -34,18 +183,13 @@ class IsoRetriever:
 
     def _load_auxillary(self):
         # map_inchikey_to_canonicalSMILES:
-        try:
-            with open(os.path.join(self.auxillary_dir, 'map_inchikey_to_canonicalSMILES.json'), 'r') as jsonfile:
-                map_inchikey_to_canonicalSMILES = json.load(jsonfile)
-        except FileNotFoundError:
-            map_inchikey_to_canonicalSMILES = {}
+        map_inchikey_to_canonicalSMILES = load_json_map(os.path.join(self.auxillary_dir, 'map_inchikey_to_canonicalSMILES.json'))
 
         # map_isomericSMILES_to_inchikey:
-        try:
-            with open(os.path.join(self.auxillary_dir, 'map_isomericSMILES_to_inchikey.json'), 'r') as jsonfile:
-                map_isomericSMILES_to_inchikey = json.load(jsonfile)
-        except FileNotFoundError:
-            map_isomericSMILES_to_inchikey = {}
+        map_isomericSMILES_to_inchikey = load_json_map(os.path.join(self.auxillary_dir, 'map_isomericSMILES_to_inchikey.json'))
+
+        # map_canonicalSMILES_to_isomers:
+        self.isomer_cache = IsomerCache(self.auxillary_dir, logger = self.logger)
 
         #
         self.map_inchikey_to_canonicalSMILES = map_inchikey_to_canonicalSMILES
@@ -61,29 +205,66 @@ class IsoRetriever:
         new_idx = candidate_idx.difference(current_idx)
         if len(new_idx) > 0:
             self.logger.info('Updating map_inchikey_to_canonicalSMILES...')
-            NEW = get_map_inchikey_to_canonicalSMILES(new_idx.tolist())
-            map_inchikey_to_canonicalSMILES.update(NEW)
-            with open(os.path.join(self.auxillary_dir, 'map_inchikey_to_canonicalSMILES.json'), 'w') as jsonfile:
-                json.dump(map_inchikey_to_canonicalSMILES, jsonfile)
+            map_inchikey_to_canonicalSMILES = update_json_map(os.path.join(self.auxillary_dir, 'map_inchikey_to_canonicalSMILES.json'), map_inchikey_to_canonicalSMILES, new_idx.tolist(),
+                                                              get_map_inchikey_to_canonicalSMILES, logger = self.logger)
         self.map_inchikey_to_canonicalSMILES = map_inchikey_to_canonicalSMILES
         return map_inchikey_to_canonicalSMILES
 
 
     def _update_auxilary_map_isomericSMILES_to_inchikey(self, candidate_idx):
+        """
+        update \'map_isomericSMILES_to_inchikey.json\' with new isomeric SMILES found in candidate_idx. InChI keys are computed locally
+        using rdkit (see smiles_to_inchikey in utils.py), PubChem is queried only for SMILES rdkit can not process.
+        """
         assert candidate_idx.name == 'isomericSMILES'
         map_isomericSMILES_to_inchikey = self.map_isomericSMILES_to_inchikey.copy()
         current_idx = pandas.Index(map_isomericSMILES_to_inchikey.keys(), name = 'isomericSMILES')
         new_idx = candidate_idx.difference(current_idx)
         if len(new_idx) > 0:
             self.logger.info('Updating map_isomericSMILES_to_inchikey...')
-            NEW = get_map_isomericSMILES_to_inchikey(new_idx.tolist())
-            map_isomericSMILES_to_inchikey.update(NEW)
-            with open(os.path.join(self.auxillary_dir, 'map_isomericSMILES_to_inchikey.json'), 'w') as jsonfile:
-                json.dump(map_isomericSMILES_to_inchikey, jsonfile)
+            LOCAL = dict(zip(new_idx, map_molecules(smiles_to_inchikey, new_idx, logger = self.logger)))
+
+            def fetch(smiles):
+                res = {x : LOCAL[x] for x in smiles if LOCAL[x] is not None}
+                missing = [x for x in smiles if LOCAL[x] is None]
+                if len(missing) > 0:
+                    res.update(get_map_isomericSMILES_to_inchikey(missing))
+                return res
+
+            map_isomericSMILES_to_inchikey = update_json_map(os.path.join(self.auxillary_dir, 'map_isomericSMILES_to_inchikey.json'), map_isomericSMILES_to_inchikey, new_idx.tolist(),
+                                                             fetch, logger = self.logger)
+            self.map_isomericSMILES_to_inchikey = map_isomericSMILES_to_inchikey
+            if self.validate_on_pubchem:
+                self.validate_isomericSMILES_on_pubchem([x for x in new_idx if LOCAL[x] is not None])
         self.map_isomericSMILES_to_inchikey = map_isomericSMILES_to_inchikey
         return map_isomericSMILES_to_inchikey
 
 
+    def validate_isomericSMILES_on_pubchem(self, isomericSMILES):
+        """
+        Compare InChI keys of isomeric SMILES in map_isomericSMILES_to_inchikey with InChI keys retrieved from PubChem.
+        Differences are logged as warnings.
+
+        Parameters:
+        -----------
+        isomericSMILES : list
+            isomeric SMILES to validate.
+
+        Returns:
+        --------
+        df_mismatch : pandas.DataFrame
+            isomeric SMILES with different InChI key on PubChem. Columns \'InChI Key\' and \'PubChem InChI Key\'.
+        """
+        PUBCHEM = get_map_isomericSMILES_to_inchikey(list(isomericSMILES))
+        df = pandas.DataFrame({'InChI Key' : pandas.Series({x : self.map_isomericSMILES_to_inchikey.get(x) for x in PUBCHEM}, dtype = object),
+                               'PubChem InChI Key' : pandas.Series(PUBCHEM, dtype = object)})
+        df.index.name = 'isomericSMILES'
+        df_mismatch = df[df['InChI Key'] != df['PubChem InChI Key']]
+        if len(df_mismatch) > 0:
+            self.logger.warning('{} of {} InChI keys computed by rdkit differ from PubChem: \n{}'.format(len(df_mismatch), len(df), df_mismatch.head(20).to_string()))
+        return df_mismatch
+
+
     def retrieve_isomericSMILES(self, df):
         _df = df.copy()
         _df = _df.dropna(subset = ['InChI Key'])
@@ -91,13 +272,8 @@ class IsoRetriever:
         candidate_idx = candidate_idx.str.split(' ').explode() # TODO: pandas FutureWarning for this row.
         candidate_idx = pandas.Index(candidate_idx.unique(), name = 'InChI Key')
         self._update_auxilary_map_inchikey_to_canonincalSMILES(candidate_idx)
-        map_inchikey_to_isomers = {}
-        for x in _df['InChI Key'].unique():
-            _res = {}
-            for inchikey in x.split(' '):
-                if '-UHFFFAOYSA-' in inchikey: # This is done only for non-isomeric
-                    _res[inchikey] = enumerate_isomers(self.map_inchikey_to_canonicalSMILES[inchikey])
-            map_inchikey_to_isomers.update(_res)
+        candidate_idx = candidate_idx[candidate_idx.str.contains('-UHFFFAOYSA-', regex = False)] # This is done only for non-isomeric
+        map_inchikey_to_isomers = self.isomer_cache.isomers_of({inchikey : self.map_inchikey_to_canonicalSMILES[inchikey] for inchikey in candidate_idx})
 
         isomericSMILES = list(itertools.chain(*map_inchikey_to_isomers.values()))
         candidate_idx = pandas.Index(isomericSMILES, name = 'isomericSMILES')
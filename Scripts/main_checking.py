@@ -2,13 +2,14 @@ import argparse
 import os
 import pandas
 import datetime
+import logging
 
 from formatting import PreFormatter, PostFormatter
 from checking import Checker, PostChecker, OptionalChecker
     
 
 
-def main_check(csv_path, sep = ';', run_optional_checker = True, auxillary_dir = 'Data', log_dir = 'logs'):
+def main_check(csv_path, sep = ';', run_optional_checker = True, auxillary_dir = 'Data', log_dir = 'logs', log_level = logging.DEBUG, only = None, skip = None, n_jobs = 1, entity_level = False, memo = False):
     """
     main script to run checks and format the data.
     
@@ -23,29 +24,55 @@ def main_check(csv_path, sep = ';', run_optional_checker = True, auxillary_dir =
     run_optional_checker : bool
         whether to run optional checker. See OptionalChecker in checking.py for more details.
 
+    log_level : int
+        level of checkers\' loggers. Failures are written to \'failures.sqlite\' in log_dir regardless of the level (see reports.py).
+
+    only : list, optional (default=None)
+        names of checks to run (see Checker.checks). Each checker runs the selected checks it has. Default checks of each checker are run if None.
+
+    skip : list, optional (default=None)
+        names of checks that are not run.
+
+    n_jobs : int
+        number of threads running independent checks (see Checker.n_jobs).
+
+    entity_level : bool
+        whether checks of molecules and sequences are run on distinct entities only (see Checker.entity_level).
+
+    memo : bool
+        whether outcomes of checks of molecules and sequences are kept between runs (see Checker.memo).
+
     Return:
     -------
     df : pandas.DataFrame
         formated dataframe. If the checks are not passed an error is raised.
     """
+    checker = Checker(auxillary_dir = auxillary_dir, log_dir = log_dir, log_level = log_level, n_jobs = n_jobs, entity_level = entity_level, memo = memo)
+    post_checker = PostChecker(auxillary_dir = auxillary_dir, log_dir = log_dir, log_level = log_level, n_jobs = n_jobs, entity_level = entity_level, memo = memo)
+    checkers = [checker, post_checker]
+    if run_optional_checker:
+        optional_checker = OptionalChecker(auxillary_dir = auxillary_dir, log_dir = log_dir, log_level = log_level, n_jobs = n_jobs, entity_level = entity_level, memo = memo)
+        checkers.append(optional_checker)
+    known_checks = {check['name'] for x in checkers for check in x.checks}
+    unknown_checks = [name for name in (only or []) + (skip or []) if name not in known_checks]
+    if len(unknown_checks) > 0:
+        raise ValueError('Unknown checks: {}. Available checks: {}'.format(unknown_checks, sorted(known_checks)))
+
     df = pandas.read_csv(csv_path, sep = sep, index_col = 0)
     
     formatter = PreFormatter(auxillary_dir = auxillary_dir, log_dir = log_dir)
     df, exclude_df = formatter(df)
     
     # exclude_df.to_csv('RawData_test/exclude.csv', sep=';')
-    checker = Checker(auxillary_dir = auxillary_dir, log_dir = log_dir)
-    checker(df)
+    checker(df, only = only, skip = skip)
     
     post_formatter = PostFormatter(auxillary_dir = auxillary_dir, log_dir = log_dir)
     df = post_formatter(df)
     
-    post_checker = PostChecker(auxillary_dir = auxillary_dir, log_dir = log_dir)
-    post_checker(df)
+    post_checker(df, only = only, skip = skip)
 
     if run_optional_checker:
-        optional_checker = OptionalChecker(auxillary_dir = auxillary_dir, log_dir = log_dir)
-        optional_checker(df)
+        optional_checker(df, only = only, skip = skip)
 
     return df
 
@@ -58,6 +85,18 @@ if __name__ == '__main__':
                         help='separator for the csv. Semicolon is used by default')
     parser.add_argument('--additional_check', type=str, default='y',
                         help='whether to run additional check or not. y/n. It is run by deafult.')
+    parser.add_argument('--log_level', type=str, default='DEBUG',
+                        help='level of checkers\' logs (e.g. INFO to skip fail examples). Failures are always written to failures.sqlite in the log dir.')
+    parser.add_argument('--only', type=str, nargs='*', default=None,
+                        help='names of checks to run (e.g. not_nan format). Default checks of each checker are run by default.')
+    parser.add_argument('--skip', type=str, nargs='*', default=None,
+                        help='names of checks that are not run.')
+    parser.add_argument('--entity_level', type=str, default='n',
+                        help='whether to run checks of molecules and sequences on distinct entities only. y/n. It is off by default.')
+    parser.add_argument('--memo', type=str, default='n',
+                        help='whether to keep outcomes of checks of molecules and sequences between runs (check_memo.sqlite in auxillary dir). y/n. It is off by default.')
+    parser.add_argument('--n_jobs', type=int, default=1,
+                        help='number of threads running independent checks. 1 by default.')
     args = parser.parse_args()
 
     print('csv path: {}'.format(args.csv_path))
@@ -69,4 +108,8 @@ if __name__ == '__main__':
     else:
         run_optional_checker = False
 
-    df = main_check(csv_path, sep, run_optional_checker)
\ No newline at end of file
+    entity_level = args.entity_level.lower() == 'y' or args.entity_level.lower() == 'yes'
+    memo = args.memo.lower() == 'y' or args.memo.lower() == 'yes'
+
+    df = main_check(csv_path, sep, run_optional_checker, log_level = getattr(logging, args.log_level.upper()),
+                    only = args.only, skip = args.skip, n_jobs = args.n_jobs, entity_level = entity_level, memo = memo)
\ No newline at end of file
@@ -0,0 +1,271 @@
+# Mutation engine: mutations are parsed once and applied on bytearray, results are memoized.
+import hashlib
+import functools
+import numpy
+import pandas
+
+from errors import MutationError
+from utils import _perform_mutation
+
+# Number of mutated sequences kept by MutationEngine.
+MUTATION_CACHE_SIZE = 2**16
+
+
+@functools.lru_cache(maxsize = None)
+def parse_mutations(mutations, sep = '_'):
+    """
+    Parse mutations (e.g. \'A123C_G45T\') to tuple of (from, position, to, mutation), where position is 0-based.
+    The order of mutations is kept.
+
+    Parameters:
+    -----------
+    mutations : str
+        mutations separated by sep.
+
+    sep : str
+        separator of mutations.
+
+    Returns:
+    --------
+    parsed : tuple
+        tuple of (from, position, to, mutation) tuples.
+    """
+    parsed = []
+    for mutation in mutations.strip().split(sep):
+        parsed.append((mutation[0], int(mutation[1:-1]) - 1, mutation[-1], mutation))
+    return tuple(parsed)
+
+
+def mutation_error_message(seq, _from, _position, mutation):
+    """
+    Message of MutationError with the same context window as in _perform_mutation in utils.py. Positions out of range of seq are reported as well.
+    """
+    left_pos = _position - 5
+    right_pos = _position + 4
+    if _position < 5: left_pos = 0
+    if _position > len(seq) - 4: right_pos = len(seq)
+    if not -len(seq) <= _position < len(seq):
+        return 'Position {} is out of range of sequence of length {} arround: {}. Mutation: {}'.format(_position, len(seq), seq[left_pos:right_pos], mutation)
+    return 'Expected letter {} on position {} in sequence arround: {}. Found {}. Mutation: {}'.format(_from, _position, seq[left_pos:right_pos], seq[_position], mutation)
+
+
+def sequence_hash(seq):
+    """
+    blake2b digest of a sequence used as part of the key of mutated sequences.
+    """
+    return hashlib.blake2b(seq.encode(), digest_size = 16).digest()
+
+
+class MutationEngine:
+    """
+    Apply parsed mutations (see parse_mutations) to sequences. The sequence is copied to bytearray once and all mutations
+    are written in place. Results are memoized by (sequence hash, parsed mutations), so each distinct pair is mutated once.
+
+    Errors are the same as from _perform_mutation in utils.py (MutationError with the context of the mutation).
+    """
+    def __init__(self, maxsize = MUTATION_CACHE_SIZE):
+        """
+        Parameters:
+        -----------
+        maxsize : int
+            maximal number of memoized sequences. The memo is cleared when it is full.
+        """
+        self.maxsize = maxsize
+        self._memo = {}
+
+    def __len__(self):
+        return len(self._memo)
+
+    @staticmethod
+    def _mutate(seq, mutations):
+        if not seq.isascii():
+            return _perform_mutation([mutation[3] for mutation in mutations], seq)
+        buffer = bytearray(seq, 'ascii')
+        for _from, _position, _to, mutation in mutations:
+            if buffer[_position] == ord(_from):
+                buffer[_position] = ord(_to)
+            else:
+                raise MutationError(mutation_error_message(buffer.decode(), _from, _position, mutation))
+        return buffer.decode()
+
+    def apply(self, seq, mutations):
+        """
+        Mutate sequence.
+
+        Parameters:
+        -----------
+        seq : str
+            sequence.
+
+        mutations : str or tuple
+            mutations separated by \'_\' or parsed mutations (see parse_mutations).
+
+        Returns:
+        --------
+        mutated_seq : str
+            mutated sequence
+        """
+        if isinstance(mutations, str):
+            mutations = parse_mutations(mutations)
+        key = (sequence_hash(seq), mutations)
+        # The memo can be cleared by other thread (see Checker.n_jobs), so the result is kept locally.
+        mutated_seq = self._memo.get(key)
+        if mutated_seq is None:
+            if len(self._memo) >= self.maxsize:
+                self._memo.clear()
+            mutated_seq = self._mutate(seq, mutations)
+            self._memo[key] = mutated_seq
+        return mutated_seq
+
+    def mutate_column(self, df, mutation_col = 'Mutation', seq_col = 'Sequence'):
+        """
+        Vectorized version of perform_mutation in utils.py. Each distinct (sequence, mutation) pair in df is mutated once.
+
+        Parameters:
+        -----------
+        df : pandas.DataFrame
+            dataframe with sequences and mutations.
+
+        mutation_col : str
+            name of the column with mutation information.
+
+        seq_col : str
+            name of the column with sequences.
+
+        Returns:
+        --------
+        mutated_seq : pandas.Series
+            mutated sequences with the same index as df. Rows without mutation (or without sequence) keep the sequence.
+        """
+        mutated_seq = df[seq_col].copy()
+        mask = df[mutation_col].notna() & df[seq_col].notna()
+        if mask.any():
+            pairs = df.loc[mask, [seq_col, mutation_col]]
+            unique_pairs = pairs.drop_duplicates()
+            results = {(seq, mutations) : self.apply(seq, mutations) for seq, mutations in zip(unique_pairs[seq_col], unique_pairs[mutation_col])}
+            mutated_seq = mutated_seq.astype(object)
+            mutated_seq[mask] = [results[pair] for pair in zip(pairs[seq_col], pairs[mutation_col])]
+        return mutated_seq
+
+    def mutate_ids(self, df, sequence_table, mutation_col = 'Mutation', seq_col = '_Sequence'):
+        """
+        Same as mutate_column, but seq_col has IDs of sequences in sequence_table (see SequenceTable in sequences.py). Mutated sequences
+        are added to sequence_table and their IDs are returned.
+
+        Returns:
+        --------
+        mutated_ids : pandas.Series
+            IDs of mutated sequences with the same index as df (nullable integer). Rows without mutation (or without sequence) keep the ID.
+        """
+        mutated_ids = df[seq_col].astype('Int64')
+        mask = df[mutation_col].notna() & df[seq_col].notna()
+        if mask.any():
+            pairs = df.loc[mask, [seq_col, mutation_col]]
+            unique_pairs = pairs.drop_duplicates()
+            results = {(_id, mutations) : sequence_table.intern(self.apply(sequence_table[_id], mutations))
+                       for _id, mutations in zip(unique_pairs[seq_col], unique_pairs[mutation_col])}
+            mutated_ids[mask] = [results[pair] for pair in zip(pairs[seq_col], pairs[mutation_col])]
+        return mutated_ids
+
+
+_engine = MutationEngine()
+
+
+def mutate_sequences(df, mutation_col = 'Mutation', seq_col = 'Sequence'):
+    """
+    Mutate sequences of all rows in df using shared MutationEngine (see MutationEngine.mutate_column).
+    """
+    return _engine.mutate_column(df, mutation_col = mutation_col, seq_col = seq_col)
+
+
+def mutate_sequence_ids(df, sequence_table, mutation_col = 'Mutation', seq_col = '_Sequence'):
+    """
+    Mutate sequences referenced by IDs using shared MutationEngine (see MutationEngine.mutate_ids).
+    """
+    return _engine.mutate_ids(df, sequence_table, mutation_col = mutation_col, seq_col = seq_col)
+
+
+def sequence_matrix(sequences):
+    """
+    Pack sequences into padded uint8 matrix (one row per sequence, padded with 0). Non-ASCII letters are replaced by \'?\',
+    so positions are kept.
+
+    Returns:
+    --------
+    matrix : numpy.ndarray
+        uint8 matrix of shape (len(sequences), length of the longest sequence).
+
+    lengths : numpy.ndarray
+        length of each sequence.
+    """
+    packed = numpy.array([seq.encode('ascii', errors = 'replace') for seq in sequences], dtype = bytes)
+    width = max(packed.dtype.itemsize, 1)
+    matrix = packed.astype('S{}'.format(width)).view(numpy.uint8).reshape(len(packed), width)
+    lengths = numpy.array([len(seq) for seq in sequences], dtype = numpy.int64)
+    return matrix, lengths
+
+
+def validate_mutations(df, mutation_col = 'Mutation', seq_col = '_Sequence', sequence_table = None):
+    """
+    Check if amino acids that are supposed to be mutated can be found at their positions in the (non-mutated) sequences.
+
+    Mutations of all rows are exploded to (row, from, position, to) arrays. Distinct sequences are packed into padded uint8 matrix
+    (see sequence_matrix) and the residues at all positions are gathered and compared with the expected letters at once.
+    Negative positions count from the end of the sequence as in Python indexing.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        dataframe with sequences and mutations. Rows without mutation are not included.
+
+    mutation_col : str
+        name of the column with mutation information.
+
+    seq_col : str
+        name of the column with sequences.
+
+    sequence_table : SequenceTable, optional (default=None)
+        if given, seq_col has IDs of sequences in sequence_table (see sequences.py) and only distinct sequences are decoded.
+
+    Returns:
+    --------
+    passed : pandas.Series
+        boolean series with the index of rows with mutation. Rows without sequence fail.
+
+    failed : pandas.DataFrame
+        failed mutations with the index of their rows and columns \'Mutation\' and \'message\' (see mutation_error_message).
+    """
+    df = df[df[mutation_col].notna()]
+    tokens = df[mutation_col].astype(object).str.strip().str.split('_').explode()
+    row_index = tokens.index
+    # Each distinct mutation is parsed once.
+    token_codes, unique_tokens = pandas.factorize(tokens)
+    unique_parsed = [parse_mutations(token)[0] for token in unique_tokens]
+    mutations = numpy.array([x[3] for x in unique_parsed], dtype = object)[token_codes]
+    letters = numpy.array([x[0] for x in unique_parsed], dtype = object)[token_codes]
+    _from = numpy.array([ord(x[0]) if ord(x[0]) < 128 else ord('?') for x in unique_parsed], dtype = numpy.uint8)[token_codes]
+    mutation_positions = numpy.array([x[1] for x in unique_parsed], dtype = numpy.int64)[token_codes]
+
+    sequences = df[seq_col].reindex(row_index)
+    has_seq = sequences.notna().values
+    codes, uniques = pandas.factorize(sequences)
+    uniques = [sequence_table[_id] for _id in uniques] if sequence_table is not None else list(uniques)
+    matrix, lengths = sequence_matrix(uniques)
+    length = numpy.where(has_seq, lengths[numpy.maximum(codes, 0)] if len(lengths) > 0 else 0, 0)
+    positions = numpy.where(mutation_positions < 0, mutation_positions + length, mutation_positions)
+    in_range = has_seq & (positions >= 0) & (positions < length)
+    found = numpy.zeros(len(positions), dtype = bool)
+    if in_range.any():
+        found[in_range] = matrix[codes[in_range], positions[in_range]] == _from[in_range]
+
+    passed = pandas.Series(found, index = row_index).groupby(level = 0).all().reindex(df.index, fill_value = True)
+    failed = []
+    for i in numpy.flatnonzero(~found):
+        if has_seq[i]:
+            message = mutation_error_message(uniques[codes[i]], letters[i], int(mutation_positions[i]), mutations[i])
+        else:
+            message = 'Missing sequence. Mutation: {}'.format(mutations[i])
+        failed.append((row_index[i], mutations[i], message))
+    failed = pandas.DataFrame(failed, columns = ['_row_id', 'Mutation', 'message']).set_index('_row_id')
+    failed.index.name = df.index.name
+    return passed, failed
@@ -0,0 +1,246 @@
+# Offline index of PubChem identifiers built from the bulk dumps in https://ftp.ncbi.nlm.nih.gov/pubchem/Compound/Extras/
+# (\'CID-InChI-Key.gz\' and \'CID-SMILES.gz\').
+import os
+import csv
+import argparse
+import numpy
+import pandas
+
+from cache_utils import atomic_write
+
+INCHIKEY_DTYPE = 'S27'
+CHUNKSIZE = 10**6
+
+
+class PubChemIndex:
+    """
+    Memory-mapped lookup of PubChem identifiers. InChI keys are stored as sorted fixed-width byte strings and looked up by binary
+    search (numpy.searchsorted), SMILES are stored in one blob with offsets sorted by CID. All lookups are vectorized.
+
+    Files in index_dir:
+        \'inchikey.npy\' : sorted InChI keys.
+        \'inchikey_cid.npy\' : CID for each InChI key in \'inchikey.npy\'.
+        \'smiles_cid.npy\' : sorted CIDs having SMILES.
+        \'smiles_offsets.npy\' : start of SMILES of each CID in \'smiles_cid.npy\' in \'smiles.bin\' (and end of the last one).
+        \'smiles.bin\' : concatenated SMILES.
+
+    See build_pubchem_index.
+    """
+    def __init__(self, index_dir):
+        """
+        Parameters:
+        -----------
+        index_dir : str
+            directory with the index.
+        """
+        self.index_dir = index_dir
+        self.inchikeys = numpy.load(os.path.join(index_dir, 'inchikey.npy'), mmap_mode = 'r')
+        self.inchikey_cids = numpy.load(os.path.join(index_dir, 'inchikey_cid.npy'), mmap_mode = 'r')
+        self.smiles_cids = numpy.load(os.path.join(index_dir, 'smiles_cid.npy'), mmap_mode = 'r')
+        self.smiles_offsets = numpy.load(os.path.join(index_dir, 'smiles_offsets.npy'), mmap_mode = 'r')
+        if os.path.getsize(os.path.join(index_dir, 'smiles.bin')) > 0:
+            self.smiles = numpy.memmap(os.path.join(index_dir, 'smiles.bin'), dtype = numpy.uint8, mode = 'r')
+        else:
+            self.smiles = numpy.zeros(0, dtype = numpy.uint8)
+
+    def __len__(self):
+        return len(self.inchikeys)
+
+    @staticmethod
+    def _search(sorted_array, values):
+        """
+        Binary search of values in sorted_array.
+
+        Returns:
+        --------
+        positions : numpy.ndarray
+            positions of values in sorted_array (only valid where found is True).
+
+        found : numpy.ndarray
+            boolean array, True if value is in sorted_array.
+        """
+        positions = numpy.searchsorted(sorted_array, values)
+        found = positions < len(sorted_array)
+        positions = numpy.minimum(positions, max(len(sorted_array) - 1, 0))
+        if len(sorted_array) > 0:
+            found &= sorted_array[positions] == values
+        return positions, found
+
+    def _search_inchikeys(self, inchikeys):
+        inchikeys = pandas.Series(list(inchikeys), dtype = object)
+        valid = inchikeys.str.len().eq(27).values # Longer strings would be truncated to 27 bytes.
+        keys = inchikeys.where(valid, '').values.astype(INCHIKEY_DTYPE)
+        positions, found = self._search(self.inchikeys, keys)
+        return positions, found & valid
+
+    def contains(self, inchikeys):
+        """
+        Check if InChI keys are in the index.
+
+        Parameters:
+        -----------
+        inchikeys : iterable
+            InChI keys.
+
+        Returns:
+        --------
+        found : numpy.ndarray
+            boolean array, True if the InChI key is in the index.
+        """
+        return self._search_inchikeys(inchikeys)[1]
+
+    def get_cids(self, inchikeys):
+        """
+        Get CIDs of InChI keys.
+
+        Parameters:
+        -----------
+        inchikeys : iterable
+            InChI keys.
+
+        Returns:
+        --------
+        cids : numpy.ndarray
+            float array with CIDs, NaN for InChI keys that are not in the index.
+        """
+        positions, found = self._search_inchikeys(inchikeys)
+        cids = numpy.full(len(positions), numpy.nan)
+        cids[found] = self.inchikey_cids[positions[found]]
+        return cids
+
+    def get_smiles(self, cids):
+        """
+        Get SMILES of CIDs.
+
+        Parameters:
+        -----------
+        cids : iterable
+            CIDs. NaNs are allowed.
+
+        Returns:
+        --------
+        smiles : list
+            SMILES for each CID, None for CIDs that are not in the index.
+        """
+        cids = numpy.asarray(list(cids), dtype = float)
+        valid = ~numpy.isnan(cids)
+        positions, found = self._search(self.smiles_cids, numpy.where(valid, cids, -1).astype(numpy.int64))
+        found &= valid
+        smiles = [None] * len(cids)
+        for i in numpy.flatnonzero(found):
+            start, stop = self.smiles_offsets[positions[i]], self.smiles_offsets[positions[i] + 1]
+            smiles[i] = self.smiles[start:stop].tobytes().decode()
+        return smiles
+
+    def get_map_inchikey_to_CID(self, inchikeys):
+        """
+        Offline version of get_map_inchikey_to_CID in pubchem_utils.py. InChI keys that are not in the index are not included.
+        """
+        inchikeys = list(inchikeys)
+        cids = self.get_cids(inchikeys)
+        return {inchikey : int(cid) for inchikey, cid in zip(inchikeys, cids) if cid == cid}
+
+    def get_map_inchikey_to_canonicalSMILES(self, inchikeys):
+        """
+        Offline version of get_map_inchikey_to_canonicalSMILES in pubchem_utils.py. InChI keys that are not in the index
+        or without SMILES are not included.
+        """
+        inchikeys = list(inchikeys)
+        smiles = self.get_smiles(self.get_cids(inchikeys))
+        return {inchikey : x for inchikey, x in zip(inchikeys, smiles) if x is not None}
+
+
+def load_pubchem_index(auxillary_dir):
+    """
+    Load PubChemIndex from \'pubchem_index\' in auxillary_dir.
+
+    Returns:
+    --------
+    index : PubChemIndex
+        loaded index. None if the index was not built.
+    """
+    index_dir = os.path.join(auxillary_dir, 'pubchem_index')
+    if not os.path.exists(os.path.join(index_dir, 'inchikey.npy')):
+        return None
+    return PubChemIndex(index_dir)
+
+
+def _read_dump(path, names, usecols, chunksize):
+    return pandas.read_csv(path, sep = '\t', header = None, names = names, usecols = usecols, quoting = csv.QUOTE_NONE,
+                           dtype = {'CID' : numpy.int64}, chunksize = chunksize)
+
+
+def _save_npy(array, path):
+    atomic_write(path, lambda f: numpy.save(f, array), mode = 'wb')
+
+
+def build_pubchem_index(inchikey_path, smiles_path, index_dir, chunksize = CHUNKSIZE):
+    """
+    Build PubChemIndex from PubChem dumps. The dumps are read in chunks, but the arrays are sorted in memory, so building
+    the index for whole PubChem needs memory for all InChI keys and SMILES.
+
+    Parameters:
+    -----------
+    inchikey_path : str
+        path to \'CID-InChI-Key.gz\' (tab separated CID, InChI, InChI key).
+
+    smiles_path : str
+        path to \'CID-SMILES.gz\' (tab separated CID, SMILES). If None, the index has no SMILES.
+
+    index_dir : str
+        output directory.
+
+    chunksize : int
+        number of rows read at once.
+    """
+    os.makedirs(index_dir, exist_ok = True)
+
+    inchikeys, cids = [], []
+    for chunk in _read_dump(inchikey_path, ['CID', 'InChI', 'InChI Key'], ['CID', 'InChI Key'], chunksize):
+        chunk = chunk.dropna()
+        inchikeys.append(chunk['InChI Key'].values.astype(INCHIKEY_DTYPE))
+        cids.append(chunk['CID'].values)
+    inchikeys = numpy.concatenate(inchikeys) if len(inchikeys) > 0 else numpy.zeros(0, dtype = INCHIKEY_DTYPE)
+    cids = numpy.concatenate(cids) if len(cids) > 0 else numpy.zeros(0, dtype = numpy.int64)
+    order = numpy.lexsort((cids, inchikeys)) # For InChI keys with multiple CIDs keep the lowest CID.
+    inchikeys, cids = inchikeys[order], cids[order]
+    first = numpy.ones(len(inchikeys), dtype = bool)
+    first[1:] = inchikeys[1:] != inchikeys[:-1]
+    _save_npy(inchikeys[first], os.path.join(index_dir, 'inchikey.npy'))
+    _save_npy(cids[first], os.path.join(index_dir, 'inchikey_cid.npy'))
+
+    smiles_cids, smiles = [], []
+    if smiles_path is not None:
+        for chunk in _read_dump(smiles_path, ['CID', 'SMILES'], ['CID', 'SMILES'], chunksize):
+            chunk = chunk.dropna()
+            smiles_cids.append(chunk['CID'].values)
+            smiles.append(chunk['SMILES'].str.encode('ascii').values)
+    smiles_cids = numpy.concatenate(smiles_cids) if len(smiles_cids) > 0 else numpy.zeros(0, dtype = numpy.int64)
+    smiles = numpy.concatenate(smiles) if len(smiles) > 0 else numpy.zeros(0, dtype = object)
+    order = numpy.argsort(smiles_cids, kind = 'stable')
+    smiles_cids, smiles = smiles_cids[order], smiles[order]
+    first = numpy.ones(len(smiles_cids), dtype = bool)
+    first[1:] = smiles_cids[1:] != smiles_cids[:-1]
+    smiles_cids, smiles = smiles_cids[first], smiles[first]
+    offsets = numpy.zeros(len(smiles) + 1, dtype = numpy.int64)
+    offsets[1:] = numpy.cumsum([len(x) for x in smiles])
+    _save_npy(smiles_cids, os.path.join(index_dir, 'smiles_cid.npy'))
+    _save_npy(offsets, os.path.join(index_dir, 'smiles_offsets.npy'))
+    atomic_write(os.path.join(index_dir, 'smiles.bin'), lambda f: f.write(b''.join(smiles)), mode = 'wb')
+    return PubChemIndex(index_dir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--inchikey_path', type=str, required=True,
+                        help='path to CID-InChI-Key(.gz) dump from PubChem.')
+    parser.add_argument('--smiles_path', type=str, default=None,
+                        help='path to CID-SMILES(.gz) dump from PubChem.')
+    parser.add_argument('--index_dir', type=str, default=os.path.join('Data', 'pubchem_index'),
+                        help='output directory. Checker looks for the index in \'pubchem_index\' in auxillary_dir.')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE,
+                        help='number of rows read at once.')
+    args = parser.parse_args()
+
+    index = build_pubchem_index(args.inchikey_path, args.smiles_path, args.index_dir, chunksize = args.chunksize)
+    print('{} InChI keys and {} SMILES indexed in {}'.format(len(index), len(index.smiles_cids), args.index_dir))
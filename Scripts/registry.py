@@ -0,0 +1,126 @@
+# Registry of molecules processed in one run.
+import pandas
+
+from utils import mol_from_smiles
+
+
+class MolRegistry:
+    """
+    Interned molecule identifiers. Each distinct identifier (InChI key or canonical SMILES, for mixtures several of them
+    separated by sep) gets an integer ID. Components of mixtures are split once and registered as well, and canonical SMILES
+    of InChI keys are resolved using map_inchikey_to_canonicalSMILES. Parsed molecules are cached by mol_from_smiles (see utils.py).
+
+    Attributes:
+    -----------
+    identifiers : list
+        identifier of each ID.
+
+    components : list
+        tuple of component IDs of each ID. Single molecule has one component (itself).
+    """
+    def __init__(self, map_inchikey_to_canonicalSMILES = None, sep = ' '):
+        """
+        Parameters:
+        -----------
+        map_inchikey_to_canonicalSMILES : dict, optional (default=None)
+            mapping from InChI key to canonical SMILES.
+
+        sep : str
+            separator of mixture components.
+        """
+        self.map_inchikey_to_canonicalSMILES = map_inchikey_to_canonicalSMILES if map_inchikey_to_canonicalSMILES is not None else {}
+        self.sep = sep
+        self.identifiers = []
+        self.components = []
+        self._ids = {}
+
+    def __len__(self):
+        return len(self.identifiers)
+
+    def __contains__(self, identifier):
+        return identifier in self._ids
+
+    def intern(self, identifier):
+        """
+        Get ID of identifier. New identifiers (and their components) are registered.
+        """
+        if identifier in self._ids:
+            return self._ids[identifier]
+        _id = len(self.identifiers)
+        self._ids[identifier] = _id
+        self.identifiers.append(identifier)
+        self.components.append((_id, ))
+        parts = identifier.split(self.sep)
+        if len(parts) > 1:
+            self.components[_id] = tuple(self.intern(part) for part in parts)
+        return _id
+
+    def register(self, identifiers):
+        """
+        Register identifiers, each distinct value once. NaNs are kept.
+
+        Parameters:
+        -----------
+        identifiers : pandas.Series
+            identifiers (e.g. \'_MolID\' column).
+
+        Returns:
+        --------
+        ids : pandas.Series
+            IDs with the same index as identifiers (nullable integer).
+        """
+        unique = identifiers.dropna().unique()
+        map_identifier_to_id = {identifier : self.intern(identifier) for identifier in unique}
+        return identifiers.map(map_identifier_to_id).astype('Int64')
+
+    def split(self, identifier):
+        """
+        Get components of identifier as tuple of identifiers. The identifier is registered if it is new.
+        """
+        return tuple(self.identifiers[_id] for _id in self.components[self.intern(identifier)])
+
+    def canonical_smiles(self, identifier):
+        """
+        Get canonical SMILES of a single molecule. InChI keys are mapped using map_inchikey_to_canonicalSMILES (KeyError
+        is raised for unknown InChI keys), other identifiers are considered to be SMILES.
+        """
+        if identifier in self.map_inchikey_to_canonicalSMILES:
+            return self.map_inchikey_to_canonicalSMILES[identifier]
+        if _is_inchikey(identifier):
+            raise KeyError(identifier)
+        return identifier
+
+    def mol(self, identifier):
+        """
+        Get rdkit.Chem.Mol of a single molecule (see mol_from_smiles in utils.py).
+        """
+        return mol_from_smiles(self.canonical_smiles(identifier))
+
+
+def _is_inchikey(identifier):
+    return len(identifier) == 27 and identifier[14] == '-' and identifier[25] == '-'
+
+
+def component_table(identifiers, sep = ' '):
+    """
+    Split identifiers of mixtures (e.g. \'InChI Key\' column) to long table with one row per component.
+
+    Parameters:
+    -----------
+    identifiers : pandas.Series
+        identifiers indexed by row id. NaNs are skipped.
+
+    sep : str
+        separator of mixture components.
+
+    Returns:
+    --------
+    df_components : pandas.DataFrame
+        dataframe with columns \'_row_id\' (index of identifiers), \'_component\' (position of the component in the identifier)
+        and identifiers.name (the component).
+    """
+    name = identifiers.name if identifiers.name is not None else 'identifier'
+    components = identifiers.dropna().astype(object).str.split(sep).explode()
+    df_components = pandas.DataFrame({'_row_id' : components.index, name : components.values})
+    df_components.insert(1, '_component', df_components.groupby('_row_id', sort = False).cumcount())
+    return df_components
@@ -0,0 +1,102 @@
+# Structured report of failed checks (see Checker.failure_table in checking.py) stored in SQLite database in log_dir.
+import os
+import sqlite3
+import pandas
+
+from sequences import is_encoded
+
+FAILURE_REPORT_NAME = 'failures.sqlite'
+
+
+class LazyText:
+    """
+    Log message computed only when it is emitted, i.e. when str() is called on it by a logging handler.
+    Messages below the level of the logger are never formatted.
+    """
+    def __init__(self, fn, *args, **kwargs):
+        """
+        Parameters:
+        -----------
+        fn : callable
+            function returning the message (or object that is converted to string).
+
+        args, kwargs :
+            arguments of fn.
+        """
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return str(self.fn(*self.args, **self.kwargs))
+
+
+def build_failure_report(df_failures, df, cols):
+    """
+    Add values of failed rows to the long table of failures.
+
+    Parameters:
+    -----------
+    df_failures : pandas.DataFrame
+        dataframe with columns \'_row_id\', \'check\' and \'reason\' (see Checker.failure_table).
+
+    df : pandas.DataFrame
+        checked dataframe indexed by \'_row_id\'.
+
+    cols : list
+        columns of df included in the report (e.g. Checker.logging_cols).
+
+    Returns:
+    --------
+    df_report : pandas.DataFrame
+        df_failures with columns \'failed_column\' (column in the reason code, e.g. \'Value\' for \'castable:Value\', NaN if the code
+        has no column), \'failed_value\' (value in that column as string) and cols.
+    """
+    df_report = df_failures.reset_index(drop = True)
+    column = df_report['reason'].str.split(':', n = 1).str[1]
+    df_report['failed_column'] = column.where(column.isin(df.columns))
+    df_report['failed_value'] = float('nan')
+    for col, idx in df_report.groupby('failed_column').groups.items():
+        values = df[col]
+        if is_encoded(values):
+            values = values.astype(str) # IDs of sequences are kept as IDs.
+        values = values.reindex(df_report.loc[idx, '_row_id'].values)
+        df_report.loc[idx, 'failed_value'] = values.where(values.isna(), values.astype(str)).values
+    cols = [col for col in cols if col in df.columns]
+    df_values = df[cols].reindex(df_report['_row_id'].values).reset_index(drop = True)
+    return pandas.concat([df_report, df_values], axis = 1)
+
+
+def write_failure_report(path, table, df_report):
+    """
+    Write df_report (see build_failure_report) to table in SQLite database in path. The table is replaced, other tables
+    (e.g. of other checkers) are kept. Values (except \'_row_id\') are stored as text, rows are indexed by \'_row_id\' and \'check\'.
+
+    Parameters:
+    -----------
+    path : str
+        path to the database.
+
+    table : str
+        name of the table (e.g. name of the checker).
+
+    df_report : pandas.DataFrame
+        failures with values.
+    """
+    values = df_report.drop(columns = ['_row_id'])
+    values = values.astype(object).where(values.notna(), None)
+    with sqlite3.connect(path) as con:
+        values.insert(0, '_row_id', df_report['_row_id'].values)
+        values.to_sql(table, con, if_exists = 'replace', index = False, dtype = {col : 'TEXT' for col in values.columns[1:]})
+        con.execute('CREATE INDEX IF NOT EXISTS "{0}_row_id_check" ON "{0}" ("_row_id", "check")'.format(table))
+    con.close()
+
+
+def read_failure_report(log_dir = 'logs', table = 'Checker'):
+    """
+    Read table of failures written by checker with name table (see write_failure_report) from \'failures.sqlite\' in log_dir.
+    """
+    with sqlite3.connect(os.path.join(log_dir, FAILURE_REPORT_NAME)) as con:
+        df_report = pandas.read_sql('SELECT * FROM "{}"'.format(table), con)
+    con.close()
+    return df_report
@@ -0,0 +1,153 @@
+# Selection and scheduling of checks declared in Checker.checks (see _init_config in checking.py).
+import concurrent.futures
+import numpy
+import pandas
+
+
+def select_checks(checks, names, skip = None):
+    """
+    Select checks by names. The order of checks is kept and \'requires\' of the selected checks is resolved: \'all\' stands for
+    all selected checks before the check, required checks that are not selected are selected too (transitively and even if they are
+    in skip), because the checks requiring them are not valid on rows they would fail (e.g. \'mutation\' on mutations of wrong \'format\').
+
+    Parameters:
+    -----------
+    checks : list
+        list of dictionaries with structure {'name' : name, 'method' : method_name, 'cols' : [columns_read], 'auxillary' : [auxillary_data],
+        'requires' : [names_of_checks] or 'all'} (see Checker.checks).
+
+    names : list
+        names of checks to select. Names that are not in checks are ignored.
+
+    skip : list, optional (default=None)
+        names of checks that are not selected unless they are required by a selected check.
+
+    Returns:
+    --------
+    selected : list
+        copies of selected checks with resolved \'requires\'.
+    """
+    skip = set(skip) if skip is not None else set()
+    names = set(names) - skip
+    requires = {check['name'] : check['requires'] for check in checks if check['requires'] != 'all'}
+    stack = list(names)
+    while len(stack) > 0:
+        for name in requires.get(stack.pop(), []):
+            if name not in names:
+                names.add(name)
+                stack.append(name)
+    selected = []
+    for check in checks:
+        if check['name'] not in names:
+            continue
+        check = dict(check)
+        if check['requires'] == 'all':
+            check['requires'] = [x['name'] for x in selected]
+        selected.append(check)
+    return selected
+
+
+def check_levels(checks):
+    """
+    Split checks to levels of the dependency graph given by \'requires\'. Each check is in the first level after all checks it requires,
+    so checks in one level are independent of each other and can run in parallel.
+
+    Parameters:
+    -----------
+    checks : list
+        selected checks (see select_checks).
+
+    Returns:
+    --------
+    levels : list
+        list of lists of checks. Checks in each level keep their order.
+    """
+    level_of = {}
+    remaining = list(checks)
+    while len(remaining) > 0:
+        ready = [check for check in remaining if all(name in level_of for name in check['requires'])]
+        if len(ready) == 0:
+            raise ValueError('Checks with unknown or cyclic requirements: {}'.format([check['name'] for check in remaining]))
+        for check in ready:
+            level_of[check['name']] = max([level_of[name] + 1 for name in check['requires']], default = 0)
+        remaining = [check for check in remaining if check['name'] not in level_of]
+    levels = [[] for _ in range(max(level_of.values(), default = -1) + 1)]
+    for check in checks:
+        levels[level_of[check['name']]].append(check)
+    return levels
+
+
+def required_auxillary(checks):
+    """
+    Get set of auxillary data needed by checks.
+    """
+    return {name for check in checks for name in check['auxillary']}
+
+
+def required_columns(checks):
+    """
+    Get list of columns read by checks (without duplicates, in order of checks).
+    """
+    return list(dict.fromkeys(col for check in checks for col in check['cols']))
+
+
+def run_levels(levels, run, n_jobs = 1):
+    """
+    Run checks level by level (see check_levels). Checks in one level are run in n_jobs threads.
+
+    Parameters:
+    -----------
+    levels : list
+        list of lists of checks.
+
+    run : callable
+        function taking a check and returning its result. It is called for all checks of a level before results of the
+        level are yielded, so it can use results of the previous levels only.
+
+    n_jobs : int
+        number of threads.
+
+    Yields:
+    -------
+    check, result : (dict, object)
+        checks with their results in order of levels and checks.
+    """
+    if n_jobs <= 1:
+        for level in levels:
+            results = [run(check) for check in level]
+            yield from zip(level, results)
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers = n_jobs) as executor:
+        for level in levels:
+            results = list(executor.map(run, level))
+            yield from zip(level, results)
+
+
+def entity_codes(df, cols):
+    """
+    Identify distinct entities in df, i.e. distinct combinations of values in cols. NaN is treated as a value.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        dataframe with cols.
+
+    cols : list
+        columns identifying entity (e.g. [\'InChI Key\'] or [\'_Sequence\', \'Mutation\']).
+
+    Returns:
+    --------
+    codes : numpy.ndarray
+        code of entity for each row of df.
+
+    first : numpy.ndarray
+        position of the first row of each entity in df.
+    """
+    if len(cols) == 1:
+        codes = pandas.factorize(df[cols[0]])[0]
+    else:
+        codes = pandas.MultiIndex.from_arrays([pandas.factorize(df[col])[0] for col in cols]).factorize()[0]
+    # NaN gets code -1 in factorize, it is the last entity.
+    codes = numpy.where(codes < 0, codes.max(initial = -1) + 1, codes)
+    first = numpy.unique(codes, return_index = True)[1]
+    return codes, first
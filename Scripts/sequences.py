@@ -0,0 +1,102 @@
+# Table of sequences referenced by integer IDs, so that dataframes carry IDs instead of full sequences.
+import hashlib
+import numpy
+import pandas
+
+ID_MASK = 2**63 - 1
+
+
+def sequence_id(seq):
+    """
+    Content-hash ID of a sequence: first 8 bytes of blake2b digest as non-negative int64. The same sequence gets the same ID in every run and every table.
+    """
+    return int.from_bytes(hashlib.blake2b(seq.encode(), digest_size = 8).digest(), 'little') & ID_MASK
+
+
+class SequenceTable:
+    """
+    Mapping between sequences and their content-hash IDs (see sequence_id). Columns with sequences (e.g. \'_Sequence\', \'mutated_Sequence\')
+    are encoded to nullable integer IDs, so that groupby, merge and df.copy() work with integers, and decoded back to strings only for export and logging.
+
+    Attributes:
+    -----------
+    sequences : dict
+        mapping from ID to sequence.
+
+    lengths : dict
+        mapping from ID to length of the sequence.
+    """
+    def __init__(self):
+        self.sequences = {}
+        self.lengths = {}
+
+    def __len__(self):
+        return len(self.sequences)
+
+    def __contains__(self, _id):
+        return _id in self.sequences
+
+    def __getitem__(self, _id):
+        return self.sequences[_id]
+
+    def intern(self, seq):
+        """
+        Get ID of sequence. New sequences are added to the table.
+        """
+        _id = sequence_id(seq)
+        if _id not in self.sequences:
+            self.sequences[_id] = seq
+            self.lengths[_id] = len(seq)
+        elif self.sequences[_id] != seq:
+            raise ValueError('Sequence ID collision: {}'.format(_id))
+        return _id
+
+    def encode(self, sequences):
+        """
+        Encode sequences to IDs, each distinct sequence is hashed once. NaNs are kept.
+
+        Parameters:
+        -----------
+        sequences : pandas.Series
+            sequences.
+
+        Returns:
+        --------
+        ids : pandas.Series
+            IDs with the same index as sequences (nullable integer).
+        """
+        codes, unique = pandas.factorize(sequences)
+        unique_ids = numpy.array([self.intern(seq) for seq in unique], dtype = numpy.int64)
+        # IDs do not fit to float64, so they are not mapped through float column with NaNs.
+        ids = pandas.arrays.IntegerArray(unique_ids[numpy.maximum(codes, 0)] if len(unique_ids) > 0 else numpy.zeros(len(codes), dtype = numpy.int64), codes < 0)
+        return pandas.Series(ids, index = sequences.index, name = sequences.name)
+
+    def decode(self, ids):
+        """
+        Decode IDs (see encode) to sequences. NaNs are kept.
+
+        Parameters:
+        -----------
+        ids : pandas.Series
+            IDs.
+
+        Returns:
+        --------
+        sequences : pandas.Series
+            sequences with the same index as ids.
+        """
+        # Snapshot of the table: other checks may intern sequences while it is mapped (see Checker.n_jobs).
+        return ids.astype(object).map(self.sequences.copy())
+
+    def get_lengths(self, ids):
+        """
+        Get lengths of sequences with IDs. Missing sequences have length NaN.
+        """
+        return ids.astype(object).map(self.lengths.copy()).astype(float)
+
+
+def is_encoded(col):
+    """
+    Check if col (pandas.Series) holds IDs of SequenceTable rather than sequences.
+    """
+    return pandas.api.types.is_integer_dtype(col.dtype)
@@ -0,0 +1,427 @@
+# Compact storage of synonyms retrieved from PubChem (\'map_inchikey_to_synonyms.json\').
+import os
+import re
+import inspect
+import hashlib
+import numpy
+import pandas
+
+try:
+    import pyarrow
+    import pyarrow.feather
+except ImportError:
+    pyarrow = None
+
+from utils import clean_string_name
+from cache_utils import load_json_map, cache_lock, atomic_write, journal_path
+
+# Version of normalization rules used for \'clean_Synonym\'. Stored clean synonyms are recomputed when clean_string_name changes.
+NORMALIZATION_VERSION = hashlib.sha1(inspect.getsource(clean_string_name).encode()).hexdigest()[:12]
+
+# Length of character n-grams used for fuzzy matching of names.
+NGRAM_SIZE = 3
+
+
+def locants(text):
+    """
+    Get list of numbers in text in order of appearance (e.g. locants \'3,7\' and \'2,6\' in \'3,7-dimethyl-2,6-octadienyl\').
+    """
+    return re.findall(r'[0-9]+', text)
+
+
+def ngrams(text, n = NGRAM_SIZE):
+    """
+    Get set of character n-grams of text padded by spaces (normalized names contain no whitespace).
+    """
+    text = ' ' * (n - 1) + text + ' '
+    return list({text[i:i + n] for i in range(len(text) - n + 1)})
+
+
+def _key_array(keys):
+    """
+    Convert sorted InChI keys (pyarrow string array or list of str) to numpy array of bytes that can be searched with numpy.searchsorted.
+    Keys of the same length (as all valid InChI keys are) are viewed in the Arrow buffer, i.e. without copying or creating python strings.
+    """
+    if pyarrow is not None and isinstance(keys, pyarrow.Array):
+        if pyarrow.types.is_string(keys.type) and keys.null_count == 0 and len(keys) > 0:
+            offsets = numpy.frombuffer(keys.buffers()[1], dtype = numpy.int32)[keys.offset:keys.offset + len(keys) + 1]
+            lengths = numpy.diff(offsets)
+            if lengths[0] > 0 and (lengths == lengths[0]).all():
+                data = numpy.frombuffer(keys.buffers()[2], dtype = numpy.uint8)[offsets[0]:offsets[-1]]
+                return data.view('S{}'.format(lengths[0]))
+        keys = keys.to_pylist()
+    return numpy.array([key.encode() for key in keys], dtype = bytes)
+
+
+class SynonymStore:
+    """
+    Read-only mapping from InChI key to the list of synonyms. It can be used in place of the dictionary
+    loaded from \'map_inchikey_to_synonyms.json\'.
+
+    Synonyms are kept in a long table sorted by InChI key with columns \'InChI Key\', \'Synonym\' and \'clean_Synonym\'
+    (synonym normalized by clean_string_name). With pyarrow the table is stored in Arrow IPC (feather) format
+    with dictionary-encoded strings and it is memory-mapped when loaded, so strings are only materialized
+    for the InChI keys that are accessed. InChI keys are looked up with binary search in the sorted dictionary of keys
+    (see _key_array) and their rows are given by an array of offsets. Without pyarrow pandas.DataFrame is used.
+
+    The version of normalization rules (NORMALIZATION_VERSION) is saved in the schema metadata of the table.
+
+    Attributes:
+    -----------
+    table : pyarrow.Table or pandas.DataFrame
+        long table with synonyms. InChI keys without synonyms have one row with missing \'Synonym\'.
+
+    cols : list
+        columns of the table.
+
+    normalization : str
+        NORMALIZATION_VERSION used to compute \'clean_Synonym\'.
+    """
+    cols = ['InChI Key', 'Synonym', 'clean_Synonym']
+
+    def __init__(self, table):
+        """
+        Parameters:
+        -----------
+        table : pyarrow.Table or pandas.DataFrame
+            long table with columns given by \'cols\', sorted by InChI key.
+        """
+        self.table = table
+        self._clean_sets = {}
+        self._inverted_index = None
+        self._ngram_index = {}
+        if pyarrow is not None and isinstance(table, pyarrow.Table):
+            metadata = table.schema.metadata or {}
+            self.normalization = metadata.get(b'normalization', b'').decode()
+            column = table.column(self.cols[0])
+            if isinstance(column.type, pyarrow.DictionaryType):
+                column = column.combine_chunks()
+                keys = column.dictionary
+                codes = column.indices.to_numpy(zero_copy_only = False)
+            else:
+                codes, keys = pandas.factorize(column.to_numpy(zero_copy_only = False))
+        else:
+            self.normalization = table.attrs.get('normalization', '')
+            codes, keys = pandas.factorize(table[self.cols[0]])
+        # Codes are in order of the first appearance in the table sorted by InChI key, so the keys are sorted too.
+        self._keys = _key_array(keys)
+        self._offsets = numpy.searchsorted(codes, numpy.arange(len(self._keys) + 1))
+
+    def _positions(self, inchikeys):
+        """
+        Get positions of InChI keys in the sorted keys, -1 for InChI keys that are not in the store.
+        """
+        inchikeys = list(inchikeys)
+        queries = numpy.array([x.encode() if isinstance(x, str) else b'' for x in inchikeys], dtype = bytes)
+        if len(self._keys) == 0 or len(queries) == 0:
+            return numpy.full(len(queries), -1, dtype = numpy.int64)
+        positions = numpy.minimum(numpy.searchsorted(self._keys, queries), len(self._keys) - 1)
+        found = (self._keys[positions] == queries) & numpy.array([isinstance(x, str) for x in inchikeys], dtype = bool)
+        return numpy.where(found, positions, -1)
+
+    def _bounds(self, inchikey):
+        position = self._positions([inchikey])[0]
+        if position < 0:
+            raise KeyError(inchikey)
+        return self._offsets[position], self._offsets[position + 1]
+
+    def _slice(self, col, start, stop):
+        if isinstance(self.table, pandas.DataFrame):
+            values = self.table[col].iloc[start:stop].tolist()
+        else:
+            values = self.table.column(col).slice(start, stop - start).to_pylist()
+        return [value for value in values if value is not None and value == value]
+
+    def column(self, col):
+        """
+        Get whole column of the table as pandas.Series.
+        """
+        if isinstance(self.table, pandas.DataFrame):
+            return self.table[col]
+        return self.table.column(col).to_pandas()
+
+    def keys(self):
+        """
+        Get list of all InChI keys. They are decoded to python strings, use isin to look up many InChI keys.
+        """
+        return [key.decode() for key in self._keys]
+
+    def isin(self, inchikeys):
+        """
+        Check for each of inchikeys if it is in the store.
+
+        Returns:
+        --------
+        found : numpy.ndarray
+            boolean array in the order of inchikeys.
+        """
+        return self._positions(inchikeys) >= 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __contains__(self, inchikey):
+        return bool(self.isin([inchikey])[0])
+
+    def __getitem__(self, inchikey):
+        return self._slice(self.cols[1], *self._bounds(inchikey))
+
+    def get(self, inchikey, default = None):
+        if inchikey in self:
+            return self[inchikey]
+        return default
+
+    def clean_synonyms(self, inchikey):
+        """
+        Get synonyms of a given InChI key normalized by clean_string_name.
+        """
+        return self._slice(self.cols[2], *self._bounds(inchikey))
+
+    def clean_synonym_set(self, inchikey):
+        """
+        Get set of synonyms of a given InChI key normalized by clean_string_name. The set is created once per InChI key.
+        """
+        if inchikey not in self._clean_sets:
+            self._clean_sets[inchikey] = frozenset(self.clean_synonyms(inchikey))
+        return self._clean_sets[inchikey]
+
+    def inverted_index(self):
+        """
+        Get mapping from synonym normalized by clean_string_name to the list of InChI keys having this synonym.
+        The index is built once from the table.
+
+        Returns:
+        --------
+        index : dict
+            mapping from normalized synonym to list of InChI keys.
+        """
+        if self._inverted_index is None:
+            df = pandas.DataFrame({col : self.column(col).astype(object) for col in [self.cols[0], self.cols[2]]})
+            df = df.dropna().drop_duplicates()
+            self._inverted_index = df.groupby(self.cols[2], sort = False)[self.cols[0]].agg(list).to_dict()
+        return self._inverted_index
+
+    def _rows(self, inchikeys):
+        """
+        Get rows of the table with given InChI keys as pandas.DataFrame. Only these rows are materialized (the table can stay memory-mapped).
+        """
+        found = self._positions(inchikeys)
+        found = found[found >= 0]
+        positions = [numpy.arange(self._offsets[i], self._offsets[i + 1]) for i in found]
+        positions = numpy.concatenate(positions) if len(positions) > 0 else numpy.array([], dtype = numpy.int64)
+        if isinstance(self.table, pandas.DataFrame):
+            return pandas.DataFrame({col : self.table[col].iloc[positions].astype(object).values for col in self.cols})
+        return pandas.DataFrame({col : self.table.column(col).take(pyarrow.array(positions)).to_pandas().astype(object).values for col in self.cols})
+
+    def ngram_index(self, inchikeys):
+        """
+        Get n-gram index of normalized synonyms of given InChI keys: long table with columns \'InChI Key\', \'clean_Synonym\', \'Synonym\' and \'ngram\'
+        with one row per n-gram of each normalized synonym of each InChI key, and column \'n_ngrams\' with number of n-grams of the synonym.
+        n-grams are built only for synonyms of the given InChI keys and kept per InChI key.
+        """
+        inchikeys = pandas.unique(pandas.Series(list(inchikeys), dtype = object))
+        new = [key for key in inchikeys if key not in self._ngram_index]
+        if len(new) > 0:
+            df = self._rows(new)
+            df = df.dropna().drop_duplicates(subset = [self.cols[0], self.cols[2]])
+            unique = pandas.Series(df[self.cols[2]].unique(), dtype = object)
+            df_ngrams = pandas.DataFrame({self.cols[2] : unique, 'ngram' : unique.apply(ngrams)})
+            df_ngrams['n_ngrams'] = df_ngrams['ngram'].str.len()
+            df_ngrams = df_ngrams.explode('ngram')
+            df_index = df.merge(df_ngrams, on = self.cols[2], how = 'inner')
+            groups = dict(tuple(df_index.groupby(self.cols[0], sort = False)))
+            for key in new:
+                self._ngram_index[key] = groups.get(key, df_index.iloc[:0])
+        if len(inchikeys) == 0:
+            return pandas.DataFrame({col : pandas.Series([], dtype = object) for col in self.cols + ['ngram']}).assign(n_ngrams = pandas.Series([], dtype = numpy.int64))
+        return pandas.concat([self._ngram_index[key] for key in inchikeys], ignore_index = True)
+
+    def best_matches(self, inchikeys, clean_names, same_locants = False):
+        """
+        Find the most similar synonym of the given InChI key for each normalized name. Similarity is the Dice coefficient
+        of character n-grams: 2 * |common n-grams| / (|n-grams of name| + |n-grams of synonym|).
+
+        All rows are matched at once by joining n-grams of names with ngram_index of the given InChI keys on InChI key and n-gram,
+        so only synonyms of the given InChI key sharing at least one n-gram with the name are compared.
+
+        Parameters:
+        -----------
+        inchikeys : pandas.Series
+            InChI keys.
+
+        clean_names : pandas.Series
+            names normalized by clean_string_name, with the same index as inchikeys.
+
+        same_locants : bool, optional (default=False)
+            if True, only synonyms with the same numbers as the name (see locants) are compared, so positional isomers
+            (e.g. \'2,6-octadienyl\' and \'1,6-octadienyl\') never match however similar the rest of the name is.
+
+        Returns:
+        --------
+        matches : pandas.DataFrame
+            dataframe with the same index as inchikeys and columns \'score\' (0 if no synonym shares any n-gram with the name)
+            and \'Synonym\' (closest synonym, NaN if there is none).
+        """
+        query = pandas.DataFrame({self.cols[0] : inchikeys.values, 'clean_Name' : clean_names.values}, index = inchikeys.index)
+        unique = query.drop_duplicates().reset_index(drop = True)
+        unique['ngram'] = unique['clean_Name'].apply(ngrams)
+        unique['n_query'] = unique['ngram'].str.len()
+        query_ngrams = unique.rename_axis('query_id').reset_index().explode('ngram')
+
+        index = self.ngram_index(unique[self.cols[0]])
+        common = query_ngrams.merge(index, on = [self.cols[0], 'ngram'], how = 'inner')
+        common = common.groupby(['query_id', self.cols[2]], sort = False).agg(n_common = ('ngram', 'size'),
+                                                                              n_query = ('n_query', 'first'),
+                                                                              n_ngrams = ('n_ngrams', 'first'),
+                                                                              Synonym = (self.cols[1], 'first')).reset_index()
+        common['score'] = 2 * common['n_common'] / (common['n_query'] + common['n_ngrams'])
+        if same_locants:
+            name_locants = common['query_id'].map(unique['clean_Name'].map(locants))
+            common = common[numpy.array([x == y for x, y in zip(name_locants, common[self.cols[2]].map(locants))], dtype = bool)]
+        best = common.sort_values('score', ascending = False, kind = 'stable').drop_duplicates(subset = ['query_id']).set_index('query_id')
+
+        unique['score'] = best['score'].reindex(unique.index).fillna(0.0)
+        unique['Synonym'] = best['Synonym'].reindex(unique.index)
+        matches = query.merge(unique[[self.cols[0], 'clean_Name', 'score', 'Synonym']], on = [self.cols[0], 'clean_Name'], how = 'left')
+        matches.index = inchikeys.index
+        return matches[['score', 'Synonym']]
+
+    def lookup_names(self, names):
+        """
+        Find InChI keys of molecules by name using inverted_index, i.e. without querying PubChem.
+
+        Parameters:
+        -----------
+        names : list
+            names of molecules.
+
+        Returns:
+        --------
+        map_name_to_inchikeys : dict
+            mapping from name to list of InChI keys. Names which are not synonym of any InChI key are not included.
+        """
+        index = self.inverted_index()
+        map_name_to_inchikeys = {}
+        for name in set(names):
+            clean_name = clean_string_name(name)
+            if clean_name in index:
+                map_name_to_inchikeys[name] = index[clean_name]
+        return map_name_to_inchikeys
+
+
+    @classmethod
+    def from_map(cls, map_inchikey_to_synonyms):
+        """
+        Create SynonymStore from dictionary mapping InChI key to list of synonyms.
+
+        Parameters:
+        -----------
+        map_inchikey_to_synonyms : dict
+            mapping from InChI key to synonyms as stored in \'map_inchikey_to_synonyms.json\'.
+
+        Returns:
+        --------
+        store : SynonymStore
+        """
+        df = pandas.Series(map_inchikey_to_synonyms, dtype = object)
+        df = df.apply(lambda x: x if len(x) > 0 else [None]).explode()
+        df = df.rename_axis(cls.cols[0]).rename(cls.cols[1]).reset_index()
+        df = df.sort_values(cls.cols[0], kind = 'stable').reset_index(drop = True)
+        df[cls.cols[2]] = cls._normalize(df[cls.cols[1]])
+        return cls._from_dataframe(df)
+
+    @classmethod
+    def _from_dataframe(cls, df):
+        if pyarrow is None:
+            df.attrs['normalization'] = NORMALIZATION_VERSION
+            return cls(df)
+        table = pyarrow.table({col : pyarrow.array(df[col], type = pyarrow.string()).dictionary_encode() for col in cls.cols})
+        table = table.replace_schema_metadata({'normalization' : NORMALIZATION_VERSION})
+        return cls(table)
+
+    @staticmethod
+    def _normalize(synonyms):
+        """
+        Apply clean_string_name on each unique synonym.
+        """
+        unique = pandas.Series(synonyms.dropna().unique(), dtype = object)
+        return synonyms.map(pandas.Series(unique.apply(clean_string_name).values, index = unique.values, dtype = object))
+
+    def renormalize(self):
+        """
+        Recompute \'clean_Synonym\' with the current clean_string_name.
+
+        Returns:
+        --------
+        store : SynonymStore
+            new store with updated \'clean_Synonym\'.
+        """
+        df = pandas.DataFrame({col : self.column(col).astype(object) for col in self.cols[:2]})
+        df[self.cols[2]] = self._normalize(df[self.cols[1]])
+        return self._from_dataframe(df)
+
+    @classmethod
+    def read(cls, path):
+        """
+        Memory-map SynonymStore saved in Arrow IPC (feather) format.
+        """
+        return cls(pyarrow.feather.read_table(path, memory_map = True))
+
+    def write(self, path):
+        """
+        Save SynonymStore in Arrow IPC (feather) format using atomic rename. Uncompressed so that it can be memory-mapped.
+        """
+        atomic_write(path, lambda f: pyarrow.feather.write_feather(self.table, f, compression = 'uncompressed'), mode = 'wb')
+
+
+def load_synonym_store(auxillary_dir, map_inchikey_to_synonyms = None):
+    """
+    Load synonyms from \'map_inchikey_to_synonyms.arrow\' in auxillary_dir. The arrow file is derived from \'map_inchikey_to_synonyms.json\'
+    and it is rebuilt whenever the json file is newer or if map_inchikey_to_synonyms is given (e.g. after the json was updated).
+
+    Without pyarrow the json file is loaded and the store is built in memory.
+
+    Parameters:
+    -----------
+    auxillary_dir : str
+        directory with auxillary data.
+
+    map_inchikey_to_synonyms : dict, optional (default=None)
+        up-to-date content of \'map_inchikey_to_synonyms.json\'. If None, the json is loaded only when the arrow file is outdated.
+
+    Returns:
+    --------
+    store : SynonymStore
+    """
+    json_path = os.path.join(auxillary_dir, 'map_inchikey_to_synonyms.json')
+    arrow_path = os.path.join(auxillary_dir, 'map_inchikey_to_synonyms.arrow')
+    if pyarrow is None:
+        if map_inchikey_to_synonyms is None:
+            map_inchikey_to_synonyms = load_json_map(json_path)
+        return SynonymStore.from_map(map_inchikey_to_synonyms)
+
+    with cache_lock(arrow_path):
+        if map_inchikey_to_synonyms is None and _is_up_to_date(arrow_path, json_path):
+            store = SynonymStore.read(arrow_path)
+            if store.normalization == NORMALIZATION_VERSION:
+                return store
+            store.renormalize().write(arrow_path)
+            return SynonymStore.read(arrow_path)
+        if map_inchikey_to_synonyms is None:
+            map_inchikey_to_synonyms = load_json_map(json_path)
+        store = SynonymStore.from_map(map_inchikey_to_synonyms)
+        store.write(arrow_path)
+    return SynonymStore.read(arrow_path)
+
+
+def _is_up_to_date(arrow_path, json_path):
+    if not os.path.exists(arrow_path):
+        return False
+    if os.path.exists(journal_path(json_path)):
+        return False
+    if os.path.exists(json_path) and os.stat(json_path).st_mtime_ns > os.stat(arrow_path).st_mtime_ns:
+        return False
+    return True
@@ -1,8 +1,11 @@
 from errors import MutationError
+import re
+import itertools
+import functools
 import pandas
 
 from rdkit import Chem
-from rdkit.Chem.EnumerateStereoisomers import EnumerateStereoisomers, StereoEnumerationOptions
+from rdkit.Chem.EnumerateStereoisomers import EnumerateStereoisomers, StereoEnumerationOptions, GetStereoisomerCount
 
 def _perform_mutation(mutations, seq):
     """
@@ -87,6 +90,58 @@ def merge_cols_with_priority(row, primary_col = 'Uniprot_Sequence', secondary_co
         return row[secondary_col]
 
 
+def clean_string_name(x):
+    """
+    Perform string cleaning and normalization on molecule's name.
+    """
+    try:
+        x_clean = re.sub(r'\s+','', x.strip()).lower()
+        x_clean = re.sub(r'[0-9]{0,1}r\/[0-9]{0,1}s', '', x_clean)
+        x_clean = re.sub(r'[0-9]{0,1}e,[0-9]{0,1}z', '', x_clean)
+        x_clean = re.sub(r'[0-9]{1}[ez]', '', x_clean)
+        x_clean = x_clean.replace(",sumofisomers", "").replace("(+/-)-","").replace("-","").replace("+","")
+        x_clean = x_clean.replace("\u03b1","alpha").replace("\u03B4","delta").replace("\u03B3","gamma").replace("\u03B2","beta")
+        x_clean = x_clean.replace("d","").replace("l","")
+        x_clean = x_clean.replace("(","").replace(")","")
+    except Exception as e:
+        print(x)
+        raise e
+    return x_clean
+
+
+# Number of parsed molecules kept by mol_from_smiles.
+MOL_CACHE_SIZE = 2**16
+
+
+@functools.lru_cache(maxsize = MOL_CACHE_SIZE)
+def _mol_binary(smiles):
+    mol = Chem.MolFromSmiles(smiles)
+    if mol is None:
+        return None
+    return mol.ToBinary()
+
+
+def mol_from_smiles(smiles):
+    """
+    Chem.MolFromSmiles with LRU cache. Parsed molecules are cached in rdkit binary format, so each SMILES is parsed once
+    and each call returns a new rdkit.Chem.Mol that can be modified by the caller.
+
+    Parameters:
+    -----------
+    smiles : str
+        SMILES.
+
+    Returns:
+    --------
+    mol : rdkit.Chem.Mol
+        parsed molecule. None if the SMILES can not be parsed.
+    """
+    binary = _mol_binary(smiles)
+    if binary is None:
+        return None
+    return Chem.Mol(binary)
+
+
 def enumerate_isomers(canonicalSMILES):
     """
     Get ismoers for a given canonical SMILES.
@@ -105,11 +160,65 @@ def enumerate_isomers(canonicalSMILES):
     -----------
     https://www.rdkit.org/docs/source/rdkit.Chem.EnumerateStereoisomers.html
     """
-    mol = Chem.MolFromSmiles(canonicalSMILES)
+    mol = mol_from_smiles(canonicalSMILES)
     isomers = tuple(EnumerateStereoisomers(mol))
     isomers = [Chem.MolToSmiles(x, isomericSmiles=True) for x in isomers]
     return isomers
 
 
+@functools.lru_cache(maxsize = None)
+def count_isomers(canonicalSMILES, cap = None):
+    """
+    Count stereoisomers of a given canonical SMILES without writing SMILES of each isomer.
+
+    If rdkit finds no stereo elements that can be flipped (GetStereoisomerCount is 1), 1 is returned without enumeration.
+    Otherwise isomers are enumerated lazily and counting stops at cap. Up to cap the result is the same as len(enumerate_isomers(canonicalSMILES)).
+
+    Parameters:
+    -----------
+    canonicalSMILES : str
+        canonical SMILES.
+
+    cap : int, optional (default=None)
+        maximal number of isomers to count. For example cap=2 is enough to decide if molecule has more than 1 stereoisomer.
+
+    Returns:
+    --------
+    count : int
+        number of isomers (at most cap).
+
+    References:
+    -----------
+    https://www.rdkit.org/docs/source/rdkit.Chem.EnumerateStereoisomers.html
+    """
+    mol = mol_from_smiles(canonicalSMILES)
+    if GetStereoisomerCount(mol) == 1:
+        return 1
+    return sum(1 for _ in itertools.islice(EnumerateStereoisomers(mol), cap))
+
+
+def smiles_to_inchikey(smiles):
+    """
+    Compute standard InChI key of a SMILES locally using rdkit.
+
+    Parameters:
+    -----------
+    smiles : str
+        (isomeric) SMILES.
+
+    Returns:
+    --------
+    inchikey : str
+        InChI key. None if rdkit can not parse the SMILES or generate the InChI.
+    """
+    mol = mol_from_smiles(smiles)
+    if mol is None:
+        return None
+    inchikey = Chem.MolToInchiKey(mol)
+    if inchikey == '':
+        return None
+    return inchikey
+
+
 if __name__ == '__main__':
     print(enumerate_isomers('CCC(C)CO.CC(C)CCO'))